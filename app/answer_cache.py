@@ -0,0 +1,202 @@
+# app/answer_cache.py
+
+import os
+import re
+import time
+import random
+import hashlib
+from collections import OrderedDict, defaultdict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from app.search import normalize_query
+from app.metrics import ANSWER_CACHE_LOOKUPS
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(6 * 3600)))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.8"))
+
+# Words that carry no meaning for matching; question words are kept on purpose
+STOPWORDS = frozenset(
+    "a an the is are am was were be been this that these those it its of for to in on at "
+    "by with from about into my our your their me we you i s do does did please can could "
+    "would will shall should there here and or so just currently current".split()
+)
+
+_MERSENNE = (1 << 61) - 1
+
+# Ages, amounts, rates and years; "60,000", "60000" and "60k" stay distinct figures
+_FIGURE = re.compile(r"\d[\d,]*(?:\.\d+)?\s*(?:k\b|m\b|%)?", re.IGNORECASE)
+
+
+def shingles(normalized: str) -> FrozenSet[str]:
+    """Content-word unigrams plus bigrams, so light rewording still overlaps."""
+    words = [w for w in normalized.split() if w not in STOPWORDS]
+    return frozenset(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def figures(question: str) -> Tuple[str, ...]:
+    """The numbers in a question, which a near-duplicate match must not change."""
+    return tuple(sorted(
+        re.sub(r"[\s,]", "", m.group()).lower() for m in _FIGURE.finditer(question)
+    ))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _Entry:
+    __slots__ = ("tenant", "key", "figures", "shingles", "bands", "answer", "expires_at")
+
+    def __init__(self, tenant, key, figures, shingles, bands, answer, expires_at):
+        self.tenant = tenant
+        self.key = key
+        self.figures = figures
+        self.shingles = shingles
+        self.bands = bands
+        self.answer = answer
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    """Tenant-scoped cache of assistant answers keyed on the client question.
+
+    Exact matches on the normalized question are looked up directly; near
+    duplicates are found through MinHash LSH buckets and confirmed with an
+    exact Jaccard check on the shingle sets. A near duplicate must also
+    quote exactly the same figures (ages, amounts, rates), since answers
+    are written for the client's own numbers. Entries expire after `ttl`
+    seconds and the least recently used entries are evicted past
+    `max_entries`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        ttl: float = ANSWER_CACHE_TTL,
+        similarity: float = ANSWER_CACHE_SIMILARITY,
+        num_perm: int = 64,
+        bands: int = 16,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(1337)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE), rng.randrange(0, _MERSENNE))
+            for _ in range(num_perm)
+        ]
+        self.entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self.buckets: Dict[Tuple, Set[Tuple[str, str]]] = defaultdict(set)
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _signature(self, shingle_set: FrozenSet[str]) -> List[int]:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+            for s in shingle_set
+        ]
+        return [min((a * h + b) % _MERSENNE for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, tenant: str, shingle_set: FrozenSet[str]) -> List[Tuple]:
+        sig = self._signature(shingle_set)
+        return [
+            (tenant, i, tuple(sig[i * self.rows:(i + 1) * self.rows]))
+            for i in range(self.bands)
+        ]
+
+    def _remove(self, entry_id: Tuple[str, str]):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for band in entry.bands:
+            bucket = self.buckets.get(band)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.buckets[band]
+
+    def _live(self, entry_id: Tuple[str, str], now: float) -> Optional[_Entry]:
+        entry = self.entries.get(entry_id)
+        if entry is None:
+            return None
+        if entry.expires_at < now:
+            self._remove(entry_id)
+            return None
+        return entry
+
+    def get(self, tenant: str, question: str) -> Optional[str]:
+        key = normalize_query(question)
+        if not key:
+            return None
+        now = time.monotonic()
+
+        entry = self._live((tenant, key), now)
+        if entry is not None:
+            self.entries.move_to_end((tenant, key))
+            self.hits += 1
+            ANSWER_CACHE_LOOKUPS.labels("hit").inc()
+            return entry.answer
+
+        shingle_set = shingles(key)
+        question_figures = figures(question)
+        if shingle_set:
+            candidates = set()
+            for band in self._band_keys(tenant, shingle_set):
+                candidates.update(self.buckets.get(band, ()))
+            best, best_score = None, self.similarity
+            for entry_id in candidates:
+                cand = self._live(entry_id, now)
+                if cand is None or cand.figures != question_figures:
+                    continue
+                score = jaccard(shingle_set, cand.shingles)
+                if score >= best_score:
+                    best, best_score = cand, score
+            if best is not None:
+                self.entries.move_to_end((best.tenant, best.key))
+                self.hits += 1
+                self.near_hits += 1
+                ANSWER_CACHE_LOOKUPS.labels("near_hit").inc()
+                return best.answer
+
+        self.misses += 1
+        ANSWER_CACHE_LOOKUPS.labels("miss").inc()
+        return None
+
+    def put(self, tenant: str, question: str, answer: str):
+        key = normalize_query(question)
+        if not key:
+            return
+        entry_id = (tenant, key)
+        self._remove(entry_id)
+
+        shingle_set = shingles(key)
+        bands = self._band_keys(tenant, shingle_set) if shingle_set else []
+        self.entries[entry_id] = _Entry(
+            tenant, key, figures(question), shingle_set, bands, answer, time.monotonic() + self.ttl
+        )
+        for band in bands:
+            self.buckets[band].add(entry_id)
+
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+        }
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,173 @@
+# app/auth.py
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import jwt
+
+from app.db import get_auth_user
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_URL = os.getenv("SUPABASE_URL", "")
+# Legacy HS256 projects sign with the JWT secret; asymmetric keys come from JWKS
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWKS_URL = os.getenv(
+    "SUPABASE_JWKS_URL", f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+)
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+AUTH_LEEWAY = float(os.getenv("AUTH_LEEWAY", "30"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+# Ask Supabase Auth only when a token cannot be checked locally (no key material)
+AUTH_REMOTE_FALLBACK = os.getenv("AUTH_REMOTE_FALLBACK", "true").lower() in ("1", "true", "yes")
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256", "EdDSA")
+
+
+class AuthError(Exception):
+    """The token is missing, malformed, expired or not signed by our project."""
+
+
+async def _remote_user_id(token: str) -> str:
+    resp = await get_auth_user(token)
+    if not resp or not resp.user:
+        raise AuthError("User not found or token invalid")
+    return resp.user.id
+
+
+class TokenVerifier:
+    """Verifies Supabase access tokens locally and caches the result.
+
+    HS256 tokens are checked against `secret`; asymmetric tokens against the
+    project's JWKS (fetched once and cached by PyJWT). Signature, expiry and
+    audience are enforced. Verified tokens map to their user id for up to
+    `ttl` seconds (never past the token's own expiry), so repeat requests
+    cost a dictionary lookup.
+    """
+
+    def __init__(
+        self,
+        secret: Optional[str] = SUPABASE_JWT_SECRET,
+        jwks_url: Optional[str] = SUPABASE_JWKS_URL,
+        audience: str = SUPABASE_JWT_AUDIENCE,
+        max_entries: int = AUTH_CACHE_SIZE,
+        ttl: float = AUTH_CACHE_TTL,
+        remote_fallback: bool = AUTH_REMOTE_FALLBACK,
+        remote: Callable[[str], Awaitable[str]] = _remote_user_id,
+    ):
+        self.secret = secret
+        self.jwks_url = jwks_url
+        self.audience = audience
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.remote_fallback = remote_fallback
+        self.remote = remote
+        self._jwks: Optional[jwt.PyJWKClient] = None
+        self.cache: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.remote_lookups = 0
+
+    def _cached(self, key: bytes) -> Optional[str]:
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if expires_at <= time.time():
+            del self.cache[key]
+            return None
+        self.cache.move_to_end(key)
+        return user_id
+
+    def _store(self, key: bytes, user_id: str, token_exp: Optional[float]):
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        self.cache[key] = (user_id, expires_at)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+    async def _signing_key(self, token: str, alg: str):
+        if alg == "HS256":
+            return self.secret
+        if alg in ASYMMETRIC_ALGORITHMS and self.jwks_url:
+            if self._jwks is None:
+                self._jwks = jwt.PyJWKClient(self.jwks_url, cache_keys=True)
+            # Only the first token per key id touches the network; keep it off the loop
+            return (await asyncio.to_thread(self._jwks.get_signing_key_from_jwt, token)).key
+        return None
+
+    @staticmethod
+    def _unverified_exp(token: str) -> Optional[float]:
+        # Supabase vouched for the token; its own exp still bounds the cache entry
+        try:
+            exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+            return float(exp) if exp is not None else None
+        except (jwt.PyJWTError, TypeError, ValueError):
+            return None
+
+    async def verify(self, token: str) -> str:
+        """Return the user id for a valid token or raise `AuthError`."""
+        key = hashlib.sha256(token.encode()).digest()
+        user_id = self._cached(key)
+        if user_id is not None:
+            self.hits += 1
+            return user_id
+        self.misses += 1
+
+        try:
+            alg = jwt.get_unverified_header(token).get("alg")
+        except jwt.PyJWTError as e:
+            raise AuthError(f"Malformed token: {e}")
+
+        try:
+            signing_key = await self._signing_key(token, alg)
+        except jwt.PyJWKClientError as e:
+            logger.warning(f"JWKS lookup failed: {e}")
+            signing_key = None
+
+        if signing_key is None:
+            if not self.remote_fallback:
+                raise AuthError(f"No key available to verify {alg} token")
+            self.remote_lookups += 1
+            try:
+                user_id = await self.remote(token)
+            except AuthError:
+                raise
+            except Exception as e:
+                raise AuthError(f"Failed to validate token: {e}")
+            self._store(key, user_id, self._unverified_exp(token))
+            return user_id
+
+        try:
+            claims = jwt.decode(
+                token,
+                signing_key,
+                algorithms=[alg],
+                audience=self.audience,
+                leeway=AUTH_LEEWAY,
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise AuthError(f"Invalid token: {e}")
+
+        self._store(key, claims["sub"], claims["exp"])
+        return claims["sub"]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "remote_lookups": self.remote_lookups,
+            "entries": len(self.cache),
+        }
+
+
+token_verifier = TokenVerifier()
@@ -0,0 +1,303 @@
+# app/chat_context.py
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.db import run_query
+from app.llm import chat_completion
+
+logger = logging.getLogger(__name__)
+
+# Prompt budget for verbatim recent turns; older turns live in the summary
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "3000"))
+# Fold dropped turns into the summary once this many have accumulated
+CHAT_SUMMARY_MIN_MESSAGES = int(os.getenv("CHAT_SUMMARY_MIN_MESSAGES", "4"))
+CHAT_HISTORY_CACHE_SIZE = int(os.getenv("CHAT_HISTORY_CACHE_SIZE", "500"))
+# Turns persisted by another worker are only seen once a cached chat expires,
+# so with several uvicorn workers the cache is kept short-lived
+CHAT_HISTORY_CACHE_TTL = float(os.getenv(
+    "CHAT_HISTORY_CACHE_TTL",
+    "1800" if int(os.getenv("WEB_CONCURRENCY", "1")) <= 1 else "30"
+))
+CHAT_HISTORY_MAX_LOAD = int(os.getenv("CHAT_HISTORY_MAX_LOAD", "500"))
+
+CONTACT_PREFIX = "[Contact Attached]"
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a conversation between a UK financial advisor and an assistant.
+Merge the new messages into the existing summary. Keep client facts, figures, decisions and open questions; drop pleasantries.
+Reply with the updated summary only, in British English, under 250 words.
+"""
+
+
+def _missing_summary_columns(error: Exception) -> bool:
+    """Whether a query failed because migration 002 has not been applied."""
+    # 42703: undefined column (select); PGRST204: unknown column in the payload (update)
+    return getattr(error, "code", None) in ("42703", "PGRST204") or (
+        "context_summary" in str(error) or "summarized_count" in str(error)
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English, plus per-message framing
+    return len(text) // 4 + 4
+
+
+def _prune(value):
+    if isinstance(value, dict):
+        pruned = {k: _prune(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [v for v in (_prune(v) for v in value) if v not in (None, "", [], {})]
+    return value
+
+
+def compact_contact(contact: dict) -> str:
+    """Minified JSON of a contact with empty fields removed."""
+    return json.dumps(_prune(contact), separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+
+
+def contact_message(contact: dict) -> str:
+    return f"{CONTACT_PREFIX}\n{compact_contact(contact)}"
+
+
+def _is_contact(message: Dict[str, str]) -> bool:
+    return message["role"] == "user" and message["content"].startswith(CONTACT_PREFIX)
+
+
+def _compact_contact_message(content: str) -> str:
+    """Re-minify contact blobs stored before compaction (indent=2 dumps)."""
+    body = content[len(CONTACT_PREFIX):].strip()
+    try:
+        return contact_message(json.loads(body))
+    except ValueError:
+        return content
+
+
+class ChatState:
+    """Cached context of one chat: the rolling summary and the turns after it."""
+
+    def __init__(self, summary: str = "", summarized_count: int = 0, messages: Optional[List[Dict[str, str]]] = None):
+        self.summary = summary
+        self.summarized_count = summarized_count
+        self.messages = messages or []
+        self.loaded_at = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.folding: Optional[asyncio.Task] = None
+        # Latest contact whose message has already been folded away
+        self.pinned_contact: Optional[Dict[str, str]] = None
+
+    def is_first_turn(self) -> bool:
+        return self.summarized_count == 0 and not any(
+            m["role"] == "assistant" for m in self.messages
+        ) and sum(1 for m in self.messages if not _is_contact(m)) <= 1
+
+
+class ChatContextManager:
+    """Builds bounded advisor-chat prompts.
+
+    The prompt is the system prompt, the persisted rolling summary of older
+    turns, the latest attached contact (deduplicated and minified), and as
+    many recent turns as fit in `budget` tokens. Turns that fall out of the
+    window are folded into the summary in the background. Chat state is
+    cached per chat, so a turn only appends to memory instead of
+    re-reading the whole message table. If `advisor_chats` lacks the
+    summary columns, folding is switched off for the process and older
+    turns are simply left out of the prompt.
+    """
+
+    def __init__(
+        self,
+        budget: int = CHAT_CONTEXT_TOKENS,
+        summary_min_messages: int = CHAT_SUMMARY_MIN_MESSAGES,
+        max_chats: int = CHAT_HISTORY_CACHE_SIZE,
+        ttl: float = CHAT_HISTORY_CACHE_TTL,
+    ):
+        self.budget = budget
+        self.summary_min_messages = summary_min_messages
+        self.max_chats = max_chats
+        self.ttl = ttl
+        self.chats: "OrderedDict[str, ChatState]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.folds = 0
+        self.summaries_enabled = True
+
+    def _disable_summaries(self, error: Exception):
+        if self.summaries_enabled:
+            self.summaries_enabled = False
+            logger.error(
+                f"advisor_chats has no context_summary/summarized_count columns "
+                f"(apply migrations/002_advisor_chats_context_summary.sql); "
+                f"chat summaries are disabled: {error}"
+            )
+
+    async def _load(self, chat_id: str) -> ChatState:
+        summary, summarized_count = "", 0
+        if self.summaries_enabled:
+            try:
+                res = await run_query(lambda db: db.table("advisor_chats")
+                    .select("context_summary, summarized_count")
+                    .eq("id", chat_id)
+                    .limit(1))
+                if res.data:
+                    summary = res.data[0].get("context_summary") or ""
+                    summarized_count = res.data[0].get("summarized_count") or 0
+            except Exception as e:
+                if _missing_summary_columns(e):
+                    self._disable_summaries(e)
+                else:
+                    logger.warning(f"Could not load summary for chat {chat_id}: {e}")
+
+        # Newest turns first, capped; ties on timestamp (one multi-row insert) break on id
+        hist = await run_query(lambda db: db.table("advisor_messages")
+            .select("role, content", count="exact")
+            .eq("chat_id", chat_id)
+            .order("timestamp", desc=True)
+            .order("id", desc=True)
+            .limit(CHAT_HISTORY_MAX_LOAD))
+        if hist.data is None:
+            raise RuntimeError("Failed to fetch chat history")
+        messages = list(reversed(hist.data))
+
+        # Row offset of the oldest loaded turn; anything before it is either
+        # already summarized or too old to load and is treated as summarized
+        offset = (hist.count if hist.count is not None else len(messages)) - len(messages)
+        if offset < summarized_count:
+            messages = messages[summarized_count - offset:]
+        else:
+            summarized_count = offset
+        return ChatState(summary, summarized_count, messages)
+
+    async def get(self, chat_id: str) -> ChatState:
+        state = self.chats.get(chat_id)
+        if state is not None and time.monotonic() - state.loaded_at < self.ttl:
+            self.chats.move_to_end(chat_id)
+            self.hits += 1
+            return state
+
+        self.misses += 1
+        state = await self._load(chat_id)
+        self.chats[chat_id] = state
+        self.chats.move_to_end(chat_id)
+        while len(self.chats) > self.max_chats:
+            self.chats.popitem(last=False)
+        return state
+
+    def append(self, chat_id: str, role: str, content: str):
+        """Record a message that has just been persisted."""
+        state = self.chats.get(chat_id)
+        if state is not None:
+            state.messages.append({"role": role, "content": content})
+
+    def invalidate(self, chat_id: str):
+        self.chats.pop(chat_id, None)
+
+    def _window(self, state: ChatState, budget: int):
+        """Split the unsummarized turns into (dropped, kept, latest contact)."""
+        contact = state.pinned_contact
+        turns = []
+        for m in state.messages:
+            if _is_contact(m):
+                # Only the most recently attached contact is current
+                contact = {"role": "user", "content": _compact_contact_message(m["content"])}
+            else:
+                turns.append(m)
+
+        used = estimate_tokens(contact["content"]) if contact else 0
+        start = len(turns)
+        while start > 0:
+            cost = estimate_tokens(turns[start - 1]["content"])
+            if used + cost > budget and start < len(turns):
+                break
+            used += cost
+            start -= 1
+        return turns[:start], turns[start:], contact
+
+    def build_messages(self, chat_id: str, state: ChatState, system_prompt: str) -> List[Dict[str, str]]:
+        budget = self.budget - estimate_tokens(system_prompt) - estimate_tokens(state.summary)
+        dropped, kept, contact = self._window(state, budget)
+
+        messages = [{"role": "system", "content": system_prompt}]
+        if state.summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{state.summary}"
+            })
+        if contact:
+            messages.append(contact)
+        messages.extend(kept)
+
+        if (self.summaries_enabled and len(dropped) >= self.summary_min_messages
+                and (state.folding is None or state.folding.done())):
+            state.folding = asyncio.create_task(self._fold(chat_id, state, budget))
+        return messages
+
+    async def _fold(self, chat_id: str, state: ChatState, budget: int):
+        """Merge turns that no longer fit the window into the rolling summary."""
+        async with state.lock:
+            dropped, _, _ = self._window(state, budget)
+            if len(dropped) < self.summary_min_messages:
+                return
+
+            # Fold everything up to the last dropped turn, attached contacts included
+            last = dropped[-1]
+            upto = next(i for i in range(len(state.messages) - 1, -1, -1) if state.messages[i] is last) + 1
+            folded = state.messages[:upto]
+            contacts = [m for m in folded if _is_contact(m)]
+            transcript = "\n".join(
+                f"{m['role']}: {m['content']}" for m in folded if not _is_contact(m)
+            )
+            if contacts:
+                transcript += "\n" + _compact_contact_message(contacts[-1]["content"])
+            try:
+                comp = await chat_completion(
+                    "advisor_chat",
+                    model="gpt-4o",
+                    messages=[
+                        {"role": "system", "content": SUMMARY_PROMPT},
+                        {"role": "user", "content": f"Existing summary:\n{state.summary or '(none)'}\n\nNew messages:\n{transcript}"}
+                    ],
+                    max_tokens=400,
+                    temperature=0.2
+                )
+                summary = comp.choices[0].message.content.strip()
+            except Exception as e:
+                logger.warning(f"Could not summarize chat {chat_id}: {e}")
+                return
+
+            summarized_count = state.summarized_count + upto
+            try:
+                await run_query(lambda db: db.table("advisor_chats").update({
+                    "context_summary": summary,
+                    "summarized_count": summarized_count,
+                }).eq("id", chat_id), op="update_chat_summary")
+            except Exception as e:
+                if _missing_summary_columns(e):
+                    self._disable_summaries(e)
+                else:
+                    logger.warning(f"Could not persist summary for chat {chat_id}: {e}")
+                return
+
+            state.summary = summary
+            state.summarized_count = summarized_count
+            if contacts:
+                state.pinned_contact = {"role": "user", "content": _compact_contact_message(contacts[-1]["content"])}
+            del state.messages[:upto]
+            self.folds += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "folds": self.folds,
+            "chats": len(self.chats),
+        }
+
+
+chat_contexts = ChatContextManager()
@@ -1,10 +1,17 @@
 # app/db.py
 
 import os
+import time
+import asyncio
 from pathlib import Path
 from datetime import datetime
+from typing import Any, Callable, Optional
+
+import httpx
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+
+from app.metrics import DB_ERRORS, DB_QUERY_LATENCY
 
 # Explicitly load .env from project root
 ROOT = Path(__file__).resolve().parent.parent
@@ -16,7 +23,91 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise RuntimeError("Missing Supabase credentials in environment")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Per-call timeout (seconds) and the max number of in-flight Supabase requests
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "5"))
+SUPABASE_MAX_CONCURRENCY = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "20"))
+SUPABASE_MAX_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", "10"))
+
+_client: Optional[AsyncClient] = None
+_http: Optional[httpx.AsyncClient] = None
+_client_lock = asyncio.Lock()
+_semaphore = asyncio.Semaphore(SUPABASE_MAX_CONCURRENCY)
+
+
+async def get_supabase() -> AsyncClient:
+    """Return the process-wide async Supabase client, creating it on first use.
+
+    All PostgREST and auth traffic goes through one pooled keep-alive
+    httpx client, so requests never open a fresh connection per call.
+    """
+    global _client, _http
+    if _client is not None:
+        return _client
+
+    async with _client_lock:
+        if _client is None:
+            _http = httpx.AsyncClient(
+                timeout=SUPABASE_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=SUPABASE_MAX_CONCURRENCY,
+                    max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+                ),
+            )
+            _client = await acreate_client(
+                SUPABASE_URL,
+                SUPABASE_KEY,
+                options=AsyncClientOptions(
+                    httpx_client=_http,
+                    postgrest_client_timeout=SUPABASE_TIMEOUT,
+                ),
+            )
+    return _client
+
+
+async def close_supabase():
+    """Release pooled connections; called on application shutdown."""
+    global _client, _http
+    if _http is not None:
+        await _http.aclose()
+    _client = None
+    _http = None
+
+
+async def run_query(
+    build: Callable[[AsyncClient], Any],
+    timeout: Optional[float] = None,
+    op: str = "query"
+):
+    """Execute a PostgREST/auth query with bounded concurrency and a timeout.
+
+    `build` receives the client and returns an un-executed query builder,
+    e.g. ``lambda db: db.table("meetings").insert(record)``. `op` labels
+    the query's latency and error metrics.
+    """
+    client = await get_supabase()
+    async with _semaphore:
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(
+                build(client).execute(),
+                timeout=timeout or SUPABASE_TIMEOUT,
+            )
+        except Exception:
+            DB_ERRORS.labels(op).inc()
+            raise
+        finally:
+            DB_QUERY_LATENCY.labels(op).observe(time.monotonic() - started)
+
+
+async def get_auth_user(token: str, timeout: Optional[float] = None):
+    """Resolve a Supabase access token to its user via the auth API."""
+    client = await get_supabase()
+    async with _semaphore:
+        return await asyncio.wait_for(
+            client.auth.get_user(token),
+            timeout=timeout or SUPABASE_TIMEOUT,
+        )
+
 
 async def create_meeting(user_id: str, client_id: str, session_id: str, title: str = ""):
     record = {
@@ -27,7 +118,7 @@ async def create_meeting(user_id: str, client_id: str, session_id: str, title: s
         "started_at": datetime.utcnow().isoformat()
     }
 
-    res = supabase.table("meetings").insert(record).execute()
+    res = await run_query(lambda db: db.table("meetings").insert(record), op="insert_meeting")
 
     if res.data is None:
         raise RuntimeError("Supabase meeting insert failed: No data returned.")
@@ -41,7 +132,7 @@ async def save_summary(user_id: str, client_id: str, session_id: str, summary: s
         "summary": summary,
         "created_at": datetime.utcnow().isoformat()
     }
-    res = supabase.table("summaries").insert(record).execute()
+    res = await run_query(lambda db: db.table("summaries").insert(record), op="insert_summary")
     if not res.data:
         raise RuntimeError("Supabase summary insert error")
 
@@ -66,7 +157,7 @@ async def save_transcript(
         "timestamp": datetime.utcnow().isoformat()
     }
 
-    res = supabase.table("conversations").insert(record).execute()
+    res = await run_query(lambda db: db.table("conversations").insert(record), op="insert_transcript")
     if not res.data:
         raise RuntimeError("Supabase transcript insert error")
 
@@ -86,7 +177,54 @@ async def save_openai_response(
         "timestamp": datetime.utcnow().isoformat()
     }
 
-    res = supabase.table("openai_responses").insert(record).execute()
+    res = await run_query(lambda db: db.table("openai_responses").insert(record), op="insert_openai_response")
     if not res.data:
         raise RuntimeError("Supabase OpenAI insert error")
 
+
+async def save_transcripts(records: list):
+    """Bulk-insert prepared `conversations` rows in a single request.
+
+    Rows carry a client-generated ``row_id``; rows already stored by an earlier
+    attempt are skipped, so retrying a batch is safe.
+    """
+    if not records:
+        return
+    res = await run_query(lambda db: db.table("conversations").upsert(
+        records, on_conflict="row_id", ignore_duplicates=True
+    ), op="insert_transcripts")
+    if res.data is None:
+        raise RuntimeError("Supabase transcript batch insert error")
+
+
+async def load_transcripts(
+    user_id: str,
+    client_id: str,
+    session_id: str,
+    since: Optional[str] = None,
+    page_size: int = 1000
+) -> list:
+    """`conversations` rows of a session in order, fetched page by page.
+
+    With `since`, only rows stamped at or after it are returned.
+    """
+    rows = []
+    while True:
+        start = len(rows)
+
+        def build(db):
+            q = (db.table("conversations")
+                .select("row_id, source, speaker_tag, transcript, timestamp")
+                .eq("user_id", user_id)
+                .eq("client_id", client_id)
+                .eq("session_id", session_id))
+            if since:
+                q = q.gte("timestamp", since)
+            return q.order("timestamp").order("row_id").range(start, start + page_size - 1)
+
+        res = await run_query(build, op="load_transcripts")
+        if res.data is None:
+            raise RuntimeError("Supabase transcript load error")
+        rows.extend(res.data)
+        if len(res.data) < page_size:
+            return rows
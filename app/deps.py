@@ -1,14 +1,36 @@
 # app/deps.py
-from fastapi import Query, Depends
-from typing import Dict
+from fastapi import Query, Depends, WebSocketException, status
+from typing import Dict, Optional
+from app.processors.audio_format import AudioFormat
 
 async def get_user_session(
     userId: str = Query(..., alias="userId"),
     clientId: str = Query(..., alias="clientId"),
-    sessionId: str = Query(..., alias="sessionId")
+    sessionId: str = Query(..., alias="sessionId"),
+    tenantId: Optional[str] = Query(None, alias="tenantId")
 ) -> Dict[str, str]:
     return {
         "user_id": userId,
         "client_id": clientId,
-        "session_id": sessionId
+        "session_id": sessionId,
+        # Scope for shared caches; defaults to the individual advisor
+        "tenant_id": tenantId or userId
     }
+
+
+async def get_audio_format(
+    encoding: str = Query("linear16", alias="encoding"),
+    sampleRate: int = Query(16000, alias="sampleRate")
+) -> AudioFormat:
+    try:
+        return AudioFormat(encoding, sampleRate)
+    except ValueError as e:
+        # Reject the handshake rather than transcribing garbage
+        raise WebSocketException(code=status.WS_1003_UNSUPPORTED_DATA, reason=str(e))
+
+
+async def get_partials(
+    partials: bool = Query(False, alias="partials")
+) -> bool:
+    """Opt-in to interim `*_transcription_partial` messages."""
+    return partials
@@ -0,0 +1,214 @@
+# app/llm.py
+
+import os
+import time
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from app.metrics import record_llm_usage
+
+logger = logging.getLogger(__name__)
+
+# Per-endpoint request timeouts (seconds)
+ENDPOINT_TIMEOUTS = {
+    "assistant": float(os.getenv("LLM_TIMEOUT_ASSISTANT", "30")),
+    "advisor_chat": float(os.getenv("LLM_TIMEOUT_ADVISOR_CHAT", "30")),
+    "summary": float(os.getenv("LLM_TIMEOUT_SUMMARY", "60")),
+    "extract_contact": float(os.getenv("LLM_TIMEOUT_EXTRACT_CONTACT", "45")),
+}
+DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT_DEFAULT", "30"))
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_RETRY_RATIO = float(os.getenv("LLM_RETRY_RATIO", "0.1"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Errors worth retrying and counting against the circuit breaker
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the gateway refuses a call because OpenAI is degraded."""
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a fraction of overall traffic.
+
+    Every request deposits `ratio` tokens and every retry withdraws one, so
+    when OpenAI is failing broadly we stop multiplying the load on it.
+    """
+
+    def __init__(self, ratio: float = LLM_RETRY_RATIO, min_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = min_tokens
+        self.tokens = min_tokens
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe."""
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def release_probe(self):
+        self.probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                logger.warning("OpenAI circuit breaker opened")
+            self.opened_at = time.monotonic()
+
+
+openai_client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,  # retries are handled by the gateway
+    http_client=httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONCURRENCY,
+            max_keepalive_connections=LLM_MAX_CONCURRENCY,
+        ),
+    ),
+)
+retry_budget = RetryBudget()
+breaker = CircuitBreaker()
+_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+async def close_llm():
+    """Close the pooled OpenAI connections; called on application shutdown."""
+    await openai_client.close()
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter: sleep somewhere between 0 and the capped exponential delay
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+
+async def _create(endpoint: str, **kwargs):
+    """Call chat.completions.create with timeout, retries and breaker checks."""
+    timeout = ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+    retry_budget.deposit()
+
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise LLMUnavailableError("OpenAI circuit breaker is open")
+        try:
+            result = await asyncio.wait_for(
+                openai_client.chat.completions.create(timeout=timeout, **kwargs),
+                timeout=timeout,
+            )
+        except RETRYABLE_ERRORS as e:
+            breaker.record_failure()
+            attempt += 1
+            if attempt >= LLM_MAX_ATTEMPTS or not retry_budget.try_withdraw():
+                raise
+            delay = _backoff(attempt)
+            logger.warning(f"[{endpoint}] OpenAI call failed ({type(e).__name__}); retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+        except openai.APIStatusError:
+            # OpenAI answered (e.g. 400); the service itself is healthy
+            breaker.record_success()
+            raise
+        except BaseException:
+            breaker.release_probe()
+            raise
+        else:
+            if not kwargs.get("stream"):
+                breaker.record_success()
+            return result
+
+
+async def chat_completion(endpoint: str, **kwargs):
+    """Run a non-streaming chat completion through the gateway."""
+    async with _semaphore:
+        result = await _create(endpoint, **kwargs)
+    record_llm_usage(endpoint, getattr(result, "usage", None))
+    return result
+
+
+async def _metered(stream, endpoint: str):
+    # With include_usage the last chunk carries the token counts
+    async for chunk in stream:
+        record_llm_usage(endpoint, getattr(chunk, "usage", None))
+        yield chunk
+
+
+@asynccontextmanager
+async def stream_chat_completion(endpoint: str, **kwargs):
+    """Open a streaming chat completion; retries only happen before the first chunk.
+
+    Usage::
+
+        async with stream_chat_completion("assistant", model=..., messages=...) as stream:
+            async for chunk in stream:
+                ...
+    """
+    async with _semaphore:
+        stream = await _create(
+            endpoint, stream=True, stream_options={"include_usage": True}, **kwargs
+        )
+        async with stream:
+            try:
+                yield _metered(stream, endpoint)
+            except RETRYABLE_ERRORS:
+                breaker.record_failure()
+                raise
+            except BaseException:
+                breaker.release_probe()
+                raise
+            else:
+                breaker.record_success()
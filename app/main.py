@@ -1,5 +1,6 @@
 # app/main.py
 import logging, os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import mic, speaker, combined
@@ -7,13 +8,29 @@ from app.routers.meeting import router as meeting
 from app.routers.summary import router as summary
 from app.routers import advisor_chat
 from app.routers import extract_contact
+from app.routers import metrics
+from app.db import close_supabase
+from app.llm import close_llm
+from app.processors.audio_processor import close_speech_client
+from app.transcript_buffer import transcript_buffer
 from dotenv import load_dotenv
 
 # Load .env at startup
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
-app = FastAPI(title="Real-Time Transcription API")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await transcript_buffer.stop()
+    await close_supabase()
+    await close_llm()
+    await close_speech_client()
+
+
+app = FastAPI(title="Real-Time Transcription API", lifespan=lifespan)
 
 # ✅ CORS fix: Allow frontend (React/Vite) to talk to this server
 app.add_middleware(
@@ -22,6 +39,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Latest-Cursor"],  # advisor-chat pagination
 )
 
 # ✅ Include routers AFTER middleware
@@ -32,6 +50,7 @@ app.include_router(summary)
 app.include_router(advisor_chat.router)
 app.include_router(meeting)
 app.include_router(extract_contact.router)
+app.include_router(metrics.router)
 
 if __name__ == "__main__":
     import uvicorn
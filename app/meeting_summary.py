@@ -0,0 +1,178 @@
+# app/meeting_summary.py
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from app.chat_context import estimate_tokens
+from app.llm import chat_completion
+from app.summarizer import SUMMARY_CHUNK_TOKENS, SUMMARY_SYSTEM_PROMPT, summarize_lines
+
+logger = logging.getLogger(__name__)
+
+# Fold new speech into the summary after this many final segments...
+MEETING_SUMMARY_EVERY_SEGMENTS = int(os.getenv("MEETING_SUMMARY_EVERY_SEGMENTS", "20"))
+# ...or after this many seconds, whichever comes first
+MEETING_SUMMARY_EVERY_SECONDS = float(os.getenv("MEETING_SUMMARY_EVERY_SECONDS", "120"))
+MEETING_SUMMARY_MAX_TOKENS = int(os.getenv("MEETING_SUMMARY_MAX_TOKENS", "512"))
+# How long a finished meeting's summary stays available to /summarize
+MEETING_SUMMARY_TTL = float(os.getenv("MEETING_SUMMARY_TTL", "3600"))
+MEETING_SUMMARY_MAX_MEETINGS = int(os.getenv("MEETING_SUMMARY_MAX_MEETINGS", "1000"))
+
+ROLLING_PROMPT = """You maintain a running summary of a live meeting between a UK financial advisor and a client.
+Merge the new transcript lines into the existing summary. Keep client facts, figures, advice given, decisions, action items and open questions.
+Reply with the updated summary only, in a concise and professional tone."""
+
+MeetingKey = Tuple[str, str, str]
+
+
+def meeting_key(session_info: Dict[str, str]) -> MeetingKey:
+    return (session_info["user_id"], session_info["client_id"], session_info["session_id"])
+
+
+class RollingSummary:
+    """Summary of a meeting kept up to date while it is still running.
+
+    `add` queues a finalized transcript line. Every `every_segments` lines,
+    or every `every_seconds` while lines are pending, the pending lines are
+    merged into the summary in the background, so each update only pays for
+    the new text. `flush` folds whatever is left and returns the summary.
+    """
+
+    def __init__(
+        self,
+        every_segments: int = MEETING_SUMMARY_EVERY_SEGMENTS,
+        every_seconds: float = MEETING_SUMMARY_EVERY_SECONDS,
+    ):
+        self.every_segments = every_segments
+        self.every_seconds = every_seconds
+        self.summary = ""
+        self.pending: List[str] = []
+        self.covered = 0
+        self.updates = 0
+        self.lock = asyncio.Lock()
+        self._update_task: Optional[asyncio.Task] = None
+        self._ticker: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._ticker is None and self.every_seconds > 0:
+            self._ticker = asyncio.create_task(self._tick())
+
+    def stop(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
+
+    def add(self, line: str):
+        self.pending.append(line)
+        if len(self.pending) >= self.every_segments:
+            self._schedule()
+
+    def _schedule(self):
+        if self._update_task is None or self._update_task.done():
+            self._update_task = asyncio.create_task(self._update())
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(self.every_seconds)
+            if self.pending:
+                self._schedule()
+
+    async def _update(self, raise_errors: bool = False):
+        async with self.lock:
+            count = len(self.pending)
+            if not count:
+                return
+            lines = self.pending[:count]
+            try:
+                new_text = "\n".join(lines)
+                if sum(estimate_tokens(l) for l in lines) > SUMMARY_CHUNK_TOKENS:
+                    # A long backlog (e.g. after an LLM outage) is condensed first
+                    new_text = await summarize_lines(lines)
+                response = await chat_completion(
+                    "summary",
+                    model="gpt-4o",
+                    messages=[
+                        {"role": "system", "content": f"{SUMMARY_SYSTEM_PROMPT}\n{ROLLING_PROMPT}"},
+                        {"role": "user", "content": f"Existing summary:\n{self.summary or '(none)'}\n\nNew transcript:\n{new_text}"}
+                    ],
+                    max_tokens=MEETING_SUMMARY_MAX_TOKENS,
+                    temperature=0.3
+                )
+                summary = response.choices[0].message.content.strip()
+            except Exception as e:
+                if raise_errors:
+                    raise
+                logger.warning(f"Rolling summary update failed; {count} lines stay pending: {e}")
+                return
+
+            self.summary = summary
+            del self.pending[:count]
+            self.covered += count
+            self.updates += 1
+
+    async def flush(self) -> str:
+        """Fold all pending lines and return the up-to-date summary."""
+        await self._update(raise_errors=True)
+        return self.summary
+
+
+class MeetingSummaries:
+    """Rolling summaries shared by all sockets of a meeting.
+
+    `/mic` and `/speaker` run as separate websockets for the same session, so
+    summaries are keyed by (user, client, session) and reference counted.
+    When the last socket closes the remaining lines are folded in the
+    background and the summary is kept for `ttl` seconds for `/summarize`.
+    """
+
+    def __init__(self, ttl: float = MEETING_SUMMARY_TTL, max_meetings: int = MEETING_SUMMARY_MAX_MEETINGS):
+        self.ttl = ttl
+        self.max_meetings = max_meetings
+        self.meetings: Dict[MeetingKey, RollingSummary] = {}
+        self.refs: Dict[MeetingKey, int] = {}
+        self.released_at: Dict[MeetingKey, float] = {}
+
+    def _evict(self):
+        now = time.monotonic()
+        idle = sorted(
+            (at, key) for key, at in self.released_at.items() if self.refs.get(key, 0) == 0
+        )
+        for at, key in idle:
+            if now - at < self.ttl and len(self.meetings) <= self.max_meetings:
+                break
+            self.meetings.pop(key, None)
+            self.refs.pop(key, None)
+            self.released_at.pop(key, None)
+
+    def acquire(self, session_info: Dict[str, str]) -> RollingSummary:
+        self._evict()
+        key = meeting_key(session_info)
+        rolling = self.meetings.get(key)
+        if rolling is None:
+            rolling = self.meetings[key] = RollingSummary()
+        self.refs[key] = self.refs.get(key, 0) + 1
+        self.released_at.pop(key, None)
+        rolling.start()
+        return rolling
+
+    def release(self, session_info: Dict[str, str]):
+        key = meeting_key(session_info)
+        rolling = self.meetings.get(key)
+        if rolling is None:
+            return
+        self.refs[key] = max(self.refs.get(key, 1) - 1, 0)
+        if self.refs[key] == 0:
+            rolling.stop()
+            self.released_at[key] = time.monotonic()
+            if rolling.pending:
+                rolling._schedule()
+
+    def get(self, session_info: Dict[str, str]) -> Optional[RollingSummary]:
+        self._evict()
+        return self.meetings.get(meeting_key(session_info))
+
+
+meeting_summaries = MeetingSummaries()
@@ -0,0 +1,133 @@
+# app/metrics.py
+
+import os
+import time
+import logging
+import weakref
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Log a per-session latency breakdown when a websocket closes
+LATENCY_SUMMARY = os.getenv("LATENCY_SUMMARY", "false").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_LATENCY = Histogram(
+    "advisor_stage_latency_seconds",
+    "Time from the previous pipeline stage to this one",
+    ["source", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+SEGMENT_LATENCY = Histogram(
+    "advisor_segment_latency_seconds",
+    "Time from the end of a segment's audio to a client-visible milestone",
+    ["source", "milestone"],
+    buckets=LATENCY_BUCKETS,
+)
+ACTIVE_SESSIONS = Gauge("advisor_active_sessions", "Open audio websocket sessions", ["source"])
+AUDIO_QUEUE_BYTES = Gauge("advisor_audio_queue_bytes", "Audio buffered ahead of the recognizer")
+RESPONSE_QUEUE_DEPTH = Gauge("advisor_response_queue_depth", "Recognizer responses awaiting processing")
+LLM_TOKENS = Counter("advisor_llm_tokens_total", "OpenAI tokens used", ["endpoint", "kind"])
+DB_QUERY_LATENCY = Histogram(
+    "advisor_db_query_seconds",
+    "Supabase query latency",
+    ["op"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_ERRORS = Counter("advisor_db_errors_total", "Failed Supabase queries", ["op"])
+ANSWER_CACHE_LOOKUPS = Counter(
+    "advisor_answer_cache_lookups_total",
+    "Assistant answer cache lookups",
+    ["result"],
+)
+INTENT_GATE_DECISIONS = Counter(
+    "advisor_intent_gate_decisions_total",
+    "Transcribed segments classified by the intent gate",
+    ["decision"],
+)
+
+# Live AudioProcessors, for the queue gauges
+_processors = weakref.WeakSet()
+AUDIO_QUEUE_BYTES.set_function(lambda: sum(p.audio_buffer.size for p in list(_processors)))
+RESPONSE_QUEUE_DEPTH.set_function(lambda: sum(p.response_queue.qsize() for p in list(_processors)))
+
+
+def track_processor(processor):
+    _processors.add(processor)
+
+
+def record_llm_usage(endpoint: str, usage):
+    if usage is None:
+        return
+    LLM_TOKENS.labels(endpoint, "prompt").inc(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(endpoint, "completion").inc(usage.completion_tokens or 0)
+
+
+class SessionLatency:
+    """Latency samples for one websocket session, summarized on disconnect."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def observe(self, stage: str, seconds: float):
+        self.samples[stage].append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for stage, values in self.samples.items():
+            values = sorted(values)
+            pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+            out[stage] = {
+                "n": len(values),
+                "p50_ms": round(pick(0.5) * 1000, 1),
+                "p95_ms": round(pick(0.95) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1),
+            }
+        return out
+
+    def log(self):
+        if LATENCY_SUMMARY and self.samples:
+            logger.info(f"{self.source} latency summary: {self.summary()}")
+
+
+class SegmentTrace:
+    """Monotonic timestamps of one transcript segment through the pipeline.
+
+    The trace starts when the segment's last audio was sent to the
+    recognizer. Each `mark` records how long the stage took since the
+    previous mark; `milestone` records time since the start.
+    """
+
+    def __init__(self, source: str, session: Optional[SessionLatency] = None, started_at: Optional[float] = None):
+        self.source = source
+        self.session = session
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self.marks = [("audio_sent", self.started_at)]
+
+    def mark(self, stage: str):
+        now = time.monotonic()
+        elapsed = now - self.marks[-1][1]
+        self.marks.append((stage, now))
+        STAGE_LATENCY.labels(self.source, stage).observe(elapsed)
+        if self.session is not None:
+            self.session.observe(stage, elapsed)
+
+    def milestone(self, name: str):
+        elapsed = time.monotonic() - self.started_at
+        SEGMENT_LATENCY.labels(self.source, name).observe(elapsed)
+        if self.session is not None:
+            self.session.observe(f"e2e_{name}", elapsed)
+
+    def fork(self) -> "SegmentTrace":
+        """Copy for one of several segments finalized in the same response."""
+        trace = SegmentTrace(self.source, self.session, self.started_at)
+        trace.marks = list(self.marks)
+        return trace
+
+    def as_dict(self) -> Dict[str, float]:
+        return {stage: round(t - self.started_at, 4) for stage, t in self.marks}
@@ -0,0 +1,176 @@
+# app/processors/assistant.py
+
+import json
+import logging
+from typing import Optional
+
+import openai
+from fastapi import WebSocket
+
+from app.db import save_openai_response
+from app.llm import LLMUnavailableError, stream_chat_completion
+from app.search import web_search
+from app.answer_cache import answer_cache
+from app.processors.intent_gate import intent_gate
+from app.metrics import SegmentTrace
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = """UK Financial Advisor Assistant Rules
+    Input Recognition
+    If the input contains a client question or query (e.g., a question, request, or topic related to financial advice, including detailed scenarios or multi-part inquiries), address it comprehensively with real, up-to-date information relevant to the UK financial context.
+    If the input is solely a greeting, personal question about the AI or user (e.g., 'How are you?' or 'Who are you?'), or generic comment without a client question or query, respond with: <br></br>Waiting for the client's query.
+    Do not acknowledge greetings or personal questions unrelated to a substantive client question or query.
+    Comprehensive Query Handling
+    Focus solely on the most recent client question or query.
+    Respond to queries to the best of your abilities, using real, up-to-date UK financial information.
+    Extract and use relevant details provided in the query (e.g., client age, income, or investment goals).
+    Provide informative, accurate responses based on current UK financial regulations, products, and market conditions, breaking down complex or scenario-based queries into clear sections.
+    If the query is unclear or lacks critical details (e.g., missing client age or financial circumstances), respond with: <h4>Clarification Needed</h4>
+    Use web search results or X posts if additional up-to-date information is required to support the response.
+    HTML Formatting Requirements
+    Format BOTH the client’s query and your response using HTML.
+    Present the original query in italics at the beginning of your response.
+    Use <h3> or <h4> for section headers to organize responses (e.g., Eligibility, Options, Next Steps).
+    Use <b></b> for bold, <i></i> for italics, and <u></u> to emphasize key points.
+    NEVER use markdown formatting like bold, italics, or underline.
+    Always use HTML tags instead of markdown syntax.
+    Use <br></br> for line breaks between paragraphs and sections.
+    Use <ul> and <li> tags for unordered lists (e.g., investment options or tax conditions).
+    Use <ol> and <li> tags for ordered/numbered lists (e.g., steps to access a pension).
+    Use <code></code> for inline code snippets (e.g., tax calculations).
+    Use <pre><code></code></pre> for multi-line code blocks.
+    Structure all responses for optimal readability, especially for detailed or multi-part financial queries.
+    Code and Technical Content Guidelines
+    Never use raw triple backticks (```).
+    Never use markdown code blocks.
+    Provide code only when directly relevant to the client’s query (e.g., mortgage interest calculations or tax band thresholds).
+    When sharing code, always use proper HTML code tags.
+    For technical or procedural queries (e.g., ISA contribution limits), provide step-by-step explanations grounded in current UK financial rules.
+    Response Quality Standards
+    Highlight important information with appropriate HTML formatting only (e.g., <b>key deadlines</b> or <u>tax implications</u>).
+    Use examples or scenarios to illustrate complex financial concepts when helpful (e.g., pension withdrawal options or inheritance tax planning).
+    Break down complex responses into digestible sections, especially for queries with multiple elements or personal financial details.
+    Strict Output Behavior
+    If a client question or query is detected, respond to it properly with clear HTML formatting, addressing all relevant aspects using real, up-to-date UK financial information.
+    If no client question or query is detected (e.g., only greetings or personal questions about the AI/user), respond only with: <br></br>Waiting for the client's query."""
+
+WAITING_REPLY = "<br></br>Waiting for the client's query."
+ERROR_REPLY = "<h4>Error</h4><br></br>Sorry, I couldn’t process that at the moment."
+BUSY_REPLY = "<h4>Rate Limit</h4><br></br>The service is busy; please try again shortly."
+
+
+async def _send(websocket: WebSocket, msg_type: str, content: str):
+    await websocket.send_text(json.dumps({
+        "type": msg_type,
+        "content": content
+    }))
+
+
+async def stream_openai_response(
+    input_text: str,
+    session_info: dict,
+    websocket: WebSocket,
+    use_intent_gate: bool = True,
+    trace: Optional[SegmentTrace] = None
+) -> str:
+    """Search, stream the gpt-4o reply to the client as deltas, then persist it.
+
+    Each streamed chunk is sent as an `openai_assistant_delta` message and the
+    reply is closed with `openai_assistant_completed`. Returns the full reply.
+    Input the intent gate classifies as a non-query gets the canned waiting
+    reply without any search or LLM call, and questions already answered
+    for the same tenant are served from the answer cache.
+
+    Stage timings are recorded on `trace`; typed input without one gets a
+    fresh ``text_input`` trace.
+    """
+    trace = trace or SegmentTrace("text_input")
+    if use_intent_gate and not intent_gate.is_query(input_text):
+        await _send(websocket, "openai_assistant_delta", WAITING_REPLY)
+        await _send(websocket, "openai_assistant_completed", "")
+        return WAITING_REPLY
+    trace.mark("intent_gate")
+
+    tenant = session_info.get("tenant_id") or session_info["user_id"]
+    cached = answer_cache.get(tenant, input_text)
+    trace.mark("answer_cache")
+    if cached is not None:
+        logger.info(f"[ANSWER CACHE] hit for: {input_text[:80]}")
+        await _send(websocket, "openai_assistant_delta", cached)
+        await _send(websocket, "openai_assistant_completed", "")
+        trace.mark("answer_sent")
+        trace.milestone("answer")
+        await _persist(cached, session_info)
+        return cached
+
+    parts = []
+    completed = False
+    try:
+        search_results = await web_search.search(input_text)
+        trace.mark("search")
+
+        async with stream_chat_completion(
+            "assistant",
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": input_text},
+                {"role": "system", "content": f"Web Search Results:\n{search_results}"}
+            ],
+            max_tokens=2048,
+            temperature=0.7,
+            top_p=1.0
+        ) as stream:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if not parts:
+                    delta = delta.lstrip()
+                    if not delta:
+                        continue
+                    trace.mark("llm_first_token")
+                parts.append(delta)
+                await _send(websocket, "openai_assistant_delta", delta)
+        completed = True
+
+    except (LLMUnavailableError, openai.RateLimitError) as e:
+        logger.warning(f"OpenAI unavailable: {e}")
+        if not parts:
+            parts.append(BUSY_REPLY)
+            await _send(websocket, "openai_assistant_delta", BUSY_REPLY)
+
+    except Exception as e:
+        logger.error(f"OpenAI error: {e}")
+        if not parts:
+            parts.append(ERROR_REPLY)
+            await _send(websocket, "openai_assistant_delta", ERROR_REPLY)
+
+    await _send(websocket, "openai_assistant_completed", "")
+    if completed:
+        trace.mark("llm_complete")
+        trace.milestone("answer")
+
+    content = "".join(parts).strip()
+    logger.info(f"[AI RESPONSE] {content[:100]}...")
+
+    if completed and content and content != WAITING_REPLY:
+        answer_cache.put(tenant, input_text, content)
+        await _persist(content, session_info)
+
+    return content
+
+
+async def _persist(content: str, session_info: dict):
+    try:
+        await save_openai_response(
+            user_id=session_info["user_id"],
+            client_id=session_info["client_id"],
+            session_id=session_info["session_id"],
+            response_text=content
+        )
+    except Exception as e:
+        logger.error(f"Failed to save OpenAI response: {e}")
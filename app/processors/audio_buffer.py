@@ -0,0 +1,189 @@
+# app/processors/audio_buffer.py
+import os, asyncio, logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# ~100 ms of 16 kHz LINEAR16 per StreamingRecognizeRequest
+AUDIO_FRAME_BYTES = int(os.getenv("AUDIO_FRAME_BYTES", "3200"))
+# Flush a partial frame once its first byte has waited this long
+AUDIO_FRAME_LINGER = float(os.getenv("AUDIO_FRAME_LINGER", "0.1"))
+AUDIO_BUFFER_BYTES = int(os.getenv("AUDIO_BUFFER_BYTES", str(32000 * 10)))
+AUDIO_OVERFLOW_POLICY = os.getenv("AUDIO_OVERFLOW_POLICY", "drop_oldest")
+
+OVERFLOW_POLICIES = ("drop_oldest", "pause")
+
+
+class AudioBuffer:
+    """Bounded byte ring buffer that coalesces small writes into frames.
+
+    With ``drop_oldest`` a full buffer discards the oldest audio to make
+    room. With ``pause`` writes are never dropped; instead
+    `wait_writable` blocks until the reader drains below capacity, so the
+    websocket stops being read and TCP pushes back on the client.
+    """
+
+    def __init__(
+        self,
+        capacity: int = AUDIO_BUFFER_BYTES,
+        frame_bytes: int = AUDIO_FRAME_BYTES,
+        linger: float = AUDIO_FRAME_LINGER,
+        policy: str = AUDIO_OVERFLOW_POLICY,
+    ):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audio overflow policy: {policy}")
+        self.limit = capacity
+        self.capacity = capacity
+        self.frame_bytes = frame_bytes
+        self.linger = linger
+        self.policy = policy
+        self._buf = bytearray(capacity)
+        self._head = 0
+        self.size = 0
+        self.closed = False
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._first_byte_at: Optional[float] = None
+
+        # Per-session metrics
+        self.bytes_in = 0
+        self.bytes_dropped = 0
+        self.frames_out = 0
+        self.high_watermark = 0
+        self._drop_logged = 0
+        # How long the last frame read had waited in the buffer
+        self.last_wait = 0.0
+
+    def _copy_in(self, data: memoryview):
+        tail = (self._head + self.size) % self.capacity
+        first = min(len(data), self.capacity - tail)
+        self._buf[tail:tail + first] = data[:first]
+        if first < len(data):
+            self._buf[:len(data) - first] = data[first:]
+        self.size += len(data)
+
+    def _copy_out(self, n: int) -> bytes:
+        first = min(n, self.capacity - self._head)
+        out = bytes(self._buf[self._head:self._head + first])
+        if first < n:
+            out += bytes(self._buf[:n - first])
+        self._head = (self._head + n) % self.capacity
+        self.size -= n
+        return out
+
+    def _discard(self, n: int):
+        self._head = (self._head + n) % self.capacity
+        self.size -= n
+
+    def write(self, data: bytes):
+        if self.closed or not data:
+            return
+        view = memoryview(data)
+        self.bytes_in += len(view)
+
+        overflow = self.size + len(view) - self.limit
+        if overflow > 0:
+            if self.policy == "drop_oldest":
+                if len(view) >= self.limit:
+                    # Keep only the newest limit's worth of the write itself
+                    skip = len(view) - self.limit
+                    skip += skip % 2
+                    self.bytes_dropped += self.size + skip
+                    self._discard(self.size)
+                    view = view[skip:]
+                    self._log_drop()
+                else:
+                    overflow += overflow % 2  # stay on a 16-bit sample boundary
+                    overflow = min(overflow, self.size)
+                    self._discard(overflow)
+                    self.bytes_dropped += overflow
+                    self._log_drop()
+            elif self.size + len(view) > self.capacity:
+                # pause: the write that crossed the limit is kept, not lost
+                self._grow(self.size + len(view))
+
+        if self.size == 0:
+            self._first_byte_at = asyncio.get_running_loop().time()
+        self._copy_in(view)
+        self.high_watermark = max(self.high_watermark, self.size)
+        self._readable.set()
+        if self.policy == "pause" and self.size >= self.limit:
+            self._writable.clear()
+
+    def _log_drop(self):
+        # Once per second of dropped audio is plenty
+        if self.bytes_dropped // 32000 != self._drop_logged:
+            self._drop_logged = self.bytes_dropped // 32000
+            logger.warning(f"Audio buffer overflow: {self.bytes_dropped} bytes dropped so far")
+
+    def _grow(self, needed: int):
+        data = self._copy_out(self.size)
+        self.capacity = max(needed, self.capacity * 2)
+        self._buf = bytearray(self.capacity)
+        self._head = 0
+        self.size = 0
+        self._copy_in(memoryview(data))
+
+    async def wait_writable(self):
+        """Block while a ``pause`` buffer is full; returns at once otherwise."""
+        if not self.closed:
+            await self._writable.wait()
+
+    def close(self):
+        self.closed = True
+        self._readable.set()
+        self._writable.set()
+
+    async def read(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """Return the next frame of up to `frame_bytes`.
+
+        Waits until a full frame is buffered or the oldest byte has lingered
+        for `linger` seconds. Returns ``b""`` on timeout and ``None`` once the
+        buffer is closed and drained.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        while True:
+            if self.size >= self.frame_bytes:
+                return self._take(self.frame_bytes)
+            if self.size and (self.closed or loop.time() - self._first_byte_at >= self.linger):
+                return self._take(self.size - self.size % 2 or self.size)
+            if self.closed:
+                return None
+
+            wait = None if deadline is None else deadline - loop.time()
+            if self.size:
+                flush_in = self._first_byte_at + self.linger - loop.time()
+                wait = flush_in if wait is None else min(wait, flush_in)
+            if wait is not None and wait <= 0:
+                if deadline is not None and loop.time() >= deadline:
+                    return b""
+                continue
+
+            self._readable.clear()
+            try:
+                await asyncio.wait_for(self._readable.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                if deadline is not None and loop.time() >= deadline and not self.size:
+                    return b""
+
+    def _take(self, n: int) -> bytes:
+        frame = self._copy_out(n)
+        self.frames_out += 1
+        now = asyncio.get_running_loop().time()
+        self.last_wait = now - self._first_byte_at
+        self._first_byte_at = now if self.size else None
+        if self.size < self.limit:
+            self._writable.set()
+        return frame
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "depth_bytes": self.size,
+            "high_watermark_bytes": self.high_watermark,
+            "bytes_in": self.bytes_in,
+            "bytes_dropped": self.bytes_dropped,
+            "frames_out": self.frames_out,
+        }
@@ -0,0 +1,166 @@
+# app/processors/audio_format.py
+from typing import List, Tuple
+
+import numpy as np
+from google.cloud import speech_v1p1beta1 as speech
+
+Encoding = speech.RecognitionConfig.AudioEncoding
+
+# Client-facing encoding names -> (Google encoding, is compressed)
+SUPPORTED_ENCODINGS = {
+    "linear16": (Encoding.LINEAR16, False),
+    "webm_opus": (Encoding.WEBM_OPUS, True),
+    "ogg_opus": (Encoding.OGG_OPUS, True),
+}
+PCM_SAMPLE_RATES = (8000, 16000, 22050, 24000, 32000, 44100, 48000)
+OPUS_SAMPLE_RATE = 48000
+
+# Element/page markers where a compressed stream can be resumed
+_BOUNDARY_MARKERS = {
+    "webm_opus": b"\x1f\x43\xb6\x75",  # Matroska Cluster element ID
+    "ogg_opus": b"OggS",               # Ogg page capture pattern
+}
+# Ogg Opus carries two header pages (OpusHead, OpusTags) before audio
+_HEADER_BOUNDARIES = {"webm_opus": 0, "ogg_opus": 2}
+
+
+class AudioFormat:
+    """Audio format negotiated from the websocket handshake query string."""
+
+    def __init__(self, encoding: str = "linear16", sample_rate: int = 16000):
+        encoding = encoding.lower()
+        if encoding not in SUPPORTED_ENCODINGS:
+            raise ValueError(
+                f"Unsupported encoding '{encoding}'; expected one of {', '.join(SUPPORTED_ENCODINGS)}"
+            )
+        self.encoding = encoding
+        self.google_encoding, self.compressed = SUPPORTED_ENCODINGS[encoding]
+        if self.compressed:
+            # Opus always decodes at 48 kHz regardless of the capture rate
+            self.sample_rate = OPUS_SAMPLE_RATE
+        elif sample_rate not in PCM_SAMPLE_RATES:
+            raise ValueError(
+                f"Unsupported sample rate {sample_rate}; expected one of {PCM_SAMPLE_RATES}"
+            )
+        else:
+            self.sample_rate = sample_rate
+
+    def __repr__(self):
+        return f"AudioFormat({self.encoding}, {self.sample_rate} Hz)"
+
+
+def _lowpass(cutoff: float, taps: int) -> np.ndarray:
+    """Hamming-windowed sinc low-pass; `cutoff` is in cycles per input sample."""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (h / h.sum()).astype(np.float32)
+
+
+class StreamingResampler:
+    """Chunk-by-chunk LINEAR16 resampler.
+
+    Anti-alias filters (when downsampling) then linearly interpolates,
+    carrying filter history, the fractional read position and any odd
+    trailing byte between calls so chunk boundaries are seamless.
+    """
+
+    def __init__(self, in_rate: int, out_rate: int = 16000, taps: int = 31):
+        self.step = in_rate / out_rate
+        self.fir = _lowpass(0.45 / self.step, taps) if in_rate > out_rate else None
+        self._fir_history = np.zeros(taps - 1, dtype=np.float32)
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._pos = 0.0
+        self._odd = b""
+
+    def process(self, data: bytes) -> bytes:
+        data = self._odd + data
+        cut = len(data) - len(data) % 2
+        self._odd = data[cut:]
+        if not cut:
+            return b""
+
+        x = np.frombuffer(data[:cut], dtype=np.int16).astype(np.float32)
+        if self.fir is not None:
+            padded = np.concatenate((self._fir_history, x))
+            self._fir_history = padded[-len(self._fir_history):]
+            x = np.convolve(padded, self.fir, mode="valid")
+
+        buf = np.concatenate((self._carry, x))
+        last = len(buf) - 1
+        if last < self._pos:
+            self._carry = buf
+            return b""
+
+        count = int((last - self._pos) // self.step) + 1
+        idx = self._pos + self.step * np.arange(count)
+        i0 = idx.astype(np.int64)
+        frac = (idx - i0).astype(np.float32)
+        out = buf[i0] * (1 - frac) + buf[np.minimum(i0 + 1, last)] * frac
+
+        next_pos = self._pos + self.step * count
+        # Keep the last sample: the next output may interpolate from it
+        drop = min(int(next_pos), last)
+        self._carry = buf[drop:]
+        self._pos = next_pos - drop
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16).tobytes()
+
+
+class ContainerFramer:
+    """Tracks the header and resumable boundaries of a compressed stream.
+
+    Google needs the container header at the start of every streaming call,
+    so after a rotation we replay the header followed by data from a
+    Cluster (WebM) or page (Ogg) boundary.
+    """
+
+    def __init__(self, encoding: str):
+        self.marker = _BOUNDARY_MARKERS[encoding]
+        self.header_boundaries = _HEADER_BOUNDARIES[encoding]
+        self.header = b""
+        self.header_done = False
+        self._boundaries = 0
+        self._pending = b""
+
+    @property
+    def pending(self) -> bytes:
+        """Bytes already sent to Google but not yet split into pieces."""
+        return self._pending
+
+    def _find_all(self, data: bytes, limit: int) -> List[int]:
+        found = []
+        i = data.find(self.marker)
+        while 0 <= i < limit:
+            found.append(i)
+            i = data.find(self.marker, i + 1)
+        return found
+
+    def feed(self, chunk: bytes) -> List[Tuple[bytes, bool]]:
+        """Split `chunk` at boundaries.
+
+        Returns ``(piece, starts_at_boundary)`` pairs of audio data. Header
+        bytes are absorbed into `header` instead. The last few bytes are held
+        back until the next call so a marker split across chunks is still
+        found.
+        """
+        data = self._pending + chunk
+        emit_upto = max(0, len(data) - (len(self.marker) - 1))
+        self._pending = data[emit_upto:]
+
+        cuts = set(self._find_all(data, emit_upto))
+        edges = sorted(cuts | {0}) + [emit_upto]
+        out = []
+        for start, end in zip(edges, edges[1:]):
+            at_boundary = start in cuts
+            if at_boundary:
+                self._boundaries += 1
+            if end <= start:
+                continue
+            piece = data[start:end]
+            if not self.header_done:
+                if at_boundary and self._boundaries > self.header_boundaries:
+                    self.header_done = True
+                else:
+                    self.header += piece
+                    continue
+            out.append((piece, at_boundary))
+        return out
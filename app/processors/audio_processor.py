@@ -1,65 +1,317 @@
 # app/processors/audio_processor.py
-import queue, threading, asyncio, logging
+import os, asyncio, logging, time
+from collections import deque
+from typing import Optional
 from google.cloud import speech_v1p1beta1 as speech
+from .audio_buffer import AudioBuffer
+from .vad import VoiceActivityDetector
+from .audio_format import AudioFormat, ContainerFramer, StreamingResampler
+from .stt_backends import SpeechBackend, create_backend
+from app.metrics import ACTIVE_SESSIONS, STAGE_LATENCY, SegmentTrace, SessionLatency, track_processor
 
 logger = logging.getLogger(__name__)
 
+# PCM input is always resampled to this before VAD and recognition
+SAMPLE_RATE = 16000
+BYTES_PER_SECOND = SAMPLE_RATE * 2  # LINEAR16 mono
+
+# Google caps a streaming_recognize call at ~5 minutes; rotate well before it
+STREAM_ROTATE_SECONDS = float(os.getenv("STT_ROTATE_SECONDS", "270"))
+STREAM_OVERLAP_SECONDS = float(os.getenv("STT_OVERLAP_SECONDS", "2.0"))
+RECONNECT_BACKOFF_BASE = 0.5
+RECONNECT_BACKOFF_MAX = 10.0
+
+# One backend (for Google, one gRPC channel) serves every session's stream
+_speech_client: Optional[SpeechBackend] = None
+
+
+def get_speech_client() -> SpeechBackend:
+    """Return the shared recognizer backend; must be called inside the event loop."""
+    global _speech_client
+    if _speech_client is None:
+        _speech_client = create_backend()
+    return _speech_client
+
+
+async def close_speech_client():
+    """Close the shared backend; called on application shutdown."""
+    global _speech_client
+    if _speech_client is not None:
+        await _speech_client.close()
+        _speech_client = None
+
+
 class AudioProcessor:
-    def __init__(self, source_name: str, min_speaker_count=1, max_speaker_count=2):
+    def __init__(
+        self,
+        source_name: str,
+        min_speaker_count=1,
+        max_speaker_count=2,
+        audio_format: Optional[AudioFormat] = None,
+        interim_results: bool = False
+    ):
         self.source_name = source_name
-        self.audio_queue = queue.Queue()
+        self.interim_results = interim_results
+        self.format = audio_format or AudioFormat()
+        self.resampler = None
+        self.vad = None
+        self.framer = None
+        if self.format.compressed:
+            # Opus goes to Google as-is; only container boundaries are tracked.
+            # Dropping bytes would cut pages in half and corrupt the stream, so
+            # a full buffer pushes back on the client instead.
+            self.audio_buffer = AudioBuffer(policy="pause")
+            self.framer = ContainerFramer(self.format.encoding)
+        else:
+            self.audio_buffer = AudioBuffer()
+            if self.format.sample_rate != SAMPLE_RATE:
+                self.resampler = StreamingResampler(self.format.sample_rate, SAMPLE_RATE)
+            self.vad = VoiceActivityDetector(source_name, sample_rate=SAMPLE_RATE)
         self.response_queue = asyncio.Queue()
-        self.thread = None
-        self.loop = None
+        self.task: Optional[asyncio.Task] = None
         self.running = False
         self.min_speaker_count = min_speaker_count
         self.max_speaker_count = max_speaker_count
 
-    def start(self, loop: asyncio.AbstractEventLoop):
-        self.loop = loop
+        # Recent audio replayed into the next stream so no words are lost at a seam
+        self.overlap_bytes = int(STREAM_OVERLAP_SECONDS * BYTES_PER_SECOND)
+        self.overlap = deque()  # (position seconds, chunk, starts at container boundary)
+        self.overlap_size = 0
+        self.bytes_sent = 0
+        self.started_at: Optional[float] = None
+        self.stream_offset = 0.0
+        self.seam_until = 0.0
+        self.last_final_end = 0.0
+        self.last_final_text = ""
+        self.rotations = 0
+        self.reconnects = 0
+
+        # (session position at end of frame, monotonic send time) for latency traces
+        self.sent_times = deque(maxlen=1200)
+        self.latency = SessionLatency(source_name)
+        track_processor(self)
+
+    def start(self):
         self.running = True
-        self.thread = threading.Thread(target=self._google_streaming, daemon=True)
-        self.thread.start()
+        ACTIVE_SESSIONS.labels(self.source_name).inc()
+        self.task = asyncio.create_task(self._google_streaming())
 
     def stop(self):
+        if self.running:
+            ACTIVE_SESSIONS.labels(self.source_name).dec()
         self.running = False
-        self.audio_queue.put(None)
-        if self.thread and self.thread.is_alive():
-            self.thread.join(timeout=5)
+        self.audio_buffer.close()
+        if self.task and not self.task.done():
+            self.task.cancel()
+        logger.info(f"{self.source_name} audio stats: {self.stats()}")
+        self.latency.log()
 
     def add_audio(self, audio_data: bytes):
-        if self.running:
-            self.audio_queue.put(audio_data)
+        if not self.running:
+            return
+        if self.framer is not None:
+            self.audio_buffer.write(audio_data)
+            return
+        if self.resampler is not None:
+            audio_data = self.resampler.process(audio_data)
+        # Silence is dropped here so it never reaches (or is billed by) Google
+        voiced = self.vad.process(audio_data)
+        if voiced:
+            self.audio_buffer.write(voiced)
+
+    async def wait_writable(self):
+        """Wait for room in the audio buffer before reading more from the client."""
+        await self.audio_buffer.wait_writable()
 
-    def _google_streaming(self):
+    def stats(self):
+        return {
+            **self.audio_buffer.stats(),
+            **(self.vad.stats() if self.vad else {}),
+            "rotations": self.rotations,
+            "reconnects": self.reconnects,
+        }
+
+    def _streaming_config(self):
         diarization_config = speech.SpeakerDiarizationConfig(
             enable_speaker_diarization=True,
             min_speaker_count=self.min_speaker_count,
             max_speaker_count=self.max_speaker_count,
         )
         config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=16000,
+            encoding=self.format.google_encoding,
+            sample_rate_hertz=self.format.sample_rate if self.framer else SAMPLE_RATE,
             language_code="en-US",
             diarization_config=diarization_config,
             model="video",
             enable_automatic_punctuation=True,
         )
-        streaming_config = speech.StreamingRecognitionConfig(
+        return speech.StreamingRecognitionConfig(
             config=config,
-            interim_results=False,
+            interim_results=self.interim_results,
         )
 
-        def requests():
-            while True:
-                chunk = self.audio_queue.get()
-                if chunk is None:
+    def _position(self) -> float:
+        """Seconds of session audio sent so far.
+
+        PCM is measured exactly from the byte count; compressed audio is
+        streamed in real time, so arrival time is used instead.
+        """
+        if self.framer is None:
+            return self.bytes_sent / BYTES_PER_SECOND
+        if self.started_at is None:
+            return 0.0
+        return time.monotonic() - self.started_at
+
+    def _remember(self, chunk: bytes):
+        """Record newly sent audio and keep the trailing overlap for replay."""
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        pos = self._position()
+        self.bytes_sent += len(chunk)
+        self.sent_times.append((self._position(), time.monotonic()))
+
+        if self.framer is None:
+            self.overlap.append((pos, chunk, False))
+            self.overlap_size += len(chunk)
+            while self.overlap and self.overlap_size - len(self.overlap[0][1]) >= self.overlap_bytes:
+                self.overlap_size -= len(self.overlap.popleft()[1])
+            return
+
+        for piece, at_boundary in self.framer.feed(chunk):
+            self.overlap.append((pos, piece, at_boundary))
+            self.overlap_size += len(piece)
+        # Replay must start on a boundary: keep from the newest one that is
+        # at least STREAM_OVERLAP_SECONDS old
+        cutoff = self._position() - STREAM_OVERLAP_SECONDS
+        while True:
+            later = next(
+                (i for i, (p, _, b) in enumerate(self.overlap) if b and i > 0 and p <= cutoff),
+                None
+            )
+            if later is None:
+                break
+            for _ in range(later):
+                self.overlap_size -= len(self.overlap.popleft()[1])
+
+    def _begin_stream(self):
+        """Mark where a new stream starts on the session's audio timeline.
+
+        Returns the chunks to replay at the start of the stream: the recent
+        overlap, preceded by the container header for compressed audio.
+        """
+        now = self._position()
+        self.stream_offset = self.overlap[0][0] if self.overlap else now
+        self.seam_until = now + STREAM_OVERLAP_SECONDS
+        replay = [chunk for _, chunk, _ in self.overlap]
+        if self.framer is not None:
+            if self.framer.header:
+                replay.insert(0, self.framer.header)
+            if self.framer.pending:
+                replay.append(self.framer.pending)
+        return replay
+
+    def _sent_at(self, position: float) -> Optional[float]:
+        """When the audio up to `position` (session seconds) went out."""
+        for end, sent_at in self.sent_times:
+            if end >= position:
+                return sent_at
+        return self.sent_times[-1][1] if self.sent_times else None
+
+    def _trace(self, response) -> SegmentTrace:
+        ends = [r.result_end_time.total_seconds() for r in response.results]
+        trace = SegmentTrace(
+            self.source_name,
+            self.latency,
+            self._sent_at(self.stream_offset + max(ends, default=0.0))
+        )
+        trace.mark("stt_result")
+        return trace
+
+    def _dedupe_seam(self, response):
+        """Drop or trim final results that repeat audio already transcribed
+        by the previous stream (the replayed overlap)."""
+        kept = []
+        for result in response.results:
+            if not result.is_final or not result.alternatives:
+                kept.append(result)
+                continue
+
+            end = self.stream_offset + result.result_end_time.total_seconds()
+            alt = result.alternatives[0]
+            if end <= self.seam_until and self.last_final_text:
+                if end <= self.last_final_end + 0.05:
+                    logger.debug(f"{self.source_name}: dropped seam duplicate '{alt.transcript}'")
+                    continue
+                alt.transcript = _trim_overlap(self.last_final_text, alt.transcript)
+                if not alt.transcript.strip():
+                    continue
+
+            self.last_final_end = max(self.last_final_end, end)
+            self.last_final_text = alt.transcript
+            kept.append(result)
+
+        if len(kept) != len(response.results):
+            del response.results[:]
+            response.results.extend(kept)
+        return response
+
+    async def _google_streaming(self):
+        streaming_config = self._streaming_config()
+        client = get_speech_client()
+        loop = asyncio.get_running_loop()
+        attempt = 0
+
+        while self.running:
+            deadline = loop.time() + STREAM_ROTATE_SECONDS
+            replay = self._begin_stream()
+
+            async def requests():
+                yield speech.StreamingRecognizeRequest(streaming_config=streaming_config)
+                for chunk in replay:
+                    yield speech.StreamingRecognizeRequest(audio_content=chunk)
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        return
+                    chunk = await self.audio_buffer.read(timeout=remaining)
+                    if chunk is None:
+                        self.running = False
+                        return
+                    if not chunk:
+                        return
+                    logger.debug(f"{self.source_name}: sending {len(chunk)} byte frame")
+                    STAGE_LATENCY.labels(self.source_name, "audio_queue").observe(self.audio_buffer.last_wait)
+                    self._remember(chunk)
+                    yield speech.StreamingRecognizeRequest(audio_content=chunk)
+
+            try:
+                stream = await client.streaming_recognize(requests(), offset=self.stream_offset)
+                async for resp in stream:
+                    attempt = 0
+                    resp = self._dedupe_seam(resp)
+                    if resp.results:
+                        self.response_queue.put_nowait((resp, self._trace(resp)))
+                if self.running:
+                    self.rotations += 1
+                    logger.info(f"{self.source_name}: rotated STT stream ({self.rotations})")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self.running:
                     break
-                logger.debug(f"{self.source_name}: got {len(chunk)} bytes")
-                yield speech.StreamingRecognizeRequest(audio_content=chunk)
-
-        try:
-            for resp in speech.SpeechClient().streaming_recognize(streaming_config, requests()):
-                self.loop.call_soon_threadsafe(self.response_queue.put_nowait, resp)
-        except Exception as e:
-            logger.error(f"{self.source_name} streaming error: {e}")
+                attempt += 1
+                self.reconnects += 1
+                delay = min(RECONNECT_BACKOFF_MAX, RECONNECT_BACKOFF_BASE * (2 ** (attempt - 1)))
+                logger.error(f"{self.source_name} streaming error: {e}; reconnecting in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+def _trim_overlap(previous: str, current: str, min_words: int = 2) -> str:
+    """Remove the leading words of `current` that repeat the tail of `previous`."""
+    prev_words = previous.split()
+    cur_words = current.split()
+    norm = lambda w: w.strip(".,?!;:").lower()
+    for size in range(min(len(prev_words), len(cur_words)), min_words - 1, -1):
+        if [norm(w) for w in prev_words[-size:]] == [norm(w) for w in cur_words[:size]]:
+            return " ".join(cur_words[size:])
+    return current
@@ -0,0 +1,113 @@
+# app/processors/intent_gate.py
+
+import os
+import re
+import logging
+from typing import Dict
+
+from app.metrics import INTENT_GATE_DECISIONS
+
+logger = logging.getLogger(__name__)
+
+INTENT_THRESHOLD = float(os.getenv("INTENT_THRESHOLD", "0.3"))
+
+# Greetings, pleasantries and questions about the AI/advisor themselves;
+# removed before scoring so "Hi, how are you?" scores as empty input.
+SMALL_TALK = re.compile(
+    r"\b("
+    r"hi|hello|hey|hiya|good (morning|afternoon|evening)|"
+    r"how are (you|things)( doing)?( today)?|how('s| is) it going|how have you been|"
+    r"(i'?m|i am) (fine|good|well|great)|not bad|"
+    r"nice to (meet|see) you|pleased to meet you|"
+    r"thanks?( you)?( very much)?|cheers|"
+    r"bye|goodbye|see you( soon| later)?|take care|"
+    r"who are you|what('s| is) your name|are you (a )?(robot|bot|ai)|"
+    r"okay|ok|right|sure|yes|yeah|no|great|lovely|perfect|"
+    r"for joining|(thank you )?for coming|the meeting today"
+    r")\b",
+    re.IGNORECASE,
+)
+
+INTERROGATIVE = re.compile(
+    r"^(what|how|when|where|which|who|whom|whose|why|"
+    r"can|could|should|would|will|shall|is|are|am|do|does|did|"
+    r"have|has|may|might|must)\b",
+    re.IGNORECASE,
+)
+
+REQUEST = re.compile(
+    r"\b(tell me|explain|advise|advice|recommend|help me|i want to|i'd like to|"
+    r"i would like to|i need to|looking (for|to)|interested in|thinking (about|of)|"
+    r"worried about|wondering|what about|compare|difference between)\b",
+    re.IGNORECASE,
+)
+
+# Word stems, so inflected forms ("inherited", "retiring", "invests") match too
+FINANCE_TERMS = re.compile(
+    r"\b(isas?|pension\w*|sipps?|annuit\w*|retir\w*|mortgag\w*|"
+    r"tax(es|ed|ing|able|ation)?|allowances?|incomes?|salar\w*|earn(s|ed|ing|ings)?|saving\w*|invest\w*|"
+    r"portfolios?|funds?|shares?|stocks?|bonds?|gilts?|dividends?|interest|rates?|"
+    r"inherit\w*|iht|estates?|trusts?|wills?|insur\w*|protection|loans?|debts?|"
+    r"credit\w*|capital gains|cgt|vat|hmrc|fca|lifetime|drawdown|premium bonds|"
+    r"vcts?|eis|benefits?|state pension|national insurance|budget\w*|inflation|"
+    r"propert(y|ies)|landlords?|rent(s|ed|ing|al)?|equity release|lump sums?|contribut\w*)\b",
+    re.IGNORECASE,
+)
+
+AMOUNT = re.compile(r"[£$€]\s?\d|\d+\s?(%|percent|k\b|pounds)", re.IGNORECASE)
+
+
+class IntentGate:
+    """Cheap in-process check for whether a segment is a client query.
+
+    Segments scoring below `threshold` are answered with the canned
+    "waiting" reply instead of a search + gpt-4o round-trip.
+    """
+
+    def __init__(self, threshold: float = INTENT_THRESHOLD):
+        self.threshold = threshold
+        self.evaluated = 0
+        self.short_circuited = 0
+
+    def score(self, text: str) -> float:
+        remainder = SMALL_TALK.sub(" ", text)
+        words = re.findall(r"[\w£$€%']+", remainder)
+        if not words:
+            return 0.0
+
+        stripped = " ".join(words)
+        score = 0.0
+        if "?" in text:
+            score += 0.5
+        if INTERROGATIVE.match(stripped):
+            score += 0.35
+        if REQUEST.search(text):
+            score += 0.35
+        score += min(0.4, 0.2 * len(FINANCE_TERMS.findall(text)))
+        if AMOUNT.search(text):
+            score += 0.1
+        if len(words) < 3 and not FINANCE_TERMS.search(text):
+            score -= 0.2
+        return max(0.0, min(1.0, score))
+
+    def is_query(self, text: str) -> bool:
+        self.evaluated += 1
+        if self.score(text) >= self.threshold:
+            INTENT_GATE_DECISIONS.labels("query").inc()
+            return True
+        self.short_circuited += 1
+        INTENT_GATE_DECISIONS.labels("short_circuit").inc()
+        logger.debug(f"[INTENT GATE] skipped: {text[:80]}")
+        return False
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "evaluated": self.evaluated,
+            "short_circuited": self.short_circuited,
+            "short_circuit_ratio": (
+                self.short_circuited / self.evaluated if self.evaluated else 0.0
+            ),
+        }
+
+
+intent_gate = IntentGate()
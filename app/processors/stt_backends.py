@@ -0,0 +1,239 @@
+# app/processors/stt_backends.py
+import os, re, time, asyncio, datetime, logging
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, List, Optional
+from google.cloud import speech_v1p1beta1 as speech
+
+logger = logging.getLogger(__name__)
+
+STT_BACKEND = os.getenv("STT_BACKEND", "google")
+STT_REPLAY_TRANSCRIPT = os.getenv("STT_REPLAY_TRANSCRIPT", "tests/transcript.txt")
+# Seconds between the end of an utterance's audio and its final result
+STT_REPLAY_LATENCY = float(os.getenv("STT_REPLAY_LATENCY", "0.3"))
+STT_REPLAY_WORDS_PER_SECOND = float(os.getenv("STT_REPLAY_WORDS_PER_SECOND", "2.5"))
+
+_SPEAKER_PREFIX = re.compile(r"^\s*([A-Za-z][\w ]{0,30}):\s*")
+
+
+class SpeechBackend(ABC):
+    """Streaming recognizer used by `AudioProcessor`.
+
+    `streaming_recognize` takes an async iterator of
+    ``StreamingRecognizeRequest`` (the first carries the config) and
+    returns an async iterator of ``StreamingRecognizeResponse``, matching
+    ``SpeechAsyncClient``. `offset` is where the stream's first audio
+    sits on the session timeline (seconds); result times stay relative
+    to the stream, and recognizers that work from the audio alone
+    ignore it.
+    """
+
+    @abstractmethod
+    async def streaming_recognize(self, requests, offset: float = 0.0) -> AsyncIterator[speech.StreamingRecognizeResponse]:
+        ...
+
+    async def close(self):
+        pass
+
+
+class GoogleSpeechBackend(SpeechBackend):
+    def __init__(self):
+        # One async client (and so one gRPC channel) multiplexes every session's stream
+        self.client = speech.SpeechAsyncClient()
+
+    async def streaming_recognize(self, requests, offset: float = 0.0):
+        return await self.client.streaming_recognize(requests=requests)
+
+    async def close(self):
+        await self.client.transport.close()
+
+
+class Utterance:
+    __slots__ = ("text", "speaker_tag", "start", "end")
+
+    def __init__(self, text: str, speaker_tag: int, start: float, end: float):
+        self.text = text
+        self.speaker_tag = speaker_tag
+        self.start = start
+        self.end = end
+
+
+class ReplayScript:
+    """Scripted utterances on a session's audio timeline (seconds from its start)."""
+
+    def __init__(self, utterances: List[Utterance], gap: float = 0.4):
+        self.utterances = utterances
+        self.gap = gap
+
+    @property
+    def duration(self) -> float:
+        return self.utterances[-1].end + self.gap if self.utterances else 0.0
+
+    def shifted(self, offset: float) -> List[Utterance]:
+        return [Utterance(u.text, u.speaker_tag, u.start + offset, u.end + offset) for u in self.utterances]
+
+    @classmethod
+    def from_transcript(
+        cls,
+        path: str,
+        words_per_second: float = STT_REPLAY_WORDS_PER_SECOND,
+        pause: float = 0.4,
+        audio_seconds: Optional[float] = None,
+    ) -> "ReplayScript":
+        """Build a script from ``Speaker: text`` lines.
+
+        Each distinct speaker label gets its own speaker tag, in order of
+        appearance. Timings follow `words_per_second`; with `audio_seconds`
+        they are scaled to span that much audio instead.
+        """
+        with open(path, encoding="utf-8") as f:
+            lines = [line.strip() for line in f if line.strip()]
+
+        speakers = {}
+        utterances, t = [], 0.0
+        for line in lines:
+            m = _SPEAKER_PREFIX.match(line)
+            label = m.group(1) if m else ""
+            text = line[m.end():] if m else line
+            tag = speakers.setdefault(label, len(speakers) + 1)
+            duration = max(0.5, len(text.split()) / words_per_second)
+            utterances.append(Utterance(text, tag, t, t + duration))
+            t += duration + pause
+
+        if audio_seconds and utterances:
+            scale = audio_seconds / utterances[-1].end
+            for u in utterances:
+                u.start *= scale
+                u.end *= scale
+        return cls(utterances, pause)
+
+
+def _result(text: str, speaker_tag: int, end: float, is_final: bool, stability: float = 0.0):
+    words = [
+        speech.WordInfo(word=w, speaker_tag=speaker_tag) for w in text.split()
+    ] if is_final else []
+    return speech.StreamingRecognitionResult(
+        is_final=is_final,
+        stability=stability,
+        result_end_time=datetime.timedelta(seconds=end),
+        alternatives=[speech.SpeechRecognitionAlternative(
+            transcript=text, confidence=0.9 if is_final else 0.0, words=words
+        )],
+    )
+
+
+class ReplayBackend(SpeechBackend):
+    """Offline recognizer that replays a `ReplayScript`.
+
+    Results are driven by the audio actually received: an utterance is
+    finalized `latency` seconds after the stream has been sent audio up to
+    its end, and with ``interim_results`` its words are revealed as their
+    audio arrives. Pushing audio faster than real time therefore yields
+    results faster too, which is what a throughput benchmark wants. With
+    `repeat` the script loops for as long as audio keeps coming.
+
+    The script runs on the session timeline: a stream opened at `offset`
+    (after a rotation or reconnect) resumes from there instead of starting
+    over. Utterances ending inside the replayed overlap are sent again,
+    as Google would, and left to the processor's seam dedupe.
+    """
+
+    def __init__(self, script: ReplayScript, latency: float = STT_REPLAY_LATENCY, repeat: bool = False):
+        self.script = script
+        self.latency = latency
+        self.repeat = repeat
+        self.streams = 0
+
+    async def streaming_recognize(self, requests, offset: float = 0.0):
+        self.streams += 1
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        feeder = asyncio.create_task(self._consume(requests, queue, offset))
+        # An error in the request iterator ends the response stream too
+        feeder.add_done_callback(
+            lambda t: t.cancelled() or t.exception() is None or queue.put_nowait(t.exception())
+        )
+
+        async def responses():
+            try:
+                while True:
+                    resp = await queue.get()
+                    if resp is None:
+                        break
+                    if isinstance(resp, BaseException):
+                        raise resp
+                    due, resp = resp
+                    delay = due - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    yield resp
+            finally:
+                feeder.cancel()
+
+        return responses()
+
+    async def _consume(self, requests, queue: asyncio.Queue, offset: float = 0.0):
+        loop = asyncio.get_running_loop()
+        bytes_per_second = None
+        interim = False
+        started = time.monotonic()
+        received = 0
+        # Resume from the lap and line the session has reached
+        laps = int(offset // self.script.duration) if self.repeat and self.script.duration else 0
+        pending = [u for u in self.script.shifted(laps * self.script.duration) if u.end > offset]
+        laps += 1
+        if not pending and self.repeat and self.script.duration:
+            # Resumed in the pause after the last line of a lap
+            pending = self.script.shifted(laps * self.script.duration)
+            laps += 1
+        shown = 0  # words of pending[0] already sent as a partial
+
+        def emit(result):
+            # Delivered after `latency` by the response side, so audio is never stalled
+            queue.put_nowait((
+                loop.time() + self.latency,
+                speech.StreamingRecognizeResponse(results=[result])
+            ))
+
+        async for req in requests:
+            if "streaming_config" in req:
+                cfg = req.streaming_config
+                interim = cfg.interim_results
+                if cfg.config.encoding == speech.RecognitionConfig.AudioEncoding.LINEAR16:
+                    bytes_per_second = (cfg.config.sample_rate_hertz or 16000) * 2
+                continue
+
+            received += len(req.audio_content)
+            # Compressed audio cannot be measured by size; assume real time
+            heard = offset + (
+                received / bytes_per_second if bytes_per_second
+                else time.monotonic() - started
+            )
+
+            while pending and pending[0].end <= heard:
+                u = pending.pop(0)
+                shown = 0
+                emit(_result(u.text, u.speaker_tag, u.end - offset, True))
+                if not pending and self.repeat and self.script.duration:
+                    pending = self.script.shifted(laps * self.script.duration)
+                    laps += 1
+
+            if interim and pending and pending[0].start < heard:
+                u = pending[0]
+                words = u.text.split()
+                progress = (heard - u.start) / (u.end - u.start)
+                count = min(len(words), max(1, int(len(words) * progress)))
+                if count > shown:
+                    shown = count
+                    emit(_result(" ".join(words[:count]), u.speaker_tag, heard - offset, False, 0.5))
+
+        queue.put_nowait(None)
+
+
+def create_backend(name: str = STT_BACKEND) -> SpeechBackend:
+    """Build the backend selected by `STT_BACKEND` (``google`` or ``replay``)."""
+    if name == "google":
+        return GoogleSpeechBackend()
+    if name == "replay":
+        logger.info(f"Using replay STT backend from {STT_REPLAY_TRANSCRIPT}")
+        return ReplayBackend(ReplayScript.from_transcript(STT_REPLAY_TRANSCRIPT))
+    raise ValueError(f"Unknown STT backend: {name}")
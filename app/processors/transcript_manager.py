@@ -1,28 +1,98 @@
 # app/processors/transcript_manager.py
 
+import os
 import json
+import time
+import uuid
 import logging
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Optional
 from fastapi import WebSocket
 from .audio_processor import AudioProcessor
-from app.db import save_transcript
+from app.transcript_buffer import transcript_buffer
+from app.metrics import SegmentTrace
+from app.meeting_summary import RollingSummary
+from app.transcript_store import transcript_line, transcript_store
 
 logger = logging.getLogger(__name__)
 
+# Minimum gap between partial transcript messages on one socket
+PARTIAL_MIN_INTERVAL = float(os.getenv("PARTIAL_MIN_INTERVAL", "0.3"))
+
 class TranscriptManager:
-    def __init__(self, source_name: str):
+    def __init__(
+        self,
+        source_name: str,
+        partials: bool = False,
+        partial_interval: float = PARTIAL_MIN_INTERVAL,
+        rolling_summary: Optional[RollingSummary] = None
+    ):
         self.source_name = source_name
+        # Final segments are also fed to the meeting's live summary
+        self.rolling_summary = rolling_summary
         self.sentence_endings = {'.', '?', '!'}
+        self.partials = partials
+        self.partial_interval = partial_interval
+        # Partials and the final that replaces them share an utterance id
+        self.utterance_seq = 0
+        self.last_partial_at = 0.0
+        self.last_partial_text = ""
+        self.partials_sent = 0
+        self.partials_skipped = 0
+
+    @property
+    def utterance_id(self) -> str:
+        return f"{self.source_name}-{self.utterance_seq}"
+
+    async def _send_partial(self, response, websocket: WebSocket):
+        # Google splits an interim hypothesis into a stable head and unstable tail
+        text = " ".join(
+            r.alternatives[0].transcript.strip()
+            for r in response.results
+            if not r.is_final and r.alternatives
+        ).strip()
+        if not text or text == self.last_partial_text:
+            return
+
+        now = time.monotonic()
+        if now - self.last_partial_at < self.partial_interval:
+            # Superseded by the next partial or the final anyway
+            self.partials_skipped += 1
+            return
+        self.last_partial_at = now
+        self.last_partial_text = text
+
+        try:
+            await websocket.send_text(json.dumps({
+                "type": f"{self.source_name}_transcription_partial",
+                "utterance_id": self.utterance_id,
+                "content": text,
+                "timestamp": datetime.utcnow().isoformat()
+            }))
+            self.partials_sent += 1
+        except Exception as e:
+            logger.error(f"Failed to send partial transcription: {e}")
 
     async def process_google_response(
         self,
         response,
         websocket: WebSocket,
-        session_info: Dict[str, str]
+        session_info: Dict[str, str],
+        trace: Optional[SegmentTrace] = None
     ):
-        """Parse Google response, persist safely, forward to client, return segments."""
+        """Parse Google response, persist safely, forward to client, return segments.
+
+        Only final results are persisted and returned; interim results are
+        forwarded as rate-limited partials when `partials` is enabled. Each
+        segment carries its own fork of `trace` under ``"trace"``.
+        """
         segments = []
+        if trace is not None:
+            trace.mark("response_queue")
+        if self.partials and not any(r.is_final for r in response.results):
+            await self._send_partial(response, websocket)
+            return segments
+
         for result in response.results:
             if not result.is_final or not result.alternatives:
                 continue
@@ -40,36 +110,50 @@ class TranscriptManager:
                 if result.alternatives[0].words else 1
             )
 
-            # --- Safe persistence ---
-            try:
-                resp = await save_transcript(
-                    user_id=session_info["user_id"],
-                    client_id=session_info["client_id"],
-                    session_id=session_info["session_id"],
-                    source=self.source_name,
-                    speaker_tag=f"Speaker_{speaker_tag}",
-                    transcript=text
-                )
-                if getattr(resp, "error", None):
-                    logger.error(f"Supabase insert error: {resp.error}")
-            except Exception as e:
-                logger.error(f"Failed to save transcript: {e}")
+            # --- Write-behind persistence (flushed in batches) ---
+            record = {
+                "row_id": str(uuid.uuid4()),
+                "user_id": session_info["user_id"],
+                "client_id": session_info["client_id"],
+                "session_id": session_info["session_id"],
+                "source": self.source_name,
+                "speaker_tag": f"Speaker_{speaker_tag}",
+                "transcript": text,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+            transcript_buffer.add(record)
+
+            # Server-side copy for /summarize and /extract_contact, keyed by row id
+            transcript_store.append(session_info, record)
+            line = transcript_line(self.source_name, record["speaker_tag"], text)
+            if self.rolling_summary is not None:
+                self.rolling_summary.add(line)
 
-            # Forward to client
+            # Forward to client; replaces any partials with the same utterance id
+            utterance_id = self.utterance_id
+            self.utterance_seq += 1
+            self.last_partial_text = ""
             try:
                 await websocket.send_text(json.dumps({
                     "type": f"{self.source_name}_transcription",
+                    "utterance_id": utterance_id,
                     "content": text,
                     "timestamp": datetime.utcnow().isoformat()
                 }))
             except Exception as e:
                 logger.error(f"Failed to send transcription: {e}")
 
+            segment_trace = trace.fork() if trace is not None else None
+            if segment_trace is not None:
+                segment_trace.mark("transcript_sent")
+                segment_trace.milestone("transcript")
+
             segments.append({
                 "role": self.source_name,
                 "speaker": speaker_tag,
                 "content": text,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.utcnow().isoformat(),
+                "trace": segment_trace
             })
 
         return segments
@@ -0,0 +1,125 @@
+# app/processors/vad.py
+import os
+from collections import deque
+from typing import Dict
+
+import numpy as np
+
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() in ("1", "true", "yes")
+VAD_FRAME_MS = 20
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "400"))
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", "200"))
+# Google aborts a stream after ~10 s without audio; let a frame through well before that
+VAD_KEEPALIVE_SECONDS = float(os.getenv("VAD_KEEPALIVE_SECONDS", "4"))
+
+# Speech threshold in dBFS per source. Loopback (speaker) audio has a much
+# lower noise floor than a laptop microphone.
+VAD_THRESHOLDS_DB = {
+    "mic": float(os.getenv("VAD_THRESHOLD_DB_MIC", "-45")),
+    "speaker": float(os.getenv("VAD_THRESHOLD_DB_SPEAKER", "-50")),
+    "mic_and_speaker": float(os.getenv("VAD_THRESHOLD_DB_MIC_AND_SPEAKER", "-45")),
+}
+DEFAULT_THRESHOLD_DB = -45.0
+
+# Fricatives ("s", "f", "th") are quiet but noisy; accept them a few dB lower
+UNVOICED_MARGIN_DB = 8.0
+UNVOICED_MIN_ZCR = 0.25
+
+
+class VoiceActivityDetector:
+    """Energy + zero-crossing VAD over 20 ms LINEAR16 frames.
+
+    `process` returns only the audio worth sending to the recognizer:
+    speech, `hangover_ms` after it so trailing words are not cut, and
+    `preroll_ms` before it so onsets are not clipped. During long silences
+    one frame is let through every `keepalive_seconds` to keep the
+    streaming call alive.
+    """
+
+    def __init__(
+        self,
+        source_name: str,
+        sample_rate: int = 16000,
+        threshold_db: float = None,
+        hangover_ms: int = VAD_HANGOVER_MS,
+        preroll_ms: int = VAD_PREROLL_MS,
+        keepalive_seconds: float = VAD_KEEPALIVE_SECONDS,
+        enabled: bool = VAD_ENABLED,
+    ):
+        self.source_name = source_name
+        self.enabled = enabled
+        self.threshold_db = (
+            threshold_db if threshold_db is not None
+            else VAD_THRESHOLDS_DB.get(source_name, DEFAULT_THRESHOLD_DB)
+        )
+        self.frame_samples = sample_rate * VAD_FRAME_MS // 1000
+        self.frame_bytes = self.frame_samples * 2
+        self.hangover_frames = hangover_ms // VAD_FRAME_MS
+        self.keepalive_frames = int(keepalive_seconds * 1000 / VAD_FRAME_MS)
+        self.preroll = deque(maxlen=max(1, preroll_ms // VAD_FRAME_MS))
+        self._remainder = b""
+        self._hangover = 0
+        self._silent_run = 0
+
+        self.bytes_in = 0
+        self.bytes_suppressed = 0
+
+    def _speech_mask(self, frames: np.ndarray) -> np.ndarray:
+        x = frames.astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(x * x, axis=1) + 1e-12)
+        energy_db = 20.0 * np.log10(rms)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+        voiced = energy_db >= self.threshold_db
+        unvoiced = (energy_db >= self.threshold_db - UNVOICED_MARGIN_DB) & (zcr >= UNVOICED_MIN_ZCR)
+        return voiced | unvoiced
+
+    def process(self, data: bytes) -> bytes:
+        if not self.enabled:
+            return data
+
+        self.bytes_in += len(data)
+        buf = self._remainder + data
+        usable = len(buf) - len(buf) % self.frame_bytes
+        self._remainder = buf[usable:]
+        if not usable:
+            return b""
+
+        frames = np.frombuffer(buf[:usable], dtype=np.int16).reshape(-1, self.frame_samples)
+        speech = self._speech_mask(frames)
+
+        out = []
+        for i, is_speech in enumerate(speech):
+            frame = buf[i * self.frame_bytes:(i + 1) * self.frame_bytes]
+            if is_speech:
+                out.extend(self.preroll)
+                self.preroll.clear()
+                out.append(frame)
+                self._hangover = self.hangover_frames
+                self._silent_run = 0
+            elif self._hangover > 0:
+                out.append(frame)
+                self._hangover -= 1
+            else:
+                self._silent_run += 1
+                if self._silent_run >= self.keepalive_frames:
+                    # Older pre-roll would arrive out of order after this frame
+                    self.bytes_suppressed += len(self.preroll) * self.frame_bytes
+                    self.preroll.clear()
+                    out.append(frame)
+                    self._silent_run = 0
+                else:
+                    if len(self.preroll) == self.preroll.maxlen:
+                        self.bytes_suppressed += self.frame_bytes
+                    self.preroll.append(frame)
+
+        return b"".join(out)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "vad_bytes_in": self.bytes_in,
+            "vad_bytes_suppressed": self.bytes_suppressed,
+            "vad_suppressed_pct": (
+                round(100.0 * self.bytes_suppressed / self.bytes_in, 1) if self.bytes_in else 0.0
+            ),
+        }
@@ -1,16 +1,29 @@
 # app/routers/advisor_chat.py
 
-import uuid, logging, os
-from fastapi import APIRouter, HTTPException, Depends, Request
+import re, uuid, json, base64, asyncio, logging, os
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
-from openai import AsyncOpenAI
-from app.db import supabase
-from gotrue.types import UserResponse
+from typing import List, Optional
+from app.db import run_query
+from app.auth import AuthError, token_verifier
+from app.chat_context import chat_contexts, contact_message
+from app.llm import LLMUnavailableError, chat_completion, stream_chat_completion
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
-openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "50"))
+CHAT_PAGE_MAX = int(os.getenv("CHAT_PAGE_MAX", "200"))
+MESSAGE_PAGE_SIZE = int(os.getenv("MESSAGE_PAGE_SIZE", "100"))
+MESSAGE_PAGE_MAX = int(os.getenv("MESSAGE_PAGE_MAX", "500"))
+# Row ids in page cursors are uuids or integers
+_CURSOR_ID = re.compile(r"[0-9A-Za-z-]{1,64}")
+
+# Only what the response models need (plus id as the keyset tiebreaker)
+CHAT_COLUMNS = "id, title, created_at"
+MESSAGE_COLUMNS = "id, role, content, timestamp"
 
 SYSTEM_PROMPT = """
 You are a UK financial advisor assistant. Respond concisely, professionally, and in British English. Avoid unnecessary detail.
@@ -24,14 +37,9 @@ async def get_user_id(request: Request) -> str:
     token = auth_header.removeprefix("Bearer ").strip()
 
     try:
-        auth_resp: UserResponse = supabase.auth.get_user(token)
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Failed to validate token: {e}")
-
-    if not auth_resp or not auth_resp.user:
-        raise HTTPException(status_code=401, detail="User not found or token invalid")
-
-    return auth_resp.user.id
+        return await token_verifier.verify(token)
+    except AuthError as e:
+        raise HTTPException(status_code=401, detail=str(e))
 
 class CreateChatRequest(BaseModel):
     title: str = ""
@@ -53,113 +61,301 @@ class UserMessage(BaseModel):
 @router.post("/advisor-chats", response_model=ChatSession)
 async def create_chat(payload: CreateChatRequest, user_id: str = Depends(get_user_id)):
     chat_id = str(uuid.uuid4())
-    res = supabase.table("advisor_chats").insert({
+    res = await run_query(lambda db: db.table("advisor_chats").insert({
         "id": chat_id,
         "user_id": user_id,
         "title": payload.title,
-    }).execute()
+    }))
 
     if not res.data:
         raise HTTPException(status_code=500, detail="Chat creation failed")
 
     return res.data[0]
 
+def _encode_cursor(row: dict, key: str) -> str:
+    raw = json.dumps([row[key], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    """(timestamp, id) from a cursor; both are checked before they reach a filter."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        at, row_id = str(at), str(row_id)
+        datetime.fromisoformat(at)
+        if not _CURSOR_ID.fullmatch(row_id):
+            raise ValueError(row_id)
+        return at, row_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _before(query, column: str, cursor: str):
+    """Keyset filter: rows strictly older than the cursor, ties broken on id."""
+    at, row_id = _decode_cursor(cursor)
+    return query.or_(
+        f'{column}.lt."{at}",and({column}.eq."{at}",id.lt."{row_id}")'
+    )
+
+def _after(query, column: str, cursor: str):
+    """Keyset filter: rows strictly newer than the cursor, ties broken on id."""
+    at, row_id = _decode_cursor(cursor)
+    return query.or_(
+        f'{column}.gt."{at}",and({column}.eq."{at}",id.gt."{row_id}")'
+    )
+
 @router.get("/advisor-chats", response_model=List[ChatSession])
-async def list_chats(user_id: str = Depends(get_user_id)):
-    res = supabase.table("advisor_chats") \
-        .select("*") \
-        .eq("user_id", user_id) \
-        .order("created_at", desc=True) \
-        .execute()
+async def list_chats(
+    response: Response,
+    limit: int = Query(CHAT_PAGE_SIZE, ge=1, le=CHAT_PAGE_MAX),
+    before: Optional[str] = Query(None),
+    since: Optional[str] = Query(None),
+    user_id: str = Depends(get_user_id)
+):
+    """Newest chats first, one page at a time.
+
+    Pass the `X-Next-Cursor` response header back as `before` for the next
+    (older) page. `X-Latest-Cursor` marks the newest chat returned; passed
+    back as `since`, only chats created after it are listed.
+    """
+    def build(db):
+        q = db.table("advisor_chats").select(CHAT_COLUMNS).eq("user_id", user_id)
+        if before:
+            q = _before(q, "created_at", before)
+        if since:
+            q = _after(q, "created_at", since)
+        return q.order("created_at", desc=True).order("id", desc=True).limit(limit)
+
+    res = await run_query(build, op="list_chats")
     if res.data is None:
         raise HTTPException(status_code=500, detail="Failed to load chats")
+    if len(res.data) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(res.data[-1], "created_at")
+    if res.data:
+        response.headers["X-Latest-Cursor"] = _encode_cursor(res.data[0], "created_at")
     return res.data
 
 @router.get("/advisor-chats/{chat_id}", response_model=List[Message])
-async def get_chat_messages(chat_id: str, user_id: str = Depends(get_user_id)):
-    res = supabase.table("advisor_messages") \
-        .select("*") \
-        .eq("chat_id", chat_id) \
-        .order("timestamp") \
-        .execute()
+async def get_chat_messages(
+    chat_id: str,
+    response: Response,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=MESSAGE_PAGE_MAX),
+    before: Optional[str] = Query(None),
+    since: Optional[str] = Query(None),
+    user_id: str = Depends(get_user_id)
+):
+    """The latest page of a chat in chronological order.
+
+    `X-Next-Cursor` (sent when older messages may exist) goes back as
+    `before`. `X-Latest-Cursor` marks the newest message returned; passed
+    back as `since`, the page is instead the oldest messages after it, so a
+    client can catch up from the last one it holds. A full `since` page
+    sets `X-Next-Cursor` to pass as the next `since`.
+    """
+    def build(db):
+        q = db.table("advisor_messages").select(MESSAGE_COLUMNS).eq("chat_id", chat_id)
+        if before:
+            q = _before(q, "timestamp", before)
+        if since:
+            return _after(q, "timestamp", since).order("timestamp").order("id").limit(limit)
+        return q.order("timestamp", desc=True).order("id", desc=True).limit(limit)
+
+    res = await run_query(build, op="list_chat_messages")
 
     if res.data is None:
         raise HTTPException(status_code=500, detail="Failed to load messages")
 
-    return res.data  # May return []
+    rows = res.data  # May return []
+    if not since:
+        rows = rows[::-1]
+    if len(rows) == limit:
+        # Oldest row to page further back, or newest row to keep catching up
+        edge = rows[-1] if since else rows[0]
+        response.headers["X-Next-Cursor"] = _encode_cursor(edge, "timestamp")
+    if rows:
+        response.headers["X-Latest-Cursor"] = _encode_cursor(rows[-1], "timestamp")
+    return rows
+
+async def _set_title(chat_id: str, title: str):
+    try:
+        await run_query(lambda db: db.table("advisor_chats").update({
+            "title": title
+        }).eq("id", chat_id), op="update_chat_title")
+    except Exception as e:
+        logger.error(f"Failed to set chat title: {e}")
 
-@router.post("/advisor-chats/{chat_id}", response_model=Message)
-async def send_message(chat_id: str, payload: UserMessage, user_id: str = Depends(get_user_id)):
-    # ✅ 1. prompt'ı her zamanki gibi mesaj olarak kaydet
-    supabase.table("advisor_messages").insert({
-        "chat_id": chat_id,
-        "role": "user",
-        "content": payload.prompt,
-    }).execute()
+# Strong references so fire-and-forget follow-ups are not garbage collected
+_background = set()
 
-    # ✅ 2. contact varsa, ikinci bir mesaj olarak JSON dump ile kaydet
-    if payload.contact:
-        import json
-        supabase.table("advisor_messages").insert({
-            "chat_id": chat_id,
-            "role": "user",
-            "content": f"[Contact Attached]\n{json.dumps(payload.contact, indent=2)}",
-        }).execute()
-
-    # ✅ 3. tüm geçmişi çek
-    hist = supabase.table("advisor_messages") \
-        .select("role, content") \
-        .eq("chat_id", chat_id) \
-        .order("timestamp") \
-        .execute()
-
-    if hist.data is None:
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+async def _prepare_turn(chat_id: str, payload: UserMessage):
+    """Record the user's turn and build the prompt.
+
+    Returns the messages for the model and the task inserting the prompt
+    rows, which runs while the model is thinking.
+    """
+    # ✅ 1. önbellekten geçmiş (özet + son mesajlar); sıcak yolda DB'ye gitmez
+    try:
+        state = await chat_contexts.get(chat_id)
+    except Exception as e:
+        logger.error(f"Failed to fetch chat history: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch chat history")
 
-    # ✅ 4. sistem prompt + geçmiş + yeni mesaj
-    msgs = [{"role": "system", "content": SYSTEM_PROMPT}] + hist.data
+    # ✅ 2. prompt + contact tek bir çok satırlı insert olarak
+    rows = [{"chat_id": chat_id, "role": "user", "content": payload.prompt}]
+    if payload.contact:
+        rows.append({"chat_id": chat_id, "role": "user", "content": contact_message(payload.contact)})
+    for row in rows:
+        chat_contexts.append(chat_id, row["role"], row["content"])
+
+    # ✅ 3. başlık kritik değil: LLM ile paralel, arka planda
+    if state.is_first_turn():
+        _spawn(_set_title(chat_id, payload.prompt[:50]))
+
+    # ✅ 4. sistem prompt + özet + token bütçesine sığan son mesajlar
+    msgs = chat_contexts.build_messages(chat_id, state, SYSTEM_PROMPT)
 
+    insert = asyncio.create_task(
+        run_query(lambda db: db.table("advisor_messages").insert(rows), op="insert_chat_messages")
+    )
+    return msgs, insert
+
+async def _save_reply(chat_id: str, insert: asyncio.Task, reply: str) -> str:
+    """Persist the assistant reply after the prompt rows; returns its timestamp."""
+    # The reply must sort after the prompt, so its insert waits for the first
     try:
-        comp = await openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=msgs,
-            max_tokens=800,
-            temperature=0.6
-        )
-        reply = comp.choices[0].message.content.strip()
+        await insert
     except Exception as e:
-        logger.error(f"OpenAI error: {e}")
-        raise HTTPException(status_code=500, detail="LLM generation failed")
+        chat_contexts.invalidate(chat_id)
+        logger.error(f"Failed to save user message: {e}")
+        raise HTTPException(status_code=500, detail="Could not save user message")
 
-    sv = supabase.table("advisor_messages").insert({
+    sv = await run_query(lambda db: db.table("advisor_messages").insert({
         "chat_id": chat_id,
         "role": "assistant",
         "content": reply,
-    }).execute()
+    }), op="insert_chat_messages")
 
     if not sv.data:
+        chat_contexts.invalidate(chat_id)
         raise HTTPException(status_code=500, detail="Could not save assistant message")
 
-    # ✅ 5. ilk mesajsa başlık ata
-    existing_msgs = [m for m in hist.data if m["role"] == "user"]
-    assistant_msgs = [m for m in hist.data if m["role"] == "assistant"]
+    chat_contexts.append(chat_id, "assistant", reply)
+    return sv.data[0]["timestamp"]
+
+def _abandon(chat_id: str, insert: asyncio.Task):
+    """Let the prompt insert finish on its own after the turn has failed."""
+    def done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            chat_contexts.invalidate(chat_id)
+            logger.error(f"Failed to save user message: {task.exception()}")
+    insert.add_done_callback(done)
 
-    if len(existing_msgs) == 1 and len(assistant_msgs) == 0:
-        supabase.table("advisor_chats").update({
-            "title": payload.prompt[:50]
-        }).eq("id", chat_id).execute()
+@router.post("/advisor-chats/{chat_id}", response_model=Message)
+async def send_message(chat_id: str, payload: UserMessage, user_id: str = Depends(get_user_id)):
+    msgs, insert = await _prepare_turn(chat_id, payload)
+
+    try:
+        comp = await chat_completion(
+            "advisor_chat",
+            model="gpt-4o",
+            messages=msgs,
+            max_tokens=800,
+            temperature=0.6
+        )
+        reply = comp.choices[0].message.content.strip()
+    except LLMUnavailableError:
+        _abandon(chat_id, insert)
+        raise HTTPException(status_code=503, detail="LLM temporarily unavailable")
+    except Exception as e:
+        _abandon(chat_id, insert)
+        logger.error(f"OpenAI error: {e}")
+        raise HTTPException(status_code=500, detail="LLM generation failed")
+
+    timestamp = await _save_reply(chat_id, insert, reply)
 
     return {
         "role": "assistant",
         "content": reply,
-        "timestamp": sv.data[0]["timestamp"]
+        "timestamp": timestamp
     }
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/advisor-chats/{chat_id}/stream")
+async def stream_message(chat_id: str, payload: UserMessage, user_id: str = Depends(get_user_id)):
+    """Server-Sent Events variant of `send_message`.
+
+    Emits `delta` events while gpt-4o generates, then a single `done` event
+    with the stored message (including its timestamp), or an `error` event.
+    A client disconnect cancels the generator, which closes the upstream
+    OpenAI stream so no further tokens are generated; nothing is saved for
+    an abandoned reply.
+    """
+    msgs, insert = await _prepare_turn(chat_id, payload)
+
+    async def events():
+        parts = []
+        try:
+            async with stream_chat_completion(
+                "advisor_chat",
+                model="gpt-4o",
+                messages=msgs,
+                max_tokens=800,
+                temperature=0.6
+            ) as stream:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    if not parts:
+                        delta = delta.lstrip()
+                        if not delta:
+                            continue
+                    parts.append(delta)
+                    yield _sse("delta", {"content": delta})
+        except asyncio.CancelledError:
+            logger.info(f"Client left chat {chat_id} mid-stream; generation cancelled")
+            _abandon(chat_id, insert)
+            raise
+        except LLMUnavailableError:
+            _abandon(chat_id, insert)
+            yield _sse("error", {"status": 503, "detail": "LLM temporarily unavailable"})
+            return
+        except Exception as e:
+            _abandon(chat_id, insert)
+            logger.error(f"OpenAI error: {e}")
+            yield _sse("error", {"status": 500, "detail": "LLM generation failed"})
+            return
+
+        reply = "".join(parts).strip()
+        try:
+            timestamp = await _save_reply(chat_id, insert, reply)
+        except HTTPException as e:
+            yield _sse("error", {"status": e.status_code, "detail": e.detail})
+            return
+        yield _sse("done", {"role": "assistant", "content": reply, "timestamp": timestamp})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @router.delete("/advisor-chats/{chat_id}")
 async def delete_chat(chat_id: str, user_id: str = Depends(get_user_id)):
-    supabase.table("advisor_messages").delete().eq("chat_id", chat_id).execute()
-    res = supabase.table("advisor_chats").delete().eq("id", chat_id).execute()
+    chat_contexts.invalidate(chat_id)
+    await run_query(lambda db: db.table("advisor_messages").delete().eq("chat_id", chat_id))
+    res = await run_query(lambda db: db.table("advisor_chats").delete().eq("id", chat_id))
     if not res.data:
         raise HTTPException(status_code=500, detail="Failed to delete chat")
     return {"success": True}
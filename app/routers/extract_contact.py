@@ -1,21 +1,28 @@
 # app/routers/contact_extractor.py
-import logging
 import os
 import re
 import json
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, ValidationError
-from openai import AsyncOpenAI
 
 from app.deps import get_user_session
-from app.db import supabase
+from app.db import run_query
+from app.llm import LLMUnavailableError, chat_completion
+from app.transcript_store import session_key, transcript_store
+from app.chat_context import compact_contact
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
-openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Sessions whose extracted contact is kept for incremental refreshes
+CONTACT_STATE_MAX_SESSIONS = int(os.getenv("CONTACT_STATE_MAX_SESSIONS", "1000"))
 
 # --- Request/Response Models ---
 class Message(BaseModel):
@@ -23,7 +30,8 @@ class Message(BaseModel):
     text: str
 
 class ExtractContactRequest(BaseModel):
-    messages: List[Message]
+    # Omit to extract from the server's transcript of the session
+    messages: Optional[List[Message]] = None
 
 class FamilyMemberModel(BaseModel):
     name: Optional[str] = None
@@ -96,60 +104,172 @@ def normalize_string_fields(obj: Any) -> Any:
         }
     return obj
 
+def normalize_extraction(data: dict) -> dict:
+    if 'financials' in data and isinstance(data['financials'], dict):
+        data['financials'] = normalize_string_fields(data['financials'])
+    if 'riskProfile' in data and isinstance(data['riskProfile'], dict):
+        data['riskProfile'] = normalize_string_fields(data['riskProfile'])
+    if 'family' in data and isinstance(data['family'], dict):
+        fam = data['family']
+        for key in ('parents', 'children', 'siblings'):
+            if key in fam and isinstance(fam[key], dict):
+                fam[key] = list(fam[key].values())
+        data['family'] = fam
+    return data
+
+# --- Incremental state ---
+def _member_key(member: Any):
+    if isinstance(member, dict) and member.get("name"):
+        return str(member["name"]).strip().lower()
+    return None
+
+def merge_contact(current: Any, update: Any) -> Any:
+    """Deep-merge an extraction update into the current contact data.
+
+    Nested objects merge field by field, family member lists merge by name,
+    plain lists (tags) are unioned, and null or empty values in the update
+    never erase what is already known.
+    """
+    if update is None or update == "" or update == [] or update == {}:
+        return current
+    if isinstance(current, dict) and isinstance(update, dict):
+        merged = dict(current)
+        for key, value in update.items():
+            value = merge_contact(current.get(key), value)
+            if value is not None:
+                merged[key] = value
+        return merged
+    if isinstance(current, list) and isinstance(update, list):
+        merged = list(current)
+        for item in update:
+            key = _member_key(item)
+            match = next((i for i, m in enumerate(merged) if key is not None and _member_key(m) == key), None)
+            if match is not None:
+                merged[match] = merge_contact(merged[match], item)
+            elif item not in merged:
+                merged.append(item)
+        return merged
+    return update
+
+class ContactState:
+    """What has been extracted for a session and how much transcript it covers."""
+
+    def __init__(self):
+        self.data: dict = {}
+        self.covered = 0
+        # Fingerprint of the covered lines, so an edited upload is re-read in full
+        self.digest = hashlib.sha256().hexdigest()
+        self.lock = asyncio.Lock()
+
+def _digest(lines: List[str]) -> str:
+    h = hashlib.sha256()
+    for line in lines:
+        h.update(line.encode())
+        h.update(b"\n")
+    return h.hexdigest()
+
+# Per-session states, least recently used first
+contact_states: "OrderedDict[Tuple[str, str, str], ContactState]" = OrderedDict()
+
+def _contact_state(session_info: dict) -> ContactState:
+    key = session_key(session_info)
+    state = contact_states.get(key)
+    if state is None:
+        state = contact_states[key] = ContactState()
+    contact_states.move_to_end(key)
+    while len(contact_states) > CONTACT_STATE_MAX_SESSIONS:
+        contact_states.popitem(last=False)
+    return state
+
+async def _extract(prompt: str) -> dict:
+    response = await chat_completion(
+        "extract_contact",
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": (
+                "You are a service that extracts structured contact info "
+                "from conversation transcripts. Output strict JSON."
+            )},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0
+    )
+    content = response.choices[0].message.content.strip()
+    if content.startswith("```"):
+        content = re.sub(r"^```(?:json)?\s*", "", content)
+        content = re.sub(r"\s*```$", "", content).strip()
+    if not content:
+        raise HTTPException(status_code=500, detail="Empty response from extraction service.")
+    return normalize_extraction(json.loads(content))
+
 # --- Endpoint ---
 @router.post("/extract_contact", response_model=ContactModel, response_model_exclude_none=True)
-async def extract_contact(payload: ExtractContactRequest, session_info=Depends(get_user_session)):
-    transcript = "\n".join(f"{m.speaker}: {m.text}" for m in payload.messages)
-    prompt = (
-        "Extract contact information from the meeting transcript. "
-        "Return ONLY valid JSON matching our Contact schema.\n"
-        f"Transcript:\n{transcript}"
-    )
-    try:
-        response = await openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": (
-                    "You are a service that extracts structured contact info "
-                    "from conversation transcripts. Output strict JSON."
-                )},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0
-        )
-        content = response.choices[0].message.content.strip()
-        if content.startswith("```"):
-            content = re.sub(r"^```(?:json)?\s*", "", content)
-            content = re.sub(r"\s*```$", "", content).strip()
-        if not content:
-            raise HTTPException(status_code=500, detail="Empty response from extraction service.")
-        data = json.loads(content)
-
-        if 'financials' in data and isinstance(data['financials'], dict):
-            data['financials'] = normalize_string_fields(data['financials'])
-        if 'riskProfile' in data and isinstance(data['riskProfile'], dict):
-            data['riskProfile'] = normalize_string_fields(data['riskProfile'])
-        if 'family' in data and isinstance(data['family'], dict):
-            fam = data['family']
-            for key in ('parents', 'children', 'siblings'):
-                if key in fam and isinstance(fam[key], dict):
-                    fam[key] = list(fam[key].values())
-            data['family'] = fam
-
-        contact = ContactModel(**data)
-
-        # Save to Supabase (optional, fails silently)
+async def extract_contact(payload: Optional[ExtractContactRequest] = None, session_info=Depends(get_user_session)):
+    """Refresh the session's contact card.
+
+    Only transcript lines added since the previous call are sent to the
+    model, together with the contact extracted so far; the returned fields
+    are deep-merged into that state. A repeat call with nothing new costs
+    no LLM call at all.
+    """
+    if payload and payload.messages:
+        lines = [f"{m.speaker}: {m.text}" for m in payload.messages]
+    else:
+        try:
+            lines = await transcript_store.load(session_info)
+        except Exception as e:
+            logger.error(f"Failed to load session transcript: {e}")
+            raise HTTPException(status_code=500, detail="Could not load the session transcript.")
+    if not lines:
+        raise HTTPException(status_code=404, detail="No transcript found for this session.")
+
+    state = _contact_state(session_info)
+    async with state.lock:
+        covered = state.covered
+        if covered > len(lines) or _digest(lines[:covered]) != state.digest:
+            covered = 0
+        new_lines = lines[covered:]
+        current = state.data if covered else {}
+
+        if not new_lines:
+            return ContactModel(**current)
+
+        transcript = "\n".join(new_lines)
+        if current:
+            prompt = (
+                "Update the contact extracted so far from a meeting transcript using the new transcript lines. "
+                "Return ONLY valid JSON matching our Contact schema with the fields that are new or changed; "
+                "omit unchanged fields. For family lists include only new or changed members, identified by name.\n"
+                f"Current contact:\n{compact_contact(current)}\n"
+                f"New transcript lines:\n{transcript}"
+            )
+        else:
+            prompt = (
+                "Extract contact information from the meeting transcript. "
+                "Return ONLY valid JSON matching our Contact schema.\n"
+                f"Transcript:\n{transcript}"
+            )
         try:
-            supabase.table("contact_extractions").insert({
-                "session_id": session_info["session_id"],
-                "user_id": session_info["user_id"],
-                "extracted_data": data,
-            }).execute()
-        except Exception as db_err:
-            logger.warning(f"Failed to save extracted contact info: {db_err}")
-
-        return contact
-
-    except Exception as e:
-        logger.error(f"Extraction failed: {e}")
-        raise HTTPException(status_code=500, detail="Contact extraction failed.")
+            data = merge_contact(current, await _extract(prompt))
+            contact = ContactModel(**data)
+
+            # Save to Supabase (optional, fails silently)
+            try:
+                await run_query(lambda db: db.table("contact_extractions").insert({
+                    "session_id": session_info["session_id"],
+                    "user_id": session_info["user_id"],
+                    "extracted_data": data,
+                }))
+            except Exception as db_err:
+                logger.warning(f"Failed to save extracted contact info: {db_err}")
+
+            state.data = data
+            state.covered = len(lines)
+            state.digest = _digest(lines)
+            return contact
+
+        except LLMUnavailableError:
+            raise HTTPException(status_code=503, detail="Contact extraction temporarily unavailable.")
+        except Exception as e:
+            logger.error(f"Extraction failed: {e}")
+            raise HTTPException(status_code=500, detail="Contact extraction failed.")
@@ -2,9 +2,11 @@
 import asyncio
 import logging
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from app.deps import get_user_session
+from app.deps import get_user_session, get_audio_format, get_partials
 from app.processors.audio_processor import AudioProcessor
 from app.processors.transcript_manager import TranscriptManager
+from app.transcript_buffer import transcript_buffer
+from app.meeting_summary import meeting_summaries
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -12,22 +14,25 @@ router = APIRouter()
 @router.websocket("/mic")
 async def mic_endpoint(
     websocket: WebSocket,
-    session_info=Depends(get_user_session)
+    session_info=Depends(get_user_session),
+    audio_format=Depends(get_audio_format),
+    partials=Depends(get_partials)
 ):
     await websocket.accept()
-    loop = asyncio.get_running_loop()
-    proc = AudioProcessor("mic")
-    proc.start(loop)
-    tm = TranscriptManager("mic")
+    proc = AudioProcessor("mic", audio_format=audio_format, interim_results=partials)
+    proc.start()
+    rolling = meeting_summaries.acquire(session_info)
+    tm = TranscriptManager("mic", partials=partials, rolling_summary=rolling)
 
     async def reader():
         while True:
-            resp = await proc.response_queue.get()
-            await tm.process_google_response(resp, websocket, session_info)
+            resp, trace = await proc.response_queue.get()
+            await tm.process_google_response(resp, websocket, session_info, trace)
 
     task = asyncio.create_task(reader())
     try:
         while True:
+            await proc.wait_writable()
             data = await websocket.receive_bytes()
             proc.add_audio(data)
     except WebSocketDisconnect:
@@ -36,3 +41,5 @@ async def mic_endpoint(
         proc.stop()
         task.cancel()
         await asyncio.gather(task, return_exceptions=True)
+        meeting_summaries.release(session_info)
+        await transcript_buffer.flush(session_info)
@@ -1,44 +1,45 @@
 # app/routers/summary.py
-import logging, os
+import logging
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from typing import List
-from openai import AsyncOpenAI
+from typing import List, Optional
 from app.db import save_summary
 from app.deps import get_user_session
+from app.llm import LLMUnavailableError
+from app.summarizer import summarize_lines
+from app.meeting_summary import meeting_summaries
+from app.transcript_store import transcript_store
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
-openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 class Message(BaseModel):
     speaker: str
     text: str
 
 class SummaryRequest(BaseModel):
-    messages: List[Message]
+    # Omit to summarize the server's transcript of the session
+    messages: Optional[List[Message]] = None
 
 @router.post("/summarize")
 async def summarize_conversation(
-    payload: SummaryRequest,
+    payload: Optional[SummaryRequest] = None,
     session_info=Depends(get_user_session)
 ):
-    # Compose conversation as plain text
-    text = "\n".join([f"{m.speaker}: {m.text}" for m in payload.messages])
-
-    prompt = f"Summarize the following conversation in a concise and professional tone:\n\n{text}"
-
     try:
-        response = await openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a professional summarizer for business meetings."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=512,
-            temperature=0.5
-        )
-        summary = response.choices[0].message.content.strip()
+        rolling = meeting_summaries.get(session_info)
+        if payload and payload.messages:
+            # An uploaded conversation always wins over the server's copy
+            lines = [f"{m.speaker}: {m.text}" for m in payload.messages]
+            summary = await summarize_lines(lines)
+        elif rolling is not None and (rolling.covered or rolling.pending):
+            # Meetings streamed through the websockets already have a rolling summary
+            summary = await rolling.flush()
+        else:
+            lines = await transcript_store.load(session_info)
+            if not lines:
+                raise HTTPException(status_code=404, detail="No transcript found for this session.")
+            summary = await summarize_lines(lines)
 
         await save_summary(
             user_id=session_info["user_id"],
@@ -49,6 +50,10 @@ async def summarize_conversation(
 
         return {"summary": summary}
 
+    except HTTPException:
+        raise
+    except LLMUnavailableError:
+        raise HTTPException(status_code=503, detail="Summarization temporarily unavailable.")
     except Exception as e:
         logger.error(f"Failed to summarize conversation: {e}")
         raise HTTPException(status_code=500, detail="Summarization failed.")
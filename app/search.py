@@ -0,0 +1,127 @@
+# app/search.py
+
+import os
+import re
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List
+
+from duckduckgo_search import DDGS
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_BUDGET = float(os.getenv("SEARCH_BUDGET", "1.5"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "3"))
+
+_NON_WORD = re.compile(r"[^\w\s£%]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Lower-case, strip punctuation and collapse whitespace for cache keys."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", query.lower())).strip()
+
+
+def _ddg_text(query: str, max_results: int) -> List[Dict]:
+    # DDGS keeps per-instance session state, so never share one across threads
+    with DDGS(timeout=max(1, int(SEARCH_BUDGET * 4))) as ddgs:
+        return list(ddgs.text(query, max_results=max_results))
+
+
+class WebSearch:
+    """DuckDuckGo lookups with a TTL/LRU cache, a latency budget and coalescing.
+
+    `search` never waits longer than `budget` seconds: if the lookup is still
+    running it returns ``[]`` and lets the lookup finish in the background so
+    the result is cached for the next caller. Concurrent identical queries
+    share a single lookup.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SEARCH_CACHE_SIZE,
+        ttl: float = SEARCH_CACHE_TTL,
+        budget: float = SEARCH_BUDGET,
+        max_results: int = SEARCH_MAX_RESULTS,
+        fetch=_ddg_text,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.budget = budget
+        self.max_results = max_results
+        self.fetch = fetch
+        self.cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self.inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _get_cached(self, key: str):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        expires_at, results = entry
+        if expires_at < time.monotonic():
+            del self.cache[key]
+            return None
+        self.cache.move_to_end(key)
+        return results
+
+    def _store(self, key: str, results: List[Dict]):
+        self.cache[key] = (time.monotonic() + self.ttl, results)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+    async def _lookup(self, key: str, query: str) -> List[Dict]:
+        try:
+            results = await asyncio.to_thread(self.fetch, query, self.max_results)
+            self._store(key, results)
+            return results
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"DuckDuckGo failed: {e}")
+            return []
+        finally:
+            self.inflight.pop(key, None)
+
+    async def search(self, query: str) -> List[Dict]:
+        key = normalize_query(query)
+        if not key:
+            return []
+
+        cached = self._get_cached(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._lookup(key, query))
+            self.inflight[key] = task
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=self.budget)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.info(f"Web search exceeded {self.budget}s budget; continuing without results")
+            return []
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "entries": len(self.cache),
+            "inflight": len(self.inflight),
+        }
+
+
+web_search = WebSearch()
@@ -0,0 +1,116 @@
+# app/summarizer.py
+
+import os
+import asyncio
+import logging
+from typing import List, Optional
+
+from app.chat_context import estimate_tokens
+from app.llm import chat_completion
+
+logger = logging.getLogger(__name__)
+
+# Transcripts up to this size are summarized in a single call
+SUMMARY_SINGLE_PASS_TOKENS = int(os.getenv("SUMMARY_SINGLE_PASS_TOKENS", "12000"))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "6000"))
+SUMMARY_CHUNK_MAX_TOKENS = int(os.getenv("SUMMARY_CHUNK_MAX_TOKENS", "350"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "512"))
+# Chunk summaries in flight per request (the LLM gateway caps the process)
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+
+SUMMARY_SYSTEM_PROMPT = "You are a professional summarizer for business meetings."
+
+CHUNK_PROMPT = """This is part {index} of {total} of a meeting transcript between a UK financial advisor and a client.
+Write compact notes on this part only: client facts and figures, advice given, decisions, action items and open questions.
+Do not add an introduction or conclusion.
+
+{text}"""
+
+REDUCE_PROMPT = """The notes below cover consecutive parts of one meeting, in order.
+Merge them into a single summary of the whole conversation in a concise and professional tone, without repeating points.
+
+{text}"""
+
+
+def chunk_lines(lines: List[str], budget: int = SUMMARY_CHUNK_TOKENS) -> List[str]:
+    """Pack transcript lines into chunks of at most ~`budget` tokens.
+
+    Lines are never reordered; a single line longer than the budget is cut
+    into pieces on character boundaries.
+    """
+    chunks, current, used = [], [], 0
+    max_chars = budget * 4
+    for line in lines:
+        pieces = [line[i:i + max_chars] for i in range(0, len(line), max_chars)] or [line]
+        for piece in pieces:
+            cost = estimate_tokens(piece)
+            if current and used + cost > budget:
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += cost
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+async def _complete(prompt: str, max_tokens: int) -> str:
+    response = await chat_completion(
+        "summary",
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=max_tokens,
+        temperature=0.5
+    )
+    return response.choices[0].message.content.strip()
+
+
+async def summarize_lines(
+    lines: List[str],
+    single_pass_tokens: int = SUMMARY_SINGLE_PASS_TOKENS,
+    chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+    concurrency: int = SUMMARY_CONCURRENCY,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> str:
+    """Summarize a transcript given as ``"speaker: text"`` lines.
+
+    Short transcripts take one call. Longer ones are split into token-bounded
+    chunks that are summarized concurrently (at most `concurrency` at a
+    time) and then merged by a reduce pass; if the chunk notes themselves
+    are too long to merge in one prompt they are reduced again, so latency
+    grows with the log of the meeting length rather than linearly.
+    LLM errors propagate to the caller.
+    """
+    text = "\n".join(lines)
+    if sum(estimate_tokens(line) for line in lines) <= single_pass_tokens:
+        prompt = f"Summarize the following conversation in a concise and professional tone:\n\n{text}"
+        return await _complete(prompt, SUMMARY_MAX_TOKENS)
+
+    semaphore = semaphore or asyncio.Semaphore(concurrency)
+    chunks = chunk_lines(lines, chunk_tokens)
+    logger.info(f"[SUMMARY] map-reduce over {len(chunks)} chunks")
+
+    async def summarize_chunk(index: int, chunk: str) -> str:
+        async with semaphore:
+            prompt = CHUNK_PROMPT.format(index=index + 1, total=len(chunks), text=chunk)
+            return await _complete(prompt, SUMMARY_CHUNK_MAX_TOKENS)
+
+    notes = await asyncio.gather(*(summarize_chunk(i, c) for i, c in enumerate(chunks)))
+
+    # Notes that still do not fit one merge prompt are merged in groups first
+    while sum(estimate_tokens(n) for n in notes) > chunk_tokens and len(notes) > 1:
+        groups = chunk_lines(notes, chunk_tokens)
+        if len(groups) == len(notes):
+            break
+
+        async def merge(group: str) -> str:
+            async with semaphore:
+                return await _complete(REDUCE_PROMPT.format(text=group), SUMMARY_CHUNK_MAX_TOKENS)
+
+        notes = await asyncio.gather(*(merge(g) for g in groups))
+
+    merged = "\n\n".join(f"Part {i + 1}:\n{n}" for i, n in enumerate(notes))
+    return await _complete(REDUCE_PROMPT.format(text=merged), SUMMARY_MAX_TOKENS)
@@ -0,0 +1,154 @@
+# app/transcript_buffer.py
+
+import os
+import uuid
+import asyncio
+import logging
+import random
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from app.db import save_transcripts
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_BATCH_SIZE = int(os.getenv("TRANSCRIPT_BATCH_SIZE", "50"))
+TRANSCRIPT_FLUSH_INTERVAL = float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", "2.0"))
+TRANSCRIPT_MAX_RETRIES = int(os.getenv("TRANSCRIPT_MAX_RETRIES", "5"))
+TRANSCRIPT_MAX_PENDING = int(os.getenv("TRANSCRIPT_MAX_PENDING", "10000"))
+
+
+def _session_of(record: Dict) -> Tuple[str, str, str]:
+    return (record.get("user_id"), record.get("client_id"), record.get("session_id"))
+
+
+class TranscriptWriteBuffer:
+    """Write-behind buffer for `conversations` rows.
+
+    `add` returns immediately; rows are bulk-inserted by a background task
+    when the batch size is reached, every `flush_interval` seconds, or when
+    `flush`/`stop` is awaited. `flush(session_info)` writes only that
+    session's rows. Every row carries a client-generated ``row_id`` and the
+    writer upserts on it, so a batch that timed out after committing can be
+    retried with exponential backoff without duplicating rows; batches that
+    keep failing are dropped. No lock is held while a batch backs off.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = TRANSCRIPT_BATCH_SIZE,
+        flush_interval: float = TRANSCRIPT_FLUSH_INTERVAL,
+        max_retries: int = TRANSCRIPT_MAX_RETRIES,
+        max_pending: int = TRANSCRIPT_MAX_PENDING,
+        base_backoff: float = 0.5,
+        writer=save_transcripts,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+        self.base_backoff = base_backoff
+        self.writer = writer
+        self.pending: Deque[Dict] = deque()
+        self.dropped = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # Batches being written, with the sessions they contain
+        self._writing: Dict[asyncio.Task, Set[Tuple[str, str, str]]] = {}
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and write out everything still pending."""
+        if self._task is not None:
+            # Let the loop finish a batch it is writing rather than cancel it mid-write
+            self._stopping = True
+            self._wakeup.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def add(self, record: Dict):
+        """Queue a row for insertion without waiting on the database."""
+        self.start()
+        record.setdefault("row_id", str(uuid.uuid4()))
+        if len(self.pending) >= self.max_pending:
+            self.pending.popleft()
+            self.dropped += 1
+            logger.warning("Transcript buffer full; dropped oldest row")
+        self.pending.append(record)
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def _take(self, session: Optional[Tuple[str, str, str]]) -> List[Dict]:
+        if session is None:
+            rows = list(self.pending)
+            self.pending.clear()
+            return rows
+        rows, keep = [], deque()
+        for record in self.pending:
+            (rows if _session_of(record) == session else keep).append(record)
+        self.pending = keep
+        return rows
+
+    async def flush(self, session_info: Optional[Dict[str, str]] = None):
+        """Write pending rows (all, or one session's) in batches of at most `batch_size`.
+
+        Also waits for batches already in flight that contain those rows,
+        so the rows are in the table when this returns (or were dropped).
+        A cancelled flush leaves its batches writing in the background.
+        """
+        session = _session_of(session_info) if session_info else None
+        rows = self._take(session)
+        own = [
+            self._spawn_write(rows[i:i + self.batch_size])
+            for i in range(0, len(rows), self.batch_size)
+        ]
+        earlier = [
+            task for task, sessions in self._writing.items()
+            if task not in own and (session is None or session in sessions)
+        ]
+        tasks = own + earlier
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def _spawn_write(self, batch: List[Dict]) -> asyncio.Task:
+        task = asyncio.create_task(self._write_batch(batch))
+        self._writing[task] = {_session_of(r) for r in batch}
+        task.add_done_callback(lambda t: self._writing.pop(t, None))
+        return task
+
+    async def _write_batch(self, batch: List[Dict]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.writer(batch)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.dropped += len(batch)
+                    logger.error(f"Dropping {len(batch)} transcript rows after {attempt + 1} attempts: {e}")
+                    return
+                delay = self.base_backoff * (2 ** attempt)
+                delay += random.uniform(0, delay)
+                logger.warning(f"Transcript batch insert failed ({e}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Transcript flush failed: {e}")
+
+
+transcript_buffer = TranscriptWriteBuffer()
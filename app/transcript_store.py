@@ -0,0 +1,172 @@
+# app/transcript_store.py
+
+import os
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from app.db import load_transcripts
+from app.transcript_buffer import transcript_buffer
+
+logger = logging.getLogger(__name__)
+
+# Total transcript text kept in memory across all sessions
+TRANSCRIPT_STORE_MAX_BYTES = int(os.getenv("TRANSCRIPT_STORE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Sessions untouched for this long are dropped (they can be reloaded from the DB)
+TRANSCRIPT_STORE_IDLE_TTL = float(os.getenv("TRANSCRIPT_STORE_IDLE_TTL", "7200"))
+
+SessionKey = Tuple[str, str, str]
+
+
+def session_key(session_info: Dict[str, str]) -> SessionKey:
+    return (session_info["user_id"], session_info["client_id"], session_info["session_id"])
+
+
+def transcript_line(source: str, speaker_tag: str, text: str) -> str:
+    return f"{source} ({speaker_tag}): {text}"
+
+
+def _when(timestamp: Optional[str]) -> datetime:
+    """Sort key for row timestamps, whether or not they carry a UTC offset."""
+    try:
+        when = datetime.fromisoformat(str(timestamp).replace("Z", "+00:00"))
+    except ValueError:
+        return datetime.min
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc).replace(tzinfo=None)
+    return when
+
+
+class _Session:
+    __slots__ = ("rows", "size", "touched", "synced")
+
+    def __init__(self):
+        # row identity -> (timestamp sort key, line)
+        self.rows: Dict[Hashable, Tuple[datetime, str]] = {}
+        self.size = 0
+        self.touched = time.monotonic()
+        # Latest `conversations` timestamp already merged in; None until first load
+        self.synced: Optional[str] = None
+
+    def lines(self) -> List[str]:
+        return [line for _, line in sorted(self.rows.values(), key=lambda r: r[0])]
+
+
+class SessionTranscriptStore:
+    """Per-session transcript lines held in memory for post-meeting endpoints.
+
+    `TranscriptManager` appends every final segment, so `/summarize` and
+    `/extract_contact` can work from the server's copy instead of a
+    client upload. Lines are keyed by the row's ``row_id`` and ordered by
+    its timestamp. Each `load` flushes the session's buffered rows and
+    merges in the `conversations` rows written since the last load, which
+    backfills a session first seen mid-meeting and picks up segments a
+    different worker recorded (e.g. the other audio socket). Sessions are
+    kept in recency order; the least recently used ones are evicted once
+    `max_bytes` of text is held or after `idle_ttl` seconds untouched.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = TRANSCRIPT_STORE_MAX_BYTES,
+        idle_ttl: float = TRANSCRIPT_STORE_IDLE_TTL,
+        loader=load_transcripts,
+    ):
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.loader = loader
+        self.sessions: "OrderedDict[SessionKey, _Session]" = OrderedDict()
+        self.size = 0
+        self.loads = 0
+        self.loaded_rows = 0
+        self.evictions = 0
+
+    def _touch(self, key: SessionKey) -> Optional[_Session]:
+        session = self.sessions.get(key)
+        if session is not None:
+            session.touched = time.monotonic()
+            self.sessions.move_to_end(key)
+        return session
+
+    def _evict(self):
+        now = time.monotonic()
+        while self.sessions:
+            key, oldest = next(iter(self.sessions.items()))
+            if self.size <= self.max_bytes and now - oldest.touched < self.idle_ttl:
+                break
+            del self.sessions[key]
+            self.size -= oldest.size
+            self.evictions += 1
+
+    def _add(self, session: _Session, row_key: Hashable, timestamp: Optional[str], line: str) -> bool:
+        if row_key in session.rows:
+            return False
+        session.rows[row_key] = (_when(timestamp), line)
+        session.size += len(line)
+        self.size += len(line)
+        return True
+
+    def append(self, session_info: Dict[str, str], record: Dict):
+        """Record a `conversations` row that has just been buffered for writing."""
+        key = session_key(session_info)
+        session = self._touch(key)
+        if session is None:
+            session = self.sessions[key] = _Session()
+        line = transcript_line(record["source"], record["speaker_tag"], record["transcript"])
+        self._add(session, record["row_id"], record.get("timestamp"), line)
+        self._evict()
+
+    def get(self, session_info: Dict[str, str]) -> Optional[List[str]]:
+        """Lines held in memory, without consulting the database."""
+        self._evict()
+        session = self._touch(session_key(session_info))
+        return session.lines() if session is not None else None
+
+    async def load(self, session_info: Dict[str, str]) -> List[str]:
+        """The session's full transcript lines, merged with the database."""
+        self._evict()
+        key = session_key(session_info)
+        session = self._touch(key)
+        since = session.synced if session is not None else None
+
+        self.loads += 1
+        # Segments still in the write-behind buffer must reach the table first
+        await transcript_buffer.flush(session_info)
+        rows = await self.loader(
+            session_info["user_id"], session_info["client_id"], session_info["session_id"],
+            since=since
+        )
+
+        session = self.sessions.get(key)
+        if session is None:
+            if not rows:
+                return []
+            session = self.sessions[key] = _Session()
+        for r in rows:
+            if r.get("timestamp") and (session.synced is None or _when(r["timestamp"]) >= _when(session.synced)):
+                session.synced = r["timestamp"]
+            if not r.get("transcript"):
+                continue
+            line = transcript_line(r.get("source") or "", r.get("speaker_tag") or "", r["transcript"])
+            # Rows written before row ids existed are identified by time and text
+            row_key = r.get("row_id") or (r.get("timestamp"), line)
+            if self._add(session, row_key, r.get("timestamp"), line):
+                self.loaded_rows += 1
+
+        self._touch(key)
+        self._evict()
+        return session.lines()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self.sessions),
+            "bytes": self.size,
+            "loads": self.loads,
+            "loaded_rows": self.loaded_rows,
+            "evictions": self.evictions,
+        }
+
+
+transcript_store = SessionTranscriptStore()
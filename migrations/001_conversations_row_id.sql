@@ -0,0 +1,8 @@
+-- migrations/001_conversations_row_id.sql
+-- Client-generated row ids for `conversations`, so the transcript write
+-- buffer can retry a batch (upsert on row_id) without duplicating rows.
+
+alter table public.conversations add column if not exists row_id uuid;
+
+create unique index if not exists conversations_row_id_key
+    on public.conversations (row_id);
@@ -0,0 +1,7 @@
+-- migrations/002_advisor_chats_context_summary.sql
+-- Rolling summary of the advisor-chat turns that no longer fit the prompt
+-- window, and how many of the chat's messages it covers.
+
+alter table public.advisor_chats add column if not exists context_summary text;
+
+alter table public.advisor_chats add column if not exists summarized_count integer not null default 0;
@@ -0,0 +1,394 @@
+"""Concurrent-session load test for the /mic_and_speaker pipeline.
+
+Starts the FastAPI app in-process (uvicorn on its own thread and event
+loop) with local stand-ins for Google STT (the replay backend), OpenAI,
+DuckDuckGo and Supabase, then opens N concurrent sessions that stream
+tests/fixtures/test.wav in real time and mix in typed `text_input`
+questions. Prints a JSON report:
+
+    python tests/loadtest.py --sessions 50 --duration 60 --output load.json
+
+Latencies come from the server-side segment traces, so they measure our
+own pipeline against stubs with fixed, configurable delays.
+"""
+import sys
+import os
+
+# Add project root to path so `import app` works
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "load-test")
+os.environ.setdefault("OPENAI_API_KEY", "load-test")
+
+import argparse
+import asyncio
+import json
+import resource
+import socket
+import threading
+import time
+import types
+import wave
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import uvicorn
+import websockets
+
+import app.db
+import app.llm
+import app.metrics
+import app.processors.assistant as assistant
+import app.processors.audio_processor as audio_processor
+from app.answer_cache import AnswerCache
+from app.main import app as fastapi_app
+from app.processors.stt_backends import ReplayBackend, ReplayScript
+from app.search import web_search
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WAV_PATH = os.path.join(HERE, "fixtures", "test.wav")
+TRANSCRIPT_PATH = os.path.join(HERE, "transcript.txt")
+
+TEXT_QUESTIONS = [
+    "What is the ISA allowance this year?",
+    "How much can I pay into my pension before tax relief stops?",
+    "Should I overpay my mortgage or invest the money?",
+    "What is the capital gains tax allowance?",
+]
+
+
+# --- Stand-ins -------------------------------------------------------------
+
+class FakeQuery:
+    """PostgREST builder stand-in: every chained call returns itself."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    async def execute(self):
+        await asyncio.sleep(self.latency)
+        return types.SimpleNamespace(data=[{"id": 1}])
+
+
+class FakeSupabase:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def table(self, name: str):
+        return FakeQuery(self.latency)
+
+
+class FakeChatStream:
+    def __init__(self, tokens: int, tokens_per_second: float):
+        self.tokens = tokens
+        self.interval = 1.0 / tokens_per_second
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for i in range(self.tokens):
+            await asyncio.sleep(self.interval)
+            delta = types.SimpleNamespace(content=f"tok{i} ")
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)], usage=None)
+        usage = types.SimpleNamespace(prompt_tokens=400, completion_tokens=self.tokens)
+        yield types.SimpleNamespace(choices=[], usage=usage)
+
+
+class FakeCompletions:
+    def __init__(self, first_token: float, tokens: int, tokens_per_second: float):
+        self.first_token = first_token
+        self.tokens = tokens
+        self.tokens_per_second = tokens_per_second
+
+    async def create(self, timeout=None, stream=False, **kwargs):
+        await asyncio.sleep(self.first_token)
+        if stream:
+            return FakeChatStream(self.tokens, self.tokens_per_second)
+        await asyncio.sleep(self.tokens / self.tokens_per_second)
+        message = types.SimpleNamespace(content="{}")
+        usage = types.SimpleNamespace(prompt_tokens=400, completion_tokens=self.tokens)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+
+class FakeOpenAI:
+    def __init__(self, completions: FakeCompletions):
+        self.chat = types.SimpleNamespace(completions=completions)
+
+    async def close(self):
+        pass
+
+
+class RecordingHistogram:
+    """Wraps a labelled histogram and keeps the raw samples for percentiles."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.samples = defaultdict(list)
+
+    def labels(self, *labels):
+        child = self.inner.labels(*labels)
+        samples = self.samples[labels]
+
+        class _Child:
+            def observe(self, value):
+                child.observe(value)
+                samples.append(value)
+
+        return _Child()
+
+
+@contextmanager
+def patched(target, name, value):
+    original = getattr(target, name)
+    setattr(target, name, value)
+    try:
+        yield
+    finally:
+        setattr(target, name, original)
+
+
+@contextmanager
+def stubbed_services(args):
+    """Swap external services for local stand-ins; restores them on exit."""
+    def fake_search(query, max_results):
+        time.sleep(args.search_latency)
+        return [{"title": "Result", "body": f"About {query}", "href": "https://example.com"}]
+
+    async def fake_get_supabase():
+        return FakeSupabase(args.db_latency)
+
+    completions = FakeCompletions(args.llm_first_token, args.llm_tokens, args.llm_tokens_per_second)
+    backend = ReplayBackend(
+        ReplayScript.from_transcript(TRANSCRIPT_PATH), latency=args.stt_latency, repeat=True
+    )
+    segment_latency = RecordingHistogram(app.metrics.SEGMENT_LATENCY)
+    answer_cache = AnswerCache() if args.answer_cache else AnswerCache(max_entries=0)
+
+    with patched(app.db, "get_supabase", fake_get_supabase), \
+            patched(app.llm, "openai_client", FakeOpenAI(completions)), \
+            patched(web_search, "fetch", fake_search), \
+            patched(assistant, "answer_cache", answer_cache), \
+            patched(audio_processor, "get_speech_client", lambda: backend), \
+            patched(app.metrics, "SEGMENT_LATENCY", segment_latency):
+        yield segment_latency
+
+
+# --- Server ----------------------------------------------------------------
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes a sleeping task."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples = []
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+
+class ServerThread(threading.Thread):
+    def __init__(self, port: int):
+        super().__init__(daemon=True)
+        self.server = uvicorn.Server(uvicorn.Config(
+            fastapi_app, host="127.0.0.1", port=port, log_level="warning", ws_max_size=2 ** 22
+        ))
+        self.lag = LoopLagMonitor()
+
+    def run(self):
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        monitor = asyncio.create_task(self.lag.run())
+        try:
+            await self.server.serve()
+        finally:
+            monitor.cancel()
+
+    def wait_started(self, timeout: float = 10.0):
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.is_alive():
+                raise RuntimeError("Server did not start")
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.join(timeout=10)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# --- Clients ---------------------------------------------------------------
+
+def load_wav(path: str):
+    with wave.open(path) as w:
+        if w.getnchannels() != 1 or w.getsampwidth() != 2:
+            raise ValueError("Load-test audio must be mono 16-bit PCM")
+        return w.getframerate(), w.readframes(w.getnframes())
+
+
+async def run_session(index: int, url: str, rate: int, pcm: bytes, args, totals: Counter):
+    await asyncio.sleep(args.ramp * index / max(1, args.sessions))
+    uri = (
+        f"{url}/mic_and_speaker?userId=load-{index}&clientId=client-{index}"
+        f"&sessionId=session-{index}&sampleRate={rate}"
+    )
+    chunk_bytes = rate * 2 // 10  # 100 ms
+    pace = 0.1 / args.speed
+    loop = asyncio.get_running_loop()
+
+    async with websockets.connect(uri, max_size=None) as ws:
+        async def receive():
+            async for message in ws:
+                totals[f"msg:{json.loads(message)['type']}"] += 1
+
+        receiver = asyncio.create_task(receive())
+        started = loop.time()
+        next_text = started + args.text_interval if args.text_interval else None
+        questions = 0
+        try:
+            while loop.time() - started < args.duration:
+                for offset in range(0, len(pcm), chunk_bytes):
+                    await ws.send(pcm[offset:offset + chunk_bytes])
+                    totals["audio_bytes"] += len(pcm[offset:offset + chunk_bytes])
+                    if next_text is not None and loop.time() >= next_text:
+                        await ws.send(json.dumps({
+                            "type": "text_input",
+                            "content": TEXT_QUESTIONS[(index + questions) % len(TEXT_QUESTIONS)],
+                        }))
+                        questions += 1
+                        totals["text_inputs"] += 1
+                        next_text += args.text_interval
+                    await asyncio.sleep(pace)
+                    if loop.time() - started >= args.duration:
+                        break
+            # Let in-flight replies finish before hanging up
+            await asyncio.sleep(args.drain)
+        finally:
+            receiver.cancel()
+            await asyncio.gather(receiver, return_exceptions=True)
+
+
+def _percentiles(values, scale: float = 1000.0):
+    if not values:
+        return {"n": 0}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {
+        "n": len(values),
+        "p50": round(pick(0.50) * scale, 1),
+        "p95": round(pick(0.95) * scale, 1),
+        "p99": round(pick(0.99) * scale, 1),
+        "max": round(values[-1] * scale, 1),
+    }
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+    except (OSError, ValueError):
+        return 0.0
+
+
+async def _drive(url: str, args, totals: Counter):
+    rate, pcm = load_wav(args.wav)
+    results = await asyncio.gather(
+        *(run_session(i, url, rate, pcm, args, totals) for i in range(args.sessions)),
+        return_exceptions=True,
+    )
+    return [r for r in results if isinstance(r, BaseException)]
+
+
+def run_load_test(args) -> dict:
+    totals = Counter()
+    port = _free_port()
+    rss_start = _rss_mb()
+
+    with stubbed_services(args) as segment_latency:
+        server = ServerThread(port)
+        server.start()
+        server.wait_started()
+        started = time.monotonic()
+        try:
+            errors = asyncio.run(_drive(f"ws://127.0.0.1:{port}", args, totals))
+        finally:
+            wall = time.monotonic() - started
+            rss_end = _rss_mb()
+            server.stop()
+
+    samples = segment_latency.samples
+    audio_seconds = totals["audio_bytes"] / 2 / load_wav(args.wav)[0]
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "sessions": args.sessions,
+        "sessions_failed": len(errors),
+        "errors": sorted({f"{type(e).__name__}: {e}" for e in errors})[:10],
+        "wall_seconds": round(wall, 2),
+        "audio_seconds_sent": round(audio_seconds, 1),
+        "audio_realtime_factor": round(audio_seconds / wall, 2) if wall else 0.0,
+        "segments": totals["msg:mic_and_speaker_transcription"],
+        "replies": totals["msg:openai_assistant_completed"],
+        "replies_per_second": round(totals["msg:openai_assistant_completed"] / wall, 2) if wall else 0.0,
+        "segment_to_transcript_ms": _percentiles(samples[("mic_and_speaker", "transcript")]),
+        "segment_to_reply_ms": _percentiles(samples[("mic_and_speaker", "answer")]),
+        "text_input_to_reply_ms": _percentiles(samples[("text_input", "answer")]),
+        "event_loop_lag_ms": _percentiles(server.lag.samples),
+        "rss_mb": {
+            "start": rss_start,
+            "end": rss_end,
+            "peak": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        "client_messages": {k[4:]: v for k, v in sorted(totals.items()) if k.startswith("msg:")},
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of audio per session")
+    parser.add_argument("--speed", type=float, default=1.0, help="audio send rate as a multiple of real time")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which sessions connect")
+    parser.add_argument("--drain", type=float, default=3.0, help="seconds to wait for replies after audio ends")
+    parser.add_argument("--text-interval", type=float, default=10.0, help="seconds between text_input messages; 0 disables")
+    parser.add_argument("--wav", default=WAV_PATH)
+    parser.add_argument("--stt-latency", type=float, default=0.3)
+    parser.add_argument("--llm-first-token", type=float, default=0.4)
+    parser.add_argument("--llm-tokens", type=int, default=80)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    parser.add_argument("--answer-cache", action="store_true", help="keep the answer cache enabled")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run_load_test(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
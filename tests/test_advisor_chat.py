@@ -0,0 +1,252 @@
+import json
+import asyncio
+import types
+import pytest
+
+import app.chat_context as chat_context
+import app.routers.advisor_chat as advisor_chat
+from app.chat_context import ChatContextManager
+
+
+class Recorder:
+    """Fake run_query that records each round trip as (table, method, payload)."""
+
+    def __init__(self, history=()):
+        self.history = list(history)
+        self.calls = []
+
+    async def run_query(self, build, timeout=None, op="query"):
+        log = []
+
+        class Query:
+            def __init__(self, table):
+                self.table = table
+
+            def __getattr__(self, name):
+                def call(*args, **kwargs):
+                    log.append((self.table, name, args[0] if args else None))
+                    return self
+                return call
+
+        build(types.SimpleNamespace(table=Query))
+        self.calls.append(log[0])
+        await asyncio.sleep(0.01)
+        if log[0][:2] == ("advisor_messages", "select"):
+            return types.SimpleNamespace(data=self.history, count=len(self.history))
+        if log[0][:2] == ("advisor_chats", "select"):
+            return types.SimpleNamespace(data=[])
+        return types.SimpleNamespace(data=[{"timestamp": "2024-01-01T00:00:00"}])
+
+
+@pytest.fixture
+def db(monkeypatch):
+    recorder = Recorder()
+
+    async def fake_completion(endpoint, **kwargs):
+        message = types.SimpleNamespace(content=" Sure. ")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(advisor_chat, "run_query", recorder.run_query)
+    monkeypatch.setattr(chat_context, "run_query", recorder.run_query)
+    monkeypatch.setattr(advisor_chat, "chat_completion", fake_completion)
+    monkeypatch.setattr(advisor_chat, "chat_contexts", ChatContextManager())
+    return recorder
+
+
+@pytest.mark.asyncio
+async def test_first_message_batches_rows_and_sets_title_in_background(db):
+    payload = advisor_chat.UserMessage(prompt="Plan my retirement", contact={"name": "Jane"})
+
+    reply = await advisor_chat.send_message("chat-1", payload, user_id="u")
+    await asyncio.gather(*advisor_chat._background)
+
+    assert reply["content"] == "Sure."
+    inserts = [c[2] for c in db.calls if c[:2] == ("advisor_messages", "insert")]
+    # One multi-row insert for prompt + contact, then one for the reply
+    assert len(inserts) == 2
+    assert [r["content"][:18] for r in inserts[0]] == ["Plan my retirement", "[Contact Attached]"]
+    assert inserts[1]["role"] == "assistant"
+    assert ("advisor_chats", "update", {"title": "Plan my retirement"}) in db.calls
+
+
+@pytest.mark.asyncio
+async def test_follow_up_turn_reads_history_from_cache(db):
+    await advisor_chat.send_message("chat-1", advisor_chat.UserMessage(prompt="Hi"), user_id="u")
+    await asyncio.gather(*advisor_chat._background)
+    db.calls.clear()
+
+    await advisor_chat.send_message("chat-1", advisor_chat.UserMessage(prompt="And ISAs?"), user_id="u")
+
+    assert [c[:2] for c in db.calls] == [("advisor_messages", "insert"), ("advisor_messages", "insert")]
+    assert advisor_chat._background == set()
+
+
+def fake_stream(deltas, gate=None, closed=None):
+    """Stand-in for stream_chat_completion yielding `deltas` as chunks."""
+    from contextlib import asynccontextmanager
+
+    @asynccontextmanager
+    async def stream_chat_completion(endpoint, **kwargs):
+        async def chunks():
+            for i, text in enumerate(deltas):
+                if gate is not None and i == 1:
+                    await gate.wait()
+                delta = types.SimpleNamespace(content=text)
+                yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+        try:
+            yield chunks()
+        finally:
+            if closed is not None:
+                closed.append(True)
+    return stream_chat_completion
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_deltas_then_stored_message(db, monkeypatch):
+    monkeypatch.setattr(advisor_chat, "stream_chat_completion", fake_stream([" ISAs", " are", " tax-free."]))
+
+    resp = await advisor_chat.stream_message("chat-1", advisor_chat.UserMessage(prompt="ISAs?"), user_id="u")
+    body = "".join([part async for part in resp.body_iterator])
+    await asyncio.gather(*advisor_chat._background)
+
+    assert resp.media_type == "text/event-stream"
+    events = parse_events(body)
+    assert [e for e, _ in events] == ["delta", "delta", "delta", "done"]
+    assert events[-1][1] == {"role": "assistant", "content": "ISAs are tax-free.", "timestamp": "2024-01-01T00:00:00"}
+    inserts = [c[2] for c in db.calls if c[:2] == ("advisor_messages", "insert")]
+    assert inserts[-1]["content"] == "ISAs are tax-free."
+
+
+@pytest.mark.asyncio
+async def test_stream_disconnect_cancels_generation_and_skips_save(db, monkeypatch):
+    closed = []
+    gate = asyncio.Event()
+    monkeypatch.setattr(advisor_chat, "stream_chat_completion", fake_stream(["Hello", " there"], gate, closed))
+
+    resp = await advisor_chat.stream_message("chat-1", advisor_chat.UserMessage(prompt="Hi"), user_id="u")
+    first = asyncio.Event()
+
+    async def consume():
+        async for _ in resp.body_iterator:
+            first.set()
+
+    reader = asyncio.create_task(consume())
+    await first.wait()
+    reader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await reader
+    await asyncio.sleep(0.05)
+
+    assert closed == [True]
+    inserts = [c[2] for c in db.calls if c[:2] == ("advisor_messages", "insert")]
+    assert len(inserts) == 1 and inserts[0][0]["role"] == "user"
+
+
+class PageRecorder:
+    """Fake run_query that captures the full query chain and returns `rows`."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.chain = []
+
+    async def run_query(self, build, timeout=None, op="query"):
+        chain = self.chain
+
+        class Query:
+            def __getattr__(self, name):
+                def call(*args, **kwargs):
+                    chain.append((name, args, kwargs))
+                    return self
+                return call
+
+        build(types.SimpleNamespace(table=lambda name: Query()))
+        return types.SimpleNamespace(data=self.rows)
+
+
+@pytest.mark.asyncio
+async def test_message_history_is_a_projected_keyset_page(monkeypatch):
+    from fastapi import Response
+
+    rows = [
+        {"id": 9, "role": "assistant", "content": "b", "timestamp": "2024-01-02"},
+        {"id": 8, "role": "user", "content": "a", "timestamp": "2024-01-01"},
+    ]
+    db = PageRecorder(rows)
+    monkeypatch.setattr(advisor_chat, "run_query", db.run_query)
+
+    response = Response()
+    page = await advisor_chat.get_chat_messages("chat-1", response, limit=2, before=None, since=None, user_id="u")
+
+    assert [m["id"] for m in page] == [8, 9]
+    assert ("select", (advisor_chat.MESSAGE_COLUMNS,), {}) in db.chain
+    assert ("limit", (2,), {}) in db.chain
+    cursor = response.headers["X-Next-Cursor"]
+    assert advisor_chat._decode_cursor(cursor) == ("2024-01-01", "8")
+
+    db.chain.clear()
+    await advisor_chat.get_chat_messages("chat-1", Response(), limit=2, before=cursor, since=None, user_id="u")
+    assert ("or_", ('timestamp.lt."2024-01-01",and(timestamp.eq."2024-01-01",id.lt."8")',), {}) in db.chain
+
+
+@pytest.mark.asyncio
+async def test_short_page_has_no_cursor_and_bad_cursor_is_rejected(monkeypatch):
+    from fastapi import HTTPException, Response
+
+    db = PageRecorder([{"id": "c1", "title": "t", "created_at": "2024-01-01"}])
+    monkeypatch.setattr(advisor_chat, "run_query", db.run_query)
+
+    since = advisor_chat._encode_cursor({"id": "c0", "created_at": "2023-12-31"}, "created_at")
+    response = Response()
+    await advisor_chat.list_chats(response, limit=50, before=None, since=since, user_id="u")
+    assert "X-Next-Cursor" not in response.headers
+    assert advisor_chat._decode_cursor(response.headers["X-Latest-Cursor"]) == ("2024-01-01", "c1")
+    assert ("or_", ('created_at.gt."2023-12-31",and(created_at.eq."2023-12-31",id.gt."c0")',), {}) in db.chain
+
+    with pytest.raises(HTTPException) as exc:
+        await advisor_chat.list_chats(Response(), limit=50, before="not-a-cursor", since=None, user_id="u")
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.parametrize("row", [
+    {"id": "c0", "created_at": '2024-01-01",id.gt."0'},
+    {"id": 'c0",user_id.neq."u', "created_at": "2024-01-01"},
+    {"id": "c0", "created_at": "yesterday"},
+])
+def test_cursor_values_that_could_alter_the_filter_are_rejected(row):
+    from fastapi import HTTPException
+
+    with pytest.raises(HTTPException) as exc:
+        advisor_chat._decode_cursor(advisor_chat._encode_cursor(row, "created_at"))
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_since_pages_forward_without_skipping_timestamp_ties(monkeypatch):
+    from fastapi import Response
+
+    # Prompt and contact rows from one insert share a timestamp
+    rows = [
+        {"id": 11, "role": "user", "content": "contact", "timestamp": "2024-01-03"},
+        {"id": 12, "role": "assistant", "content": "reply", "timestamp": "2024-01-04"},
+    ]
+    db = PageRecorder(rows)
+    monkeypatch.setattr(advisor_chat, "run_query", db.run_query)
+    held = advisor_chat._encode_cursor({"id": 10, "timestamp": "2024-01-03"}, "timestamp")
+
+    response = Response()
+    page = await advisor_chat.get_chat_messages("chat-1", response, limit=2, before=None, since=held, user_id="u")
+
+    assert [m["id"] for m in page] == [11, 12]
+    assert ("or_", ('timestamp.gt."2024-01-03",and(timestamp.eq."2024-01-03",id.gt."10")',), {}) in db.chain
+    assert ("order", ("id",), {}) in db.chain
+    # A full page means more may follow: continue from its newest row
+    assert advisor_chat._decode_cursor(response.headers["X-Next-Cursor"]) == ("2024-01-04", "12")
+    assert response.headers["X-Latest-Cursor"] == response.headers["X-Next-Cursor"]
@@ -0,0 +1,69 @@
+import time
+
+from prometheus_client import REGISTRY
+
+from app.answer_cache import AnswerCache
+
+
+def test_exact_and_near_duplicate_hits():
+    cache = AnswerCache()
+    cache.put("t1", "What is the ISA allowance this year?", "£20,000")
+
+    assert cache.get("t1", "what is the ISA allowance this year") == "£20,000"
+    assert cache.get("t1", "What's the ISA allowance for this year?") == "£20,000"
+    assert cache.stats()["near_hits"] == 1
+
+
+def test_different_questions_miss():
+    cache = AnswerCache()
+    cache.put("t1", "What is the ISA allowance for 2024?", "£20,000")
+
+    assert cache.get("t1", "What is the ISA allowance for 2023?") is None
+    assert cache.get("t1", "How do I transfer my pension?") is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_near_duplicate_with_different_figures_misses():
+    cache = AnswerCache()
+    q = "I am {age} years old earning 60000 pounds, how much can I pay into my pension this year?"
+    cache.put("t1", q.format(age=45), "ANSWER-45")
+
+    assert cache.get("t1", q.format(age=67)) is None
+    assert cache.get("t1", q.format(age=45).replace("this year", "per year")) == "ANSWER-45"
+    assert cache.get("t1", q.format(age=45).replace("60000", "60k")) is None
+
+
+def test_tenants_are_isolated():
+    cache = AnswerCache()
+    cache.put("firm-a", "What is the ISA allowance?", "a")
+    assert cache.get("firm-b", "What is the ISA allowance?") is None
+
+
+def test_ttl_expiry_and_lru_eviction():
+    cache = AnswerCache(ttl=0.05, max_entries=2)
+    cache.put("t", "pension transfer rules", "1")
+    cache.put("t", "isa allowance", "2")
+    cache.get("t", "pension transfer rules")
+    cache.put("t", "inheritance tax threshold", "3")
+
+    assert cache.get("t", "isa allowance") is None
+    assert cache.get("t", "pension transfer rules") == "1"
+    assert not any(("t", "isa allowance") in bucket for bucket in cache.buckets.values())
+
+    time.sleep(0.1)
+    assert cache.get("t", "inheritance tax threshold") is None
+
+
+def test_lookups_are_exported_as_metrics():
+    sample = lambda result: REGISTRY.get_sample_value(
+        "advisor_answer_cache_lookups_total", {"result": result}
+    ) or 0.0
+    before = [sample(r) for r in ("hit", "near_hit", "miss")]
+
+    cache = AnswerCache()
+    cache.put("t", "What is the ISA allowance this year?", "£20,000")
+    cache.get("t", "What is the ISA allowance this year?")
+    cache.get("t", "What's the ISA allowance for this year?")
+    cache.get("t", "How do I transfer my pension?")
+
+    assert [sample(r) for r in ("hit", "near_hit", "miss")] == [b + 1 for b in before]
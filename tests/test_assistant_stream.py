@@ -0,0 +1,116 @@
+import json
+import types
+import pytest
+
+import app.llm as llm
+import app.processors.assistant as assistant
+from app.answer_cache import AnswerCache
+
+SESSION = {"user_id": "u", "client_id": "c", "session_id": "s"}
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+class FakeStream:
+    def __init__(self, pieces):
+        self.pieces = pieces
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self._gen()
+
+    async def _gen(self):
+        for p in self.pieces:
+            delta = types.SimpleNamespace(content=p)
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    rows = []
+
+    async def fake_save(**kwargs):
+        rows.append(kwargs["response_text"])
+
+    monkeypatch.setattr(assistant, "save_openai_response", fake_save)
+    async def no_results(query):
+        return []
+
+    monkeypatch.setattr(assistant.web_search, "search", no_results)
+    monkeypatch.setattr(assistant, "answer_cache", AnswerCache())
+    return rows
+
+
+def _fake_completion(monkeypatch, result):
+    async def create(timeout=None, **kwargs):
+        assert kwargs["stream"] is True
+        if isinstance(result, Exception):
+            raise result
+        return FakeStream(result)
+
+    completions = types.SimpleNamespace(create=create)
+    monkeypatch.setattr(llm, "breaker", llm.CircuitBreaker())
+    monkeypatch.setattr(llm, "openai_client", types.SimpleNamespace(
+        chat=types.SimpleNamespace(completions=completions)
+    ))
+
+
+@pytest.mark.asyncio
+async def test_chunks_are_forwarded_as_deltas_then_persisted(monkeypatch, saved):
+    _fake_completion(monkeypatch, ["  <i>ISA?</i>", None, "<br></br>", "£20,000"])
+    ws = FakeWebSocket()
+
+    reply = await assistant.stream_openai_response("What is the ISA allowance?", SESSION, ws)
+
+    assert [m["type"] for m in ws.sent] == ["openai_assistant_delta"] * 3 + ["openai_assistant_completed"]
+    assert "".join(m["content"] for m in ws.sent) == reply == "<i>ISA?</i><br></br>£20,000"
+    assert saved == [reply]
+
+
+@pytest.mark.asyncio
+async def test_error_before_first_token_sends_error_reply(monkeypatch, saved):
+    _fake_completion(monkeypatch, RuntimeError("down"))
+    ws = FakeWebSocket()
+
+    reply = await assistant.stream_openai_response("What is my pension worth?", SESSION, ws)
+
+    assert reply == assistant.ERROR_REPLY
+    assert [m["type"] for m in ws.sent] == ["openai_assistant_delta", "openai_assistant_completed"]
+    assert saved == []
+
+
+@pytest.mark.asyncio
+async def test_small_talk_is_short_circuited(monkeypatch, saved):
+    _fake_completion(monkeypatch, AssertionError("LLM must not be called"))
+    ws = FakeWebSocket()
+
+    reply = await assistant.stream_openai_response("Hi, how are you?", SESSION, ws)
+
+    assert reply == assistant.WAITING_REPLY
+    assert [m["content"] for m in ws.sent] == [assistant.WAITING_REPLY, ""]
+    assert saved == []
+
+
+@pytest.mark.asyncio
+async def test_repeated_question_is_served_from_answer_cache(monkeypatch, saved):
+    _fake_completion(monkeypatch, ["<i>ISA?</i>", "£20,000"])
+    first = await assistant.stream_openai_response("What is the ISA allowance this year?", SESSION, FakeWebSocket())
+
+    _fake_completion(monkeypatch, AssertionError("LLM must not be called"))
+    ws = FakeWebSocket()
+    second = await assistant.stream_openai_response("What's the ISA allowance for this year?", SESSION, ws)
+
+    assert second == first
+    assert [m["type"] for m in ws.sent] == ["openai_assistant_delta", "openai_assistant_completed"]
+    assert saved == [first, first]
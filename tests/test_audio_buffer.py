@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+
+from app.processors.audio_buffer import AudioBuffer
+
+
+@pytest.mark.asyncio
+async def test_small_writes_are_coalesced_into_frames():
+    buf = AudioBuffer(capacity=10000, frame_bytes=3200, linger=1)
+    for i in range(20):
+        buf.write(bytes([i]) * 320)
+
+    first = await buf.read(timeout=0.1)
+    second = await buf.read(timeout=0.1)
+    assert len(first) == len(second) == 3200
+    assert first[:320] == bytes([0]) * 320 and second[:320] == bytes([10]) * 320
+    assert buf.stats()["frames_out"] == 2
+
+
+@pytest.mark.asyncio
+async def test_partial_frame_flushed_after_linger_and_on_close():
+    buf = AudioBuffer(capacity=10000, frame_bytes=3200, linger=0.05)
+    buf.write(b"\1" * 640)
+    assert await buf.read(timeout=1) == b"\1" * 640
+    assert await buf.read(timeout=0.05) == b""
+
+    buf.write(b"\2" * 100)
+    buf.close()
+    assert await buf.read() == b"\2" * 100
+    assert await buf.read() is None
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_keeps_newest_audio_across_wraparound():
+    buf = AudioBuffer(capacity=1000, frame_bytes=400, linger=1, policy="drop_oldest")
+    buf.write(b"\1" * 600)
+    await buf.read(timeout=0.1)
+    buf.write(b"\2" * 600)
+    buf.write(b"\3" * 600)
+
+    stats = buf.stats()
+    assert stats["depth_bytes"] == 1000
+    assert stats["bytes_dropped"] == 400
+    data = b"".join([await buf.read(timeout=0.1) for _ in range(2)])
+    assert data == b"\2" * 400 + b"\3" * 400
+
+
+@pytest.mark.asyncio
+async def test_pause_policy_blocks_writer_until_drained():
+    buf = AudioBuffer(capacity=800, frame_bytes=400, linger=1, policy="pause")
+    buf.write(b"\1" * 1000)
+    assert buf.stats()["bytes_dropped"] == 0
+
+    waiter = asyncio.create_task(buf.wait_writable())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    await buf.read(timeout=0.1)
+    await asyncio.wait_for(waiter, timeout=0.1)
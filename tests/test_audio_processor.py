@@ -0,0 +1,134 @@
+import asyncio
+import datetime
+import pytest
+from google.cloud import speech_v1p1beta1 as speech
+
+from app.processors.audio_processor import (
+    AudioProcessor, BYTES_PER_SECOND, STREAM_OVERLAP_SECONDS, _trim_overlap
+)
+
+
+def _final(text, end_seconds):
+    return speech.StreamingRecognitionResult(
+        is_final=True,
+        result_end_time=datetime.timedelta(seconds=end_seconds),
+        alternatives=[speech.SpeechRecognitionAlternative(transcript=text)],
+    )
+
+
+def test_trim_overlap():
+    assert _trim_overlap("we talked about my pension", "about my pension and ISA") == "and ISA"
+    assert _trim_overlap("my pension.", "Pension plans") == "Pension plans"
+
+
+def test_rotation_replays_overlap_and_dedupes_seam():
+    proc = AudioProcessor("mic")
+    for _ in range(100):
+        proc._remember(b"\0" * (BYTES_PER_SECOND // 10))
+    proc.last_final_end = 9.5
+    proc.last_final_text = "I would like to review my pension"
+
+    replay = proc._begin_stream()
+    assert sum(len(c) for c in replay) >= proc.overlap_bytes
+    # Replayed audio is not new audio: the session timeline does not move
+    assert proc.bytes_sent == 10 * BYTES_PER_SECOND
+    assert 7.5 <= proc.stream_offset <= 8.0
+
+    resp = speech.StreamingRecognizeResponse(results=[
+        _final("review my pension", 9.4 - proc.stream_offset),
+        _final("my pension and my ISA", 11.0 - proc.stream_offset),
+    ])
+    proc._dedupe_seam(resp)
+
+    assert [r.alternatives[0].transcript for r in resp.results] == ["and my ISA"]
+    assert proc.last_final_end == pytest.approx(11.0)
+
+
+class FakeSpeechClient:
+    """Echoes one final result per stream once the audio generator ends."""
+
+    def __init__(self):
+        self.streams = []
+
+    async def streaming_recognize(self, requests, offset=0.0):
+        sent = [r async for r in requests]
+        self.streams.append(sent)
+
+        async def responses():
+            yield speech.StreamingRecognizeResponse(results=[
+                _final(f"stream {len(self.streams)}", 0.2 * len(self.streams))
+            ])
+
+        return responses()
+
+
+@pytest.mark.asyncio
+async def test_async_engine_rotates_streams(monkeypatch):
+    import app.processors.audio_processor as ap
+
+    client = FakeSpeechClient()
+    monkeypatch.setattr(ap, "get_speech_client", lambda: client)
+    monkeypatch.setattr(ap, "STREAM_ROTATE_SECONDS", 0.05)
+
+    proc = AudioProcessor("mic")
+    proc.start()
+    proc.add_audio(b"\1" * 3200)
+    first, _ = await asyncio.wait_for(proc.response_queue.get(), timeout=1)
+    second, _ = await asyncio.wait_for(proc.response_queue.get(), timeout=1)
+    proc.stop()
+
+    assert first.results[0].alternatives[0].transcript == "stream 1"
+    assert second.results[0].alternatives[0].transcript == "stream 2"
+    # Every stream opens with the config, and the overlap is replayed into the next one
+    assert all(s[0].streaming_config.config.sample_rate_hertz == 16000 for s in client.streams)
+    assert client.streams[1][1].audio_content == b"\1" * 3200
+    assert proc.rotations >= 1
+
+
+def test_compressed_rotation_replays_header_and_whole_pages(monkeypatch):
+    import app.processors.audio_processor as ap
+    from app.processors.audio_format import AudioFormat
+
+    clock = [100.0]
+    monkeypatch.setattr(ap.time, "monotonic", lambda: clock[0])
+    proc = AudioProcessor("mic", audio_format=AudioFormat("ogg_opus"))
+    assert proc.vad is None
+
+    proc._remember(b"OggS" + b"H" * 20 + b"OggS" + b"T" * 20)
+    for i in range(10):
+        clock[0] += 0.5
+        proc._remember(b"OggS" + bytes([i]) * 40)
+
+    replay = proc._begin_stream()
+    assert replay[0] == proc.framer.header
+    audio = b"".join(replay[1:])
+    # Starts on a page and covers at least the overlap window
+    assert audio.startswith(b"OggS")
+    now = proc._position()
+    assert now - STREAM_OVERLAP_SECONDS - 0.5 <= proc.stream_offset <= now - STREAM_OVERLAP_SECONDS
+    # Bytes the framer was still holding back are replayed too
+    assert audio.endswith(bytes([9]) * 40)
+
+
+@pytest.mark.asyncio
+async def test_compressed_overflow_pauses_instead_of_dropping_pages():
+    from app.processors.audio_format import AudioFormat
+
+    proc = AudioProcessor("mic", audio_format=AudioFormat("ogg_opus"))
+    proc.running = True
+    limit = proc.audio_buffer.limit
+    pages = [b"OggS" + bytes([i % 256]) * 996 for i in range(limit // 1000 + 5)]
+    for page in pages:
+        proc.add_audio(page)
+
+    assert proc.stats()["bytes_dropped"] == 0
+    waiter = asyncio.create_task(proc.wait_writable())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    proc.audio_buffer.close()
+    received = b""
+    while (frame := await proc.audio_buffer.read()) is not None:
+        received += frame
+    assert received == b"".join(pages)
+    await asyncio.wait_for(waiter, timeout=0.1)
@@ -0,0 +1,89 @@
+import time
+import jwt
+import pytest
+
+from app.auth import AuthError, TokenVerifier
+
+SECRET = "super-secret-jwt-token-with-at-least-32-characters"
+
+
+def _token(secret=SECRET, **claims):
+    payload = {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 3600, **claims}
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+async def _no_remote(token):
+    raise AssertionError("remote lookup must not be used")
+
+
+@pytest.mark.asyncio
+async def test_valid_token_is_verified_locally_then_cached():
+    verifier = TokenVerifier(secret=SECRET, remote=_no_remote)
+    token = _token()
+
+    assert await verifier.verify(token) == "user-1"
+    assert await verifier.verify(token) == "user-1"
+    assert verifier.stats()["hits"] == 1
+    assert verifier.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("token", [
+    _token(exp=int(time.time()) - 3600),
+    _token(aud="anon-key"),
+    _token(secret="another-secret-of-at-least-32-characters!"),
+    "not-a-jwt",
+])
+async def test_invalid_tokens_are_rejected_without_remote_call(token):
+    verifier = TokenVerifier(secret=SECRET, remote=_no_remote)
+    with pytest.raises(AuthError):
+        await verifier.verify(token)
+    assert verifier.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_remote_fallback_only_without_key_material():
+    calls = []
+
+    async def remote(token):
+        calls.append(token)
+        return "user-remote"
+
+    token = _token()
+    verifier = TokenVerifier(secret=None, remote=remote)
+    assert await verifier.verify(token) == "user-remote"
+    assert await verifier.verify(token) == "user-remote"
+    assert calls == [token]
+
+    strict = TokenVerifier(secret=None, remote=remote, remote_fallback=False)
+    with pytest.raises(AuthError):
+        await strict.verify(token)
+
+
+@pytest.mark.asyncio
+async def test_cache_never_outlives_the_token():
+    verifier = TokenVerifier(secret=SECRET, ttl=3600, remote=_no_remote)
+    token = _token(exp=int(time.time()) + 1)
+    await verifier.verify(token)
+    (_, expires_at), = verifier.cache.values()
+    assert expires_at <= time.time() + 1
+
+
+@pytest.mark.asyncio
+async def test_remote_result_is_cached_no_longer_than_token_exp():
+    calls = []
+
+    async def remote(token):
+        calls.append(token)
+        return "user-remote"
+
+    verifier = TokenVerifier(secret=None, ttl=3600, remote=remote)
+    token = _token(exp=int(time.time()) + 1)
+    await verifier.verify(token)
+    (_, expires_at), = verifier.cache.values()
+    assert expires_at <= time.time() + 1
+
+    # Once expired, the token goes back to Supabase instead of the cache
+    verifier.cache[next(iter(verifier.cache))] = ("user-remote", time.time() - 1)
+    await verifier.verify(token)
+    assert len(calls) == 2
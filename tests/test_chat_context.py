@@ -0,0 +1,146 @@
+import json
+import types
+import pytest
+
+import app.chat_context as chat_context
+from app.chat_context import CONTACT_PREFIX, ChatContextManager, ChatState, compact_contact, estimate_tokens
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, args))
+            return self
+        return call
+
+
+class FakeDB:
+    def __init__(self, rows, summary=None):
+        self.rows = rows
+        self.summary = summary
+        self.queries = []
+
+    async def run_query(self, build, timeout=None, op="query"):
+        query = build(types.SimpleNamespace(table=lambda name: FakeQuery(self, name)))
+        self.queries.append((query.table, query.calls))
+        names = [c[0] for c in query.calls]
+        if query.table == "advisor_chats" and "select" in names:
+            return types.SimpleNamespace(data=[self.summary] if self.summary else [])
+        if query.table == "advisor_messages":
+            (limit,) = dict(query.calls)["limit"]
+            newest = self.rows[::-1][:limit]
+            return types.SimpleNamespace(data=newest, count=len(self.rows))
+        return types.SimpleNamespace(data=[{}])
+
+
+def _turns(n, words=40):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "word " * words}
+        for i in range(n)
+    ]
+
+
+def test_compact_contact_drops_empty_fields():
+    contact = {"name": "Jane", "email": "", "phones": [], "address": {"city": "Leeds", "zip": None}}
+    assert compact_contact(contact) == '{"address":{"city":"Leeds"},"name":"Jane"}'
+
+
+def test_window_respects_budget_and_keeps_latest_contact_only():
+    legacy = f"{CONTACT_PREFIX}\n" + json.dumps({"name": "Old"}, indent=2)
+    latest = f"{CONTACT_PREFIX}\n" + json.dumps({"name": "Jane", "age": 52}, indent=2)
+    state = ChatState(messages=[{"role": "user", "content": legacy}] + _turns(20)
+                      + [{"role": "user", "content": latest}] + _turns(2))
+    contexts = ChatContextManager(budget=600, summary_min_messages=100)
+
+    msgs = contexts.build_messages("c1", state, "system prompt")
+
+    contacts = [m for m in msgs if m["content"].startswith(CONTACT_PREFIX)]
+    assert [c["content"] for c in contacts] == [f'{CONTACT_PREFIX}\n{{"age":52,"name":"Jane"}}']
+    assert sum(estimate_tokens(m["content"]) for m in msgs) <= 600
+    # Most recent turns are kept verbatim, in order
+    assert msgs[-1]["content"].startswith("turn 1 ")
+    assert msgs[-2]["content"].startswith("turn 0 ")
+
+
+@pytest.mark.asyncio
+async def test_overflow_is_folded_into_persisted_summary(monkeypatch):
+    db = FakeDB(_turns(30), summary={"context_summary": "", "summarized_count": 0})
+    prompts = []
+
+    async def fake_completion(endpoint, **kwargs):
+        prompts.append(kwargs["messages"][1]["content"])
+        message = types.SimpleNamespace(content="Client is 52 and wants to retire at 60.")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(chat_context, "run_query", db.run_query)
+    monkeypatch.setattr(chat_context, "chat_completion", fake_completion)
+    contexts = ChatContextManager(budget=800, summary_min_messages=4)
+
+    state = await contexts.get("c1")
+    assert await contexts.get("c1") is state
+    assert contexts.stats()["misses"] == 1
+
+    contexts.build_messages("c1", state, "system prompt")
+    await state.folding
+
+    assert state.summary == "Client is 52 and wants to retire at 60."
+    assert state.summarized_count + len(state.messages) == 30
+    assert "turn 0 " in prompts[0]
+    update = [calls for table, calls in db.queries if table == "advisor_chats" and calls[0][0] == "update"]
+    assert update and update[0][0][1][0]["summarized_count"] == state.summarized_count
+
+    msgs = contexts.build_messages("c1", state, "system prompt")
+    assert msgs[1]["content"].endswith("retire at 60.")
+
+    # A reload only reads the turns after the summarized prefix
+    contexts.invalidate("c1")
+    db.summary = {"context_summary": state.summary, "summarized_count": state.summarized_count}
+    reloaded = await contexts.get("c1")
+    assert reloaded.messages == db.rows[state.summarized_count:]
+
+
+@pytest.mark.asyncio
+async def test_long_chat_loads_newest_turns(monkeypatch):
+    db = FakeDB(_turns(30), summary={"context_summary": "", "summarized_count": 0})
+    monkeypatch.setattr(chat_context, "run_query", db.run_query)
+    monkeypatch.setattr(chat_context, "CHAT_HISTORY_MAX_LOAD", 10)
+
+    state = await ChatContextManager().get("c1")
+
+    assert state.messages == db.rows[20:]
+    # Turns too old to load count as summarized, so fold offsets match the table
+    assert state.summarized_count == 20
+    (_, calls), = [q for q in db.queries if q[0] == "advisor_messages"]
+    assert ("order", ("id",)) in calls
+
+
+@pytest.mark.asyncio
+async def test_missing_summary_columns_disable_folding_once(monkeypatch):
+    db = FakeDB(_turns(30))
+
+    class UndefinedColumn(Exception):
+        code = "42703"
+
+    async def run_query(build, timeout=None, op="query"):
+        query = build(types.SimpleNamespace(table=lambda name: FakeQuery(db, name)))
+        if query.table == "advisor_chats":
+            db.queries.append((query.table, query.calls))
+            raise UndefinedColumn("column advisor_chats.context_summary does not exist")
+        return await db.run_query(build, timeout, op)
+
+    monkeypatch.setattr(chat_context, "run_query", run_query)
+    contexts = ChatContextManager(budget=800, summary_min_messages=4)
+
+    state = await contexts.get("c1")
+    assert not contexts.summaries_enabled
+    msgs = contexts.build_messages("c1", state, "system prompt")
+    assert state.folding is None
+    assert sum(estimate_tokens(m["content"]) for m in msgs) <= 800
+
+    await contexts.get("c2")
+    assert [t for t, _ in db.queries].count("advisor_chats") == 1
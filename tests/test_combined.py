@@ -0,0 +1,61 @@
+import json
+import asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import importlib
+
+combined = importlib.import_module("app.routers.combined")
+
+
+class FakeProcessor:
+    def __init__(self, *args, **kwargs):
+        self.response_queue = asyncio.Queue()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    async def wait_writable(self):
+        pass
+
+    def add_audio(self, data):
+        # Every audio chunk "recognizes" one final segment
+        self.response_queue.put_nowait((data.decode(), None))
+
+
+class FakeTranscriptManager:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def process_google_response(self, response, websocket, session_info, trace):
+        return [{"content": response, "trace": None}]
+
+
+def test_replies_on_one_socket_never_interleave(monkeypatch):
+    async def fake_reply(text, session_info, websocket, **kwargs):
+        for i in range(3):
+            await websocket.send_text(json.dumps({"type": "openai_assistant_delta", "content": f"{text}{i}"}))
+            await asyncio.sleep(0.01)
+        await websocket.send_text(json.dumps({"type": "openai_assistant_completed", "content": ""}))
+
+    monkeypatch.setattr(combined, "AudioProcessor", FakeProcessor)
+    monkeypatch.setattr(combined, "TranscriptManager", FakeTranscriptManager)
+    monkeypatch.setattr(combined, "stream_openai_response", fake_reply)
+    monkeypatch.setattr(combined.transcript_buffer, "flush", lambda session_info=None: asyncio.sleep(0))
+
+    app = FastAPI()
+    app.include_router(combined.router)
+    url = "/mic_and_speaker?userId=u&clientId=c&sessionId=s"
+    with TestClient(app).websocket_connect(url) as ws:
+        ws.send_bytes(b"g")
+        ws.send_text(json.dumps({"type": "text_input", "content": "t"}))
+        received = [json.loads(ws.receive_text())["content"] for _ in range(8)]
+
+    # The spoken and typed replies each stream whole, one after the other
+    assert received in (
+        ["g0", "g1", "g2", "", "t0", "t1", "t2", ""],
+        ["t0", "t1", "t2", "", "g0", "g1", "g2", ""],
+    )
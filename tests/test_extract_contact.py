@@ -0,0 +1,98 @@
+import json
+import types
+from collections import OrderedDict
+import pytest
+
+import app.routers.extract_contact as extract_contact
+from app.routers.extract_contact import ExtractContactRequest, Message, merge_contact
+
+SESSION = {"user_id": "u", "client_id": "c", "session_id": "s"}
+
+
+def test_merge_contact_deep_merges_without_erasing():
+    current = {
+        "name": "Jane Doe",
+        "tags": ["pension"],
+        "financials": {"income": "£60k", "assets": "House"},
+        "family": {"children": [{"name": "Tom", "age": 8}]},
+    }
+    update = {
+        "name": None,
+        "tags": ["pension", "isa"],
+        "financials": {"income": "£65k", "investments": ""},
+        "family": {"children": [{"name": "tom", "age": 9}, {"name": "Amy", "age": 5}]},
+    }
+
+    merged = merge_contact(current, update)
+
+    assert merged["name"] == "Jane Doe"
+    assert merged["tags"] == ["pension", "isa"]
+    assert merged["financials"] == {"income": "£65k", "assets": "House"}
+    assert merged["family"]["children"] == [{"name": "tom", "age": 9}, {"name": "Amy", "age": 5}]
+
+
+class FakeLLM:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    async def __call__(self, endpoint, **kwargs):
+        self.prompts.append(kwargs["messages"][-1]["content"])
+        message = types.SimpleNamespace(content=json.dumps(self.replies.pop(0)))
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    async def no_db(build, timeout=None, op="query"):
+        return types.SimpleNamespace(data=[{}])
+
+    monkeypatch.setattr(extract_contact, "run_query", no_db)
+    monkeypatch.setattr(extract_contact, "contact_states", OrderedDict())
+    fake = FakeLLM([
+        {"name": "Jane Doe", "family": {"children": [{"name": "Tom", "age": 8}]}},
+        {"financials": {"income": "£60k"}, "family": {"children": [{"name": "Amy", "age": 5}]}},
+        {"name": "Janet Doe"},
+    ])
+    monkeypatch.setattr(extract_contact, "chat_completion", fake)
+    return fake
+
+
+def upload(*lines):
+    return ExtractContactRequest(messages=[Message(speaker="Client", text=t) for t in lines])
+
+
+@pytest.mark.asyncio
+async def test_refresh_sends_only_new_lines_with_current_state(llm):
+    first = await extract_contact.extract_contact(upload("I'm Jane Doe.", "My son Tom is 8."), session_info=SESSION)
+    assert first.name == "Jane Doe"
+
+    second = await extract_contact.extract_contact(
+        upload("I'm Jane Doe.", "My son Tom is 8.", "I earn 60k.", "Amy is 5."), session_info=SESSION
+    )
+
+    prompt = llm.prompts[1]
+    assert "I'm Jane Doe." not in prompt
+    assert "Client: I earn 60k.\nClient: Amy is 5." in prompt
+    assert '"name":"Jane Doe"' in prompt
+    assert second.name == "Jane Doe"
+    assert second.financials.income == "£60k"
+    assert [c.name for c in second.family.children] == ["Tom", "Amy"]
+
+    # Nothing new: served from state without calling the model
+    third = await extract_contact.extract_contact(
+        upload("I'm Jane Doe.", "My son Tom is 8.", "I earn 60k.", "Amy is 5."), session_info=SESSION
+    )
+    assert len(llm.prompts) == 2
+    assert third == second
+
+
+@pytest.mark.asyncio
+async def test_edited_transcript_is_extracted_from_scratch(llm):
+    await extract_contact.extract_contact(upload("I'm Jane Doe.", "My son Tom is 8."), session_info=SESSION)
+    await extract_contact.extract_contact(upload("I earn 60k.", "Amy is 5."), session_info=SESSION)
+    result = await extract_contact.extract_contact(upload("I'm Janet Doe."), session_info=SESSION)
+
+    assert llm.prompts[2].startswith("Extract contact information")
+    assert result.name == "Janet Doe"
+    assert result.financials is None
@@ -0,0 +1,56 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from app.processors.intent_gate import IntentGate
+
+
+@pytest.mark.parametrize("text", [
+    "Hi, how are you?",
+    "Hello, thank you for joining our meeting today.",
+    "Who are you?",
+    "Thanks very much.",
+    "Okay.",
+    "Good morning, John.",
+])
+def test_small_talk_is_not_a_query(text):
+    assert not IntentGate().is_query(text)
+
+
+@pytest.mark.parametrize("text", [
+    "What is the ISA allowance this year?",
+    "Hi, what's the ISA allowance?",
+    "Can I take a lump sum from my pension at 55?",
+    "I'm interested in discussing my financial planning for retirement.",
+    "Should I pay off my mortgage early",
+    "We inherited some money, what should we do?",
+])
+def test_client_queries_pass(text):
+    assert IntentGate().is_query(text)
+
+
+@pytest.mark.parametrize("word", [
+    "inherit", "inherited", "inheriting", "inheritance", "retiring", "mortgaged", "invests", "taxation",
+])
+def test_finance_terms_match_inflected_forms(word):
+    assert IntentGate().score(f"My wife is {word} next year.") > IntentGate().score("My wife is away next year.")
+
+
+def test_threshold_and_counters():
+    gate = IntentGate(threshold=1.1)
+    assert not gate.is_query("What is the ISA allowance?")
+    gate.threshold = 0.0
+    assert gate.is_query("What is the ISA allowance?")
+    assert gate.stats() == {"evaluated": 2, "short_circuited": 1, "short_circuit_ratio": 0.5}
+
+
+def test_decisions_are_exported_as_metrics():
+    sample = lambda decision: REGISTRY.get_sample_value(
+        "advisor_intent_gate_decisions_total", {"decision": decision}
+    ) or 0.0
+    before = sample("query"), sample("short_circuit")
+
+    gate = IntentGate()
+    gate.is_query("Thanks very much.")
+    gate.is_query("What is the ISA allowance this year?")
+
+    assert (sample("query"), sample("short_circuit")) == (before[0] + 1, before[1] + 1)
@@ -0,0 +1,74 @@
+import types
+import httpx
+import openai
+import pytest
+
+import app.llm as llm
+
+
+def _install(monkeypatch, create):
+    monkeypatch.setattr(llm, "breaker", llm.CircuitBreaker(threshold=llm.LLM_MAX_ATTEMPTS, cooldown=60))
+    monkeypatch.setattr(llm, "retry_budget", llm.RetryBudget())
+    monkeypatch.setattr(llm, "_backoff", lambda attempt: 0)
+    monkeypatch.setattr(llm, "openai_client", types.SimpleNamespace(
+        chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create))
+    ))
+
+
+def _conn_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_then_succeeds(monkeypatch):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs["timeout"])
+        if len(calls) < 2:
+            raise _conn_error()
+        return "ok"
+
+    _install(monkeypatch, create)
+    assert await llm.chat_completion("summary", model="gpt-4o", messages=[]) == "ok"
+    assert calls == [llm.ENDPOINT_TIMEOUTS["summary"]] * 2
+    assert llm.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_fails_fast(monkeypatch):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(1)
+        raise _conn_error()
+
+    _install(monkeypatch, create)
+    with pytest.raises(openai.APIConnectionError):
+        await llm.chat_completion("assistant", model="gpt-4o", messages=[])
+    assert llm.breaker.state == "open"
+
+    before = len(calls)
+    with pytest.raises(llm.LLMUnavailableError):
+        await llm.chat_completion("assistant", model="gpt-4o", messages=[])
+    assert len(calls) == before
+
+
+def test_retry_budget_is_bounded():
+    budget = llm.RetryBudget(ratio=0.1, min_tokens=2)
+    assert budget.try_withdraw() and budget.try_withdraw()
+    assert not budget.try_withdraw()
+    for _ in range(11):
+        budget.deposit()
+    assert budget.try_withdraw()
+    assert not budget.try_withdraw()
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = llm.CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
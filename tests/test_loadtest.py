@@ -0,0 +1,20 @@
+import json
+
+import loadtest
+
+
+def test_load_harness_smoke():
+    args = loadtest.parse_args([
+        "--sessions", "2", "--duration", "2", "--speed", "4", "--ramp", "0",
+        "--drain", "1.5", "--text-interval", "1", "--stt-latency", "0.05",
+        "--llm-first-token", "0.05", "--llm-tokens", "5", "--llm-tokens-per-second", "500",
+        "--search-latency", "0", "--db-latency", "0",
+    ])
+    report = loadtest.run_load_test(args)
+
+    assert report["sessions_failed"] == 0, report["errors"]
+    assert report["segments"] > 0
+    assert report["text_input_to_reply_ms"]["n"] > 0
+    assert report["event_loop_lag_ms"]["n"] > 0
+    # The report is what CI diffs between releases
+    json.dumps(report)
@@ -0,0 +1,130 @@
+import asyncio
+import types
+import pytest
+
+import app.meeting_summary as meeting_summary
+from app.meeting_summary import MeetingSummaries, RollingSummary
+
+SESSION = {"user_id": "u", "client_id": "c", "session_id": "s"}
+
+
+class FakeLLM:
+    def __init__(self, fail=False):
+        self.prompts = []
+        self.fail = fail
+
+    async def __call__(self, endpoint, **kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        self.prompts.append(prompt)
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("boom")
+        new = prompt.split("New transcript:\n", 1)[1]
+        message = types.SimpleNamespace(content=f"summary of {len(self.prompts)}: {new}")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    fake = FakeLLM()
+    monkeypatch.setattr(meeting_summary, "chat_completion", fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_updates_every_n_segments_with_only_new_text(llm):
+    rolling = RollingSummary(every_segments=2, every_seconds=0)
+
+    rolling.add("mic: one.")
+    rolling.add("mic: two.")
+    await asyncio.sleep(0.05)
+    rolling.add("mic: three.")
+    rolling.add("mic: four.")
+    await asyncio.sleep(0.05)
+
+    assert len(llm.prompts) == 2
+    assert "one." in llm.prompts[0] and "three." not in llm.prompts[0]
+    new_part = llm.prompts[1].split("New transcript:\n", 1)[1]
+    assert new_part == "mic: three.\nmic: four."
+    # The previous summary is carried into the next update
+    assert "Existing summary:\nsummary of 1" in llm.prompts[1]
+    assert rolling.covered == 4 and rolling.pending == []
+
+
+@pytest.mark.asyncio
+async def test_timer_folds_pending_lines(llm):
+    rolling = RollingSummary(every_segments=100, every_seconds=0.02)
+    rolling.start()
+    rolling.add("speaker: hello.")
+    await asyncio.sleep(0.1)
+    rolling.stop()
+
+    assert rolling.covered == 1
+    assert len(llm.prompts) == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_folds_the_tail_and_failures_keep_lines_pending(monkeypatch):
+    failing = FakeLLM(fail=True)
+    monkeypatch.setattr(meeting_summary, "chat_completion", failing)
+    rolling = RollingSummary(every_segments=1, every_seconds=0)
+    rolling.add("mic: kept.")
+    await asyncio.sleep(0.05)
+    assert rolling.pending == ["mic: kept."]
+
+    with pytest.raises(RuntimeError):
+        await rolling.flush()
+
+    monkeypatch.setattr(meeting_summary, "chat_completion", FakeLLM())
+    assert await rolling.flush() == "summary of 1: mic: kept."
+
+
+@pytest.mark.asyncio
+async def test_registry_shares_a_meeting_across_sockets(llm):
+    registry = MeetingSummaries(ttl=3600)
+
+    mic = registry.acquire(SESSION)
+    speaker = registry.acquire(SESSION)
+    assert mic is speaker
+    other = {**SESSION, "session_id": "other"}
+    assert registry.acquire(other) is not mic
+    registry.release(other)
+
+    mic.add("mic: hi.")
+    registry.release(SESSION)
+    registry.release(SESSION)
+    await asyncio.sleep(0.05)
+
+    # The last socket closing folds the remaining lines; the summary stays available
+    assert registry.get(SESSION) is mic
+    assert mic.pending == [] and mic.summary
+
+    registry.ttl = 0
+    assert registry.get(SESSION) is None
+
+
+@pytest.mark.asyncio
+async def test_summarize_prefers_uploaded_messages_over_rolling_summary(monkeypatch):
+    import app.routers.summary as summary_router
+
+    registry = MeetingSummaries()
+    rolling = registry.acquire(SESSION)
+    rolling.summary, rolling.covered = "rolling", 3
+    registry.release(SESSION)
+    seen = []
+
+    async def fake_summarize(lines):
+        seen.append(lines)
+        return "from upload"
+
+    async def fake_save(**kwargs):
+        pass
+
+    monkeypatch.setattr(summary_router, "meeting_summaries", registry)
+    monkeypatch.setattr(summary_router, "summarize_lines", fake_summarize)
+    monkeypatch.setattr(summary_router, "save_summary", fake_save)
+
+    payload = summary_router.SummaryRequest(messages=[summary_router.Message(speaker="Client", text="Hi.")])
+    assert await summary_router.summarize_conversation(payload, session_info=SESSION) == {"summary": "from upload"}
+    assert seen == [["Client: Hi."]]
+    assert await summary_router.summarize_conversation(None, session_info=SESSION) == {"summary": "rolling"}
@@ -0,0 +1,21 @@
+import types
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import SegmentTrace, SessionLatency, record_llm_usage
+
+
+def test_metrics_endpoint_exports_pipeline_metrics():
+    session = SessionLatency("mic")
+    trace = SegmentTrace("mic", session)
+    trace.mark("stt_result")
+    trace.milestone("transcript")
+    record_llm_usage("assistant", types.SimpleNamespace(prompt_tokens=12, completion_tokens=30))
+
+    body = TestClient(app).get("/metrics").text
+
+    assert 'advisor_stage_latency_seconds_count{source="mic",stage="stt_result"}' in body
+    assert 'advisor_segment_latency_seconds_count{milestone="transcript",source="mic"}' in body
+    assert 'advisor_llm_tokens_total{endpoint="assistant",kind="completion"}' in body
+    assert "advisor_audio_queue_bytes" in body
+    assert set(session.summary()) == {"stt_result", "e2e_transcript"}
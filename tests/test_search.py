@@ -0,0 +1,57 @@
+import asyncio
+import time
+import pytest
+
+from app.search import WebSearch, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  What's the ISA   allowance?? ") == "what s the isa allowance"
+    assert normalize_query("£20,000 ISA") == "£20 000 isa"
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_and_coalescing():
+    calls = []
+
+    def fetch(query, max_results):
+        calls.append(query)
+        time.sleep(0.05)
+        return [{"title": query}]
+
+    search = WebSearch(budget=1, fetch=fetch)
+    first, second = await asyncio.gather(
+        search.search("ISA allowance?"),
+        search.search("isa allowance"),
+    )
+    assert first == second == [{"title": "ISA allowance?"}]
+    assert len(calls) == 1
+
+    assert await search.search("ISA   Allowance") == first
+    assert search.hits == 1
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_budget_exceeded_returns_empty_and_caches_later():
+    def slow(query, max_results):
+        time.sleep(0.2)
+        return [{"title": "late"}]
+
+    search = WebSearch(budget=0.05, fetch=slow)
+    assert await search.search("pension") == []
+    assert search.timeouts == 1
+
+    await asyncio.sleep(0.3)
+    assert await search.search("pension") == [{"title": "late"}]
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_lru_eviction():
+    search = WebSearch(max_entries=2, ttl=0.05, fetch=lambda q, n: [q])
+    for q in ("a", "b", "c"):
+        await search.search(q)
+    assert list(search.cache) == ["b", "c"]
+
+    await asyncio.sleep(0.1)
+    assert search._get_cached("c") is None
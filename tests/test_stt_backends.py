@@ -0,0 +1,145 @@
+import os
+import asyncio
+import wave
+import pytest
+from google.cloud import speech_v1p1beta1 as speech
+
+import app.processors.audio_processor as ap
+from app.processors.audio_format import AudioFormat
+from app.processors.stt_backends import ReplayBackend, ReplayScript, create_backend
+
+HERE = os.path.dirname(__file__)
+TRANSCRIPT = os.path.join(HERE, "transcript.txt")
+WAV = os.path.join(HERE, "fixtures", "test.wav")
+
+
+def test_script_from_transcript():
+    script = ReplayScript.from_transcript(TRANSCRIPT, audio_seconds=10)
+    assert len(script.utterances) == 7
+    first, second = script.utterances[:2]
+    assert first.text.startswith("Hello, thank you")
+    assert (first.speaker_tag, second.speaker_tag) == (1, 2)
+    assert script.utterances[-1].end == pytest.approx(10)
+    assert all(a.end <= b.start for a, b in zip(script.utterances, script.utterances[1:]))
+
+
+@pytest.mark.asyncio
+async def test_replay_backend_reveals_partials_then_final():
+    script = ReplayScript.from_transcript(TRANSCRIPT, words_per_second=10, pause=0)
+    backend = ReplayBackend(script, latency=0)
+    first = script.utterances[0]
+
+    async def requests():
+        yield speech.StreamingRecognizeRequest(streaming_config=speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16, sample_rate_hertz=16000
+            ),
+            interim_results=True,
+        ))
+        for _ in range(round(first.end * 10)):
+            yield speech.StreamingRecognizeRequest(audio_content=b"\0" * 3200)
+
+    results = [r.results[0] async for r in await backend.streaming_recognize(requests())]
+    partials = [r for r in results if not r.is_final]
+    finals = [r for r in results if r.is_final]
+
+    assert len(partials) >= 2
+    assert first.text.startswith(partials[-1].alternatives[0].transcript)
+    assert [r.alternatives[0].transcript for r in finals] == [first.text]
+    assert finals[0].alternatives[0].words[0].speaker_tag == 1
+
+
+@pytest.mark.asyncio
+async def test_audio_processor_transcribes_fixture_offline(monkeypatch):
+    with wave.open(WAV) as w:
+        rate, pcm = w.getframerate(), w.readframes(w.getnframes())
+    seconds = len(pcm) / 2 / rate
+
+    # Script spans slightly less than the clip so every line is finalized
+    backend = ReplayBackend(ReplayScript.from_transcript(TRANSCRIPT, audio_seconds=seconds - 0.2), latency=0)
+    monkeypatch.setattr(ap, "get_speech_client", lambda: backend)
+
+    proc = ap.AudioProcessor("mic", audio_format=AudioFormat("linear16", rate))
+    proc.vad.enabled = False
+    proc.start()
+    for i in range(0, len(pcm), rate // 5):
+        proc.add_audio(pcm[i:i + rate // 5])
+
+    texts = []
+    while len(texts) < 7:
+        resp, _ = await asyncio.wait_for(proc.response_queue.get(), timeout=2)
+        texts.extend(r.alternatives[0].transcript for r in resp.results if r.is_final)
+    proc.stop()
+
+    with open(TRANSCRIPT, encoding="utf-8") as f:
+        assert [t.split(":", 1)[1].strip() for t in f if t.strip()] == texts
+
+
+@pytest.mark.asyncio
+async def test_rotated_streams_resume_the_script(monkeypatch):
+    with wave.open(WAV) as w:
+        rate, pcm = w.getframerate(), w.readframes(w.getnframes())
+    seconds = len(pcm) / 2 / rate
+
+    backend = ReplayBackend(ReplayScript.from_transcript(TRANSCRIPT, audio_seconds=seconds - 0.2), latency=0)
+    monkeypatch.setattr(ap, "get_speech_client", lambda: backend)
+    monkeypatch.setattr(ap, "STREAM_ROTATE_SECONDS", 0.05)
+
+    proc = ap.AudioProcessor("mic", audio_format=AudioFormat("linear16", rate))
+    proc.vad.enabled = False
+    proc.start()
+    texts = []
+    for i in range(0, len(pcm), rate // 5):
+        proc.add_audio(pcm[i:i + rate // 5])
+        await asyncio.sleep(0.02)
+    while len(texts) < 7:
+        resp, _ = await asyncio.wait_for(proc.response_queue.get(), timeout=2)
+        texts.extend(r.alternatives[0].transcript for r in resp.results if r.is_final)
+    await asyncio.sleep(0.1)
+    while not proc.response_queue.empty():
+        resp, _ = proc.response_queue.get_nowait()
+        texts.extend(r.alternatives[0].transcript for r in resp.results if r.is_final)
+    proc.stop()
+
+    assert backend.streams > 1
+    with open(TRANSCRIPT, encoding="utf-8") as f:
+        assert [t.split(":", 1)[1].strip() for t in f if t.strip()] == texts
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_backend("whisper")
+
+
+@pytest.mark.asyncio
+async def test_segments_carry_latency_traces(monkeypatch):
+    import json
+    import app.processors.transcript_manager as tm_module
+    from app.processors.transcript_manager import TranscriptManager
+
+    class FakeWebSocket:
+        def __init__(self):
+            self.sent = []
+
+        async def send_text(self, text):
+            self.sent.append(json.loads(text))
+
+    monkeypatch.setattr(tm_module.transcript_buffer, "add", lambda row: None)
+    backend = ReplayBackend(ReplayScript.from_transcript(TRANSCRIPT, words_per_second=20, pause=0), latency=0.05)
+    monkeypatch.setattr(ap, "get_speech_client", lambda: backend)
+
+    proc = ap.AudioProcessor("mic")
+    proc.vad.enabled = False
+    proc.start()
+    proc.add_audio(b"\0" * 32000)
+    resp, trace = await asyncio.wait_for(proc.response_queue.get(), timeout=2)
+    segments = await TranscriptManager("mic").process_google_response(
+        resp, FakeWebSocket(), {"user_id": "u", "client_id": "c", "session_id": "s"}, trace
+    )
+    proc.stop()
+
+    marks = segments[0]["trace"].as_dict()
+    assert list(marks) == ["audio_sent", "stt_result", "response_queue", "transcript_sent"]
+    # The replay backend's latency shows up as recognizer time
+    assert marks["stt_result"] >= 0.04
+    assert proc.latency.summary()["e2e_transcript"]["n"] == 1
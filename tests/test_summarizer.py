@@ -0,0 +1,73 @@
+import asyncio
+import types
+import pytest
+
+import app.summarizer as summarizer
+from app.summarizer import chunk_lines, summarize_lines
+from app.chat_context import estimate_tokens
+
+
+class FakeLLM:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.prompts = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, endpoint, **kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        reply = f"notes-{len(self.prompts)}"
+        message = types.SimpleNamespace(content=reply)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    fake = FakeLLM()
+    monkeypatch.setattr(summarizer, "chat_completion", fake)
+    return fake
+
+
+def test_chunk_lines_respects_budget_and_order():
+    lines = [f"Client: line {i} " + "x" * 80 for i in range(50)]
+    chunks = chunk_lines(lines, budget=200)
+
+    assert len(chunks) > 1
+    assert "\n".join(chunks) == "\n".join(lines)
+    assert all(sum(estimate_tokens(l) for l in c.split("\n")) <= 200 for c in chunks)
+
+
+def test_chunk_lines_splits_oversized_line():
+    chunks = chunk_lines(["a" * 2000], budget=100)
+    assert "".join(chunks) == "a" * 2000
+    assert len(chunks) == 5
+
+
+@pytest.mark.asyncio
+async def test_short_transcript_uses_single_call(llm):
+    summary = await summarize_lines(["Advisor: hello", "Client: hi"])
+
+    assert summary == "notes-1"
+    assert len(llm.prompts) == 1
+    assert "Advisor: hello\nClient: hi" in llm.prompts[0]
+
+
+@pytest.mark.asyncio
+async def test_long_transcript_maps_concurrently_then_reduces(llm):
+    lines = [f"Client: point {i} " + "y" * 200 for i in range(40)]
+
+    summary = await summarize_lines(lines, single_pass_tokens=500, chunk_tokens=500, concurrency=3)
+
+    chunks = chunk_lines(lines, 500)
+    assert len(llm.prompts) == len(chunks) + 1
+    assert llm.peak == 3
+    assert f"part 1 of {len(chunks)}" in llm.prompts[0]
+    # The reduce prompt lists chunk notes in transcript order
+    final = llm.prompts[-1]
+    assert final.index("Part 1:") < final.index(f"Part {len(chunks)}:")
+    assert summary == f"notes-{len(chunks) + 1}"
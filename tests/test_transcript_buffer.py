@@ -0,0 +1,145 @@
+import asyncio
+import pytest
+
+from app.transcript_buffer import TranscriptWriteBuffer
+
+
+def _row(i):
+    return {"session_id": "s", "transcript": f"segment {i}"}
+
+
+@pytest.mark.asyncio
+async def test_flushes_in_batches_on_size_threshold():
+    batches = []
+
+    async def writer(rows):
+        batches.append(list(rows))
+
+    buf = TranscriptWriteBuffer(batch_size=3, flush_interval=60, writer=writer)
+    for i in range(7):
+        buf.add(_row(i))
+    await asyncio.sleep(0.05)
+    await buf.stop()
+
+    assert [len(b) for b in batches] == [3, 3, 1]
+    assert [r["transcript"] for b in batches for r in b] == [f"segment {i}" for i in range(7)]
+
+
+@pytest.mark.asyncio
+async def test_flushes_on_interval():
+    batches = []
+
+    async def writer(rows):
+        batches.append(list(rows))
+
+    buf = TranscriptWriteBuffer(batch_size=100, flush_interval=0.05, writer=writer)
+    buf.add(_row(0))
+    await asyncio.sleep(0.2)
+    assert len(batches) == 1
+    await buf.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_then_dropped():
+    calls = []
+
+    async def flaky(rows):
+        calls.append(len(rows))
+        if len(calls) < 3:
+            raise RuntimeError("boom")
+
+    buf = TranscriptWriteBuffer(batch_size=10, flush_interval=60, max_retries=3, base_backoff=0, writer=flaky)
+    buf.add(_row(0))
+    await buf.flush()
+    assert calls == [1, 1, 1]
+    assert buf.dropped == 0
+
+    async def broken(rows):
+        raise RuntimeError("down")
+
+    buf.writer = broken
+    buf.add(_row(1))
+    await buf.stop()
+    assert buf.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_batch_in_flight():
+    written = []
+
+    async def slow(rows):
+        await asyncio.sleep(0.1)
+        written.extend(rows)
+
+    buf = TranscriptWriteBuffer(batch_size=2, flush_interval=60, writer=slow)
+    buf.add(_row(0))
+    buf.add(_row(1))
+    buf.add(_row(2))
+    await asyncio.sleep(0.02)
+    await buf.stop()
+
+    assert [r["transcript"] for r in written] == ["segment 0", "segment 1", "segment 2"]
+    assert not buf.pending and buf.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_still_writes_its_batch():
+    written = []
+
+    async def slow(rows):
+        await asyncio.sleep(0.05)
+        written.extend(rows)
+
+    buf = TranscriptWriteBuffer(batch_size=10, flush_interval=60, writer=slow)
+    buf.pending.extend([_row(0), _row(1)])
+    task = asyncio.create_task(buf.flush())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await buf.flush()
+
+    assert [r["transcript"] for r in written] == ["segment 0", "segment 1"]
+
+
+def _session_row(session, i):
+    return {"user_id": "u", "client_id": "c", "session_id": session, "transcript": f"{session} {i}"}
+
+
+@pytest.mark.asyncio
+async def test_session_flush_is_scoped_and_not_blocked_by_backoff():
+    written = []
+
+    async def writer(rows):
+        if rows[0]["session_id"] == "a":
+            raise RuntimeError("a is failing")
+        written.extend(rows)
+
+    buf = TranscriptWriteBuffer(batch_size=10, flush_interval=60, max_retries=3, base_backoff=0.5, writer=writer)
+    buf.add(_session_row("a", 0))
+    buf.add(_session_row("b", 0))
+    backing_off = asyncio.create_task(buf.flush({"user_id": "u", "client_id": "c", "session_id": "a"}))
+    await asyncio.sleep(0.01)
+
+    # Session b is written at once while a's batch sleeps between retries
+    await asyncio.wait_for(buf.flush({"user_id": "u", "client_id": "c", "session_id": "b"}), timeout=0.2)
+    assert [r["transcript"] for r in written] == ["b 0"]
+    assert not backing_off.done()
+    backing_off.cancel()
+
+
+@pytest.mark.asyncio
+async def test_retries_resend_the_same_row_ids():
+    attempts = []
+
+    async def flaky(rows):
+        attempts.append([r["row_id"] for r in rows])
+        if len(attempts) == 1:
+            raise TimeoutError("may have committed")
+
+    buf = TranscriptWriteBuffer(batch_size=10, flush_interval=60, base_backoff=0, writer=flaky)
+    buf.add(_row(0))
+    buf.add(_row(1))
+    await buf.stop()
+
+    assert len(attempts) == 2 and attempts[0] == attempts[1]
+    assert len(set(attempts[0])) == 2
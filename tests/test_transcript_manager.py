@@ -0,0 +1,70 @@
+import json
+import pytest
+from google.cloud import speech_v1p1beta1 as speech
+
+import app.processors.transcript_manager as tm_module
+from app.processors.transcript_manager import TranscriptManager
+
+SESSION = {"user_id": "u", "client_id": "c", "session_id": "s"}
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+def _response(*results):
+    return speech.StreamingRecognizeResponse(results=[
+        speech.StreamingRecognitionResult(
+            is_final=final,
+            alternatives=[speech.SpeechRecognitionAlternative(transcript=text)],
+        )
+        for text, final in results
+    ])
+
+
+@pytest.fixture
+def persisted(monkeypatch):
+    rows = []
+    monkeypatch.setattr(tm_module.transcript_buffer, "add", rows.append)
+    return rows
+
+
+@pytest.mark.asyncio
+async def test_partials_share_utterance_id_with_final(persisted):
+    ws = FakeWebSocket()
+    tm = TranscriptManager("mic", partials=True, partial_interval=0)
+
+    assert await tm.process_google_response(_response(("what is", False)), ws, SESSION) == []
+    await tm.process_google_response(_response(("what is my", False), (" pension", False)), ws, SESSION)
+    segments = await tm.process_google_response(_response(("what is my pension", True)), ws, SESSION)
+    await tm.process_google_response(_response(("and my", False)), ws, SESSION)
+
+    assert [m["type"] for m in ws.sent] == [
+        "mic_transcription_partial", "mic_transcription_partial",
+        "mic_transcription", "mic_transcription_partial",
+    ]
+    assert ws.sent[1]["content"] == "what is my pension"
+    assert ws.sent[0]["utterance_id"] == ws.sent[1]["utterance_id"] == ws.sent[2]["utterance_id"]
+    assert ws.sent[3]["utterance_id"] != ws.sent[2]["utterance_id"]
+    # Only the final is persisted and handed on
+    assert [s["content"] for s in segments] == ["What is my pension."]
+    assert [r["transcript"] for r in persisted] == ["What is my pension."]
+
+
+@pytest.mark.asyncio
+async def test_partials_are_rate_limited_and_off_by_default(persisted):
+    ws = FakeWebSocket()
+    tm = TranscriptManager("speaker", partials=True, partial_interval=60)
+    for text in ("a", "a b", "a b c"):
+        await tm.process_google_response(_response((text, False)), ws, SESSION)
+    assert [m["content"] for m in ws.sent] == ["a"]
+    assert tm.partials_skipped == 2
+
+    ws = FakeWebSocket()
+    tm = TranscriptManager("speaker")
+    await tm.process_google_response(_response(("a b", False)), ws, SESSION)
+    assert ws.sent == []
@@ -0,0 +1,152 @@
+import pytest
+
+import app.routers.summary as summary_router
+from app.transcript_store import SessionTranscriptStore
+
+A = {"user_id": "u", "client_id": "c", "session_id": "a"}
+B = {"user_id": "u", "client_id": "c", "session_id": "b"}
+
+
+class Loader:
+    """Stands in for the `conversations` table."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def __call__(self, user_id, client_id, session_id, since=None):
+        self.calls.append((user_id, client_id, session_id, since))
+        return [r for r in self.rows if since is None or r["timestamp"] >= since]
+
+
+def row(n, text, source="mic", speaker_tag="Speaker_1"):
+    return {
+        "row_id": f"row-{n}",
+        "source": source,
+        "speaker_tag": speaker_tag,
+        "transcript": text,
+        "timestamp": f"2024-01-01T10:00:{n:02d}",
+    }
+
+
+def test_append_and_get_are_per_session():
+    store = SessionTranscriptStore()
+    store.append(A, row(1, "Hello."))
+    store.append(B, row(2, "Hi.", "speaker", "Speaker_2"))
+    store.append(A, row(3, "Shall we start?"))
+
+    assert store.get(A) == ["mic (Speaker_1): Hello.", "mic (Speaker_1): Shall we start?"]
+    assert store.get({**A, "user_id": "someone-else"}) is None
+
+
+def test_least_recently_used_session_is_evicted_over_budget():
+    store = SessionTranscriptStore(max_bytes=60)
+    store.append(A, row(1, "a" * 10))
+    store.append(B, row(2, "b" * 10))
+    store.get(A)
+    store.append(B, row(3, "b" * 15))
+
+    assert store.get(A) is None
+    assert store.get(B) == ["mic (Speaker_1): " + "b" * 10, "mic (Speaker_1): " + "b" * 15]
+    assert store.size == 59 and store.evictions == 1
+
+
+def test_idle_sessions_expire():
+    store = SessionTranscriptStore(idle_ttl=0)
+    store.append(A, row(1, "Gone."))
+    assert store.get(A) is None
+
+
+@pytest.mark.asyncio
+async def test_load_falls_back_to_conversations_table():
+    loader = Loader([
+        row(1, "Hello."),
+        row(2, "", "speaker", "Speaker_2"),
+    ])
+    store = SessionTranscriptStore(loader=loader)
+
+    assert await store.load(A) == ["mic (Speaker_1): Hello."]
+    assert await store.load(A) == ["mic (Speaker_1): Hello."]
+    # The second load only asks for rows from the last one seen onwards
+    assert loader.calls == [("u", "c", "a", None), ("u", "c", "a", "2024-01-01T10:00:02")]
+    assert store.stats()["loaded_rows"] == 1
+
+
+@pytest.mark.asyncio
+async def test_summarize_without_messages_uses_server_transcript(monkeypatch):
+    store = SessionTranscriptStore(loader=Loader([]))
+    store.append(A, row(1, "I want to retire at 60."))
+    seen, saved = [], []
+
+    async def fake_summarize(lines):
+        seen.append(lines)
+        return "Retire at 60."
+
+    async def fake_save(**kwargs):
+        saved.append(kwargs)
+
+    monkeypatch.setattr(summary_router, "transcript_store", store)
+    monkeypatch.setattr(summary_router, "summarize_lines", fake_summarize)
+    monkeypatch.setattr(summary_router, "save_summary", fake_save)
+
+    result = await summary_router.summarize_conversation(None, session_info=A)
+
+    assert result == {"summary": "Retire at 60."}
+    assert seen == [["mic (Speaker_1): I want to retire at 60."]]
+    assert saved[0]["session_id"] == "a"
+
+    with pytest.raises(summary_router.HTTPException) as exc:
+        await summary_router.summarize_conversation(None, session_info=B)
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_session_started_by_append_is_backfilled():
+    # e.g. the process restarted mid-meeting: memory only has the newest lines
+    loader = Loader([row(1, "Okay."), row(2, "Okay."), row(3, "After restart.")])
+    store = SessionTranscriptStore(loader=loader)
+    store.append(A, row(3, "After restart."))
+    store.append(A, row(4, "Okay."))
+
+    expected = [
+        "mic (Speaker_1): Okay.",
+        "mic (Speaker_1): Okay.",
+        "mic (Speaker_1): After restart.",
+        "mic (Speaker_1): Okay.",
+    ]
+    assert await store.load(A) == expected
+    assert await store.load(A) == expected
+    assert store.size == sum(len(l) for l in expected)
+
+
+@pytest.mark.asyncio
+async def test_interleaved_sources_from_two_workers_are_merged_once():
+    # /mic and /speaker landed on different workers; each only holds its own side
+    table = [
+        row(1, "Hello.", "mic"),
+        row(2, "Hi, thanks for coming.", "speaker", "Speaker_2"),
+        row(3, "Okay.", "mic"),
+        row(4, "Okay.", "speaker", "Speaker_2"),
+    ]
+    loader = Loader(table)
+    mic_worker = SessionTranscriptStore(loader=loader)
+    for r in table:
+        if r["source"] == "mic":
+            mic_worker.append(A, r)
+
+    expected = [
+        "mic (Speaker_1): Hello.",
+        "speaker (Speaker_2): Hi, thanks for coming.",
+        "mic (Speaker_1): Okay.",
+        "speaker (Speaker_2): Okay.",
+    ]
+    assert await mic_worker.load(A) == expected
+
+    # Both sockets keep talking after the first /summarize
+    mic_worker.append(A, row(6, "One more thing.", "mic"))
+    table += [row(5, "Go on.", "speaker", "Speaker_2"), row(6, "One more thing.", "mic")]
+
+    assert await mic_worker.load(A) == expected + [
+        "speaker (Speaker_2): Go on.",
+        "mic (Speaker_1): One more thing.",
+    ]
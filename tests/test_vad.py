@@ -0,0 +1,53 @@
+import numpy as np
+
+from app.processors.vad import VoiceActivityDetector
+
+RATE = 16000
+
+
+def _tone(seconds, amplitude=8000):
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16).tobytes()
+
+
+def _silence(seconds):
+    return np.zeros(int(RATE * seconds), dtype=np.int16).tobytes()
+
+
+def test_silence_is_suppressed_and_speech_passes_with_padding():
+    vad = VoiceActivityDetector("mic", hangover_ms=100, preroll_ms=60, keepalive_seconds=60)
+
+    assert vad.process(_silence(1.0)) == b""
+    speech = _tone(0.5)
+    out = vad.process(speech)
+    # 60 ms of pre-roll ahead of the onset
+    assert len(out) == len(speech) + 3 * 640
+
+    out = vad.process(_silence(1.0))
+    # 100 ms of hangover after the last voiced frame
+    assert len(out) == 5 * 640
+
+    stats = vad.stats()
+    assert stats["vad_bytes_in"] == 2 * RATE * 2.5
+    assert 60 < stats["vad_suppressed_pct"] < 80
+
+
+def test_keepalive_frames_during_long_silence():
+    vad = VoiceActivityDetector("speaker", keepalive_seconds=1)
+    out = vad.process(_silence(3.0))
+    assert len(out) == 3 * 640
+
+
+def test_thresholds_are_per_source_and_can_be_disabled():
+    assert VoiceActivityDetector("speaker").threshold_db < VoiceActivityDetector("mic").threshold_db
+
+    quiet = _tone(0.2, amplitude=60)
+    assert VoiceActivityDetector("mic", keepalive_seconds=60).process(quiet) == b""
+    assert VoiceActivityDetector("mic", enabled=False).process(quiet) == quiet
+
+
+def test_handles_odd_sized_chunks():
+    vad = VoiceActivityDetector("mic", hangover_ms=0, preroll_ms=20)
+    speech = _tone(0.2)
+    out = b"".join(vad.process(speech[i:i + 333]) for i in range(0, len(speech), 333))
+    assert out == speech